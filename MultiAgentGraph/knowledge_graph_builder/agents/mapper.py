@@ -1,73 +1,324 @@
 import re
 
-def map_to_graph(summary_text):
+from helpers.roadmap_graph import RoadmapGraph, PHASE_HEADER
+
+PHASE_PATTERN = re.compile(r'^(Phase \d+): (.+)')
+PHASE_HEADER_PATTERN = re.compile(r'^Phase \d+:')
+MIN_PHASES = 2
+
+# Compact format: "ID = Label" declares a node once, "P1 > A > B > ~3 months"
+# gives a branch by ID; phases are declared as P1, P2, ...
+COMPACT_DECLARATION = re.compile(r'^([A-Za-z][A-Za-z0-9]{0,7})\s*=\s*(.+)$')
+COMPACT_PHASE_ID = re.compile(r'^P(\d+)$')
+COMPACT_ESTIMATE_PREFIX = "~"
+
+
+class RoadmapGraphBuilder:
     """
-    Converts '>' delimited roadmap text into a graph structure of nodes and edges.
+    Builds the roadmap graph one '>' delimited line at a time.
+
+    Nodes are interned into a RoadmapGraph in first-seen order and edges are
+    deduplicated with a set, so feeding n lines is linear in their total
+    size. Content nodes are assigned to the phase whose header started the
+    line they appear on. ``snapshot()`` and ``to_graph()`` can be called at
+    any point and do not change the builder's state.
     """
-    lines = [line.strip() for line in summary_text.split('\n') if line.strip()]
-    
-    nodes = set()
-    edges = []
-    current_phase_label = None
-    last_node_in_current_phase = {}
-    phase_start_nodes = {}
-
-    for line in lines:
+
+    def __init__(self):
+        self._graph = RoadmapGraph()
+        self._edge_set = set()
+        self._current_phase_label = None
+        self._membership_phase = None
+        self._phase_numbers = {}
+        self._last_node_in_phase = {}
+        self._phase_start_nodes = {}
+        self._total_time_node = None
+        self._estimate_nodes = set()
+        self._final_time_estimate_node = None
+
+    def _add_node(self, label):
+        graph = self._graph
+        node_count = graph.num_nodes
+        node_id = graph.intern(label)
+        if graph.num_nodes > node_count:
+            lowered = label.lower()
+            if "total estimated time" in lowered:
+                self._total_time_node = node_id
+            if "estimated time" in lowered and "total" not in lowered:
+                self._estimate_nodes.add(node_id)
+        if node_id in self._estimate_nodes:
+            # Latest estimate seen so far, even when its label was used by an earlier phase
+            self._final_time_estimate_node = node_id
+        return node_id
+
+    def _add_edge(self, source_id, target_id):
+        edge = (source_id, target_id)
+        if edge not in self._edge_set:
+            self._edge_set.add(edge)
+            self._graph.add_edge(source_id, target_id)
+
+    def add_line(self, line):
         parts = [part.strip() for part in line.split('>') if part.strip()]
-        
         if not parts:
-            continue
+            return
 
         # Add all parts as nodes
-        for part in parts:
-            nodes.add(part)
+        part_ids = [self._add_node(part) for part in parts]
 
         # Determine current phase and its start node
-        phase_match = re.match(r'^(Phase \d+): (.+)', parts[0])
-        if phase_match:
-            current_phase_label = phase_match.group(1)
-            phase_start_nodes[current_phase_label] = parts[0]
-        
+        first = parts[0]
+        if first.startswith('Phase '):
+            phase_match = PHASE_PATTERN.match(first)
+            if phase_match:
+                self._current_phase_label = phase_match.group(1)
+                self._phase_start_nodes[self._current_phase_label] = part_ids[0]
+                self._phase_numbers[self._current_phase_label] = int(self._current_phase_label[6:])
+
+        # Phase membership (used for clustering) follows any line led by a phase header
+        if self._graph.kinds[part_ids[0]] == PHASE_HEADER:
+            self._membership_phase = part_ids[0]
+        if self._membership_phase is not None:
+            for node_id in part_ids:
+                self._graph.assign_phase(node_id, self._membership_phase)
+
         # Create edges based on the hierarchy within the line
-        for i in range(len(parts) - 1):
-            source = parts[i]
-            target = parts[i+1]
-            if (source, target) not in edges:
-                edges.append((source, target))
-        
+        for i in range(len(part_ids) - 1):
+            self._add_edge(part_ids[i], part_ids[i + 1])
+
         # Track the last node in the current phase for potential inter-phase connections
-        if current_phase_label and parts[-1] != current_phase_label:
-            last_node_in_current_phase[current_phase_label] = parts[-1]
-
-    # After processing all lines, add connections between phases
-    # This assumes phases are ordered numerically and implicitly connected
-    sorted_phase_labels = sorted(last_node_in_current_phase.keys(), 
-                                 key=lambda x: int(re.search(r'\d+', x).group()))
-
-    for i in range(len(sorted_phase_labels) - 1):
-        current_phase = sorted_phase_labels[i]
-        next_phase = sorted_phase_labels[i+1]
-        
-        # Connect the last node of current phase to the start node of the next phase
-        last_node = last_node_in_current_phase.get(current_phase)
-        next_phase_start_node = phase_start_nodes.get(next_phase)
-
-        if last_node and next_phase_start_node and (last_node, next_phase_start_node) not in edges:
-            edges.append((last_node, next_phase_start_node))
-
-    # Handle Total Estimated Time node and connect it from the last node of the final phase
-    total_time_node = None
-    final_time_estimate_node = None
-    for node in nodes:
-        if "total estimated time" in node.lower():
-            total_time_node = node
-        if "estimated time" in node.lower() and "total" not in node.lower():
-            final_time_estimate_node = node # Simple heuristic, might need refinement
-    
-    if total_time_node and final_time_estimate_node and (final_time_estimate_node, total_time_node) not in edges:
-        edges.append((final_time_estimate_node, total_time_node))
-
-    return {
-        "nodes": list(nodes),
-        "edges": edges
-    }
\ No newline at end of file
+        if self._current_phase_label and parts[-1] != self._current_phase_label:
+            self._last_node_in_phase[self._current_phase_label] = part_ids[-1]
+
+    def _derived_edges(self):
+        """Inter-phase and total-time edges implied by everything added so far."""
+        edges = []
+        seen = set()
+
+        def add(edge):
+            if edge not in self._edge_set and edge not in seen:
+                seen.add(edge)
+                edges.append(edge)
+
+        # Connect phases in numeric order: last node of one phase to the next phase's header
+        sorted_phase_labels = sorted(self._last_node_in_phase, key=self._phase_numbers.__getitem__)
+        for current_phase, next_phase in zip(sorted_phase_labels, sorted_phase_labels[1:]):
+            last_node = self._last_node_in_phase.get(current_phase)
+            next_phase_start_node = self._phase_start_nodes.get(next_phase)
+            if last_node is not None and next_phase_start_node is not None:
+                add((last_node, next_phase_start_node))
+
+        # Connect the final phase's time estimate to the Total Estimated Time node
+        if self._total_time_node is not None and self._final_time_estimate_node is not None:
+            add((self._final_time_estimate_node, self._total_time_node))
+
+        return edges
+
+    def to_graph(self):
+        """Returns a RoadmapGraph for the lines added so far."""
+        graph = self._graph.copy()
+        for source_id, target_id in self._derived_edges():
+            graph.add_edge(source_id, target_id)
+        return graph
+
+    def snapshot(self):
+        """Returns {"nodes": [...], "edges": [...]} for the lines added so far."""
+        graph = self._graph
+        labels = graph.labels
+        edges = [(labels[source], labels[target]) for source, target in graph.edges()]
+        edges.extend((labels[source], labels[target]) for source, target in self._derived_edges())
+        return {
+            "nodes": list(labels),
+            "edges": edges
+        }
+
+
+def map_to_graph(summary_text):
+    """
+    Converts '>' delimited roadmap text into a graph structure of nodes and edges.
+    """
+    return build_roadmap_graph(summary_text).to_dict()
+
+
+def build_roadmap_graph(summary_text):
+    """Like map_to_graph, but returns the compact RoadmapGraph."""
+    builder = RoadmapGraphBuilder()
+    for line in summary_text.split('\n'):
+        builder.add_line(line)
+    return builder.to_graph()
+
+
+class CompactExpander:
+    """
+    Expands the compact synthesis format into '>' lines, one line at a time.
+
+    IDs must be declared before a branch uses them, which holds for streamed
+    output too. Branch parts that are not declared IDs are kept as literal
+    labels, and "~X months" becomes "Estimated Time (X months)".
+    """
+
+    def __init__(self):
+        self._labels = {}
+
+    def _label(self, part):
+        label = self._labels.get(part)
+        if label is not None:
+            return label
+        if part.startswith(COMPACT_ESTIMATE_PREFIX):
+            return f"Estimated Time ({part[len(COMPACT_ESTIMATE_PREFIX):].strip()})"
+        return part
+
+    def expand_line(self, line):
+        """Returns the '>' line for one compact line, or None for a blank line or node declaration."""
+        line = line.strip()
+        if not line:
+            return None
+        declaration = COMPACT_DECLARATION.match(line)
+        if declaration and '>' not in line:
+            node_id, label = declaration.group(1), declaration.group(2).strip()
+            phase_match = COMPACT_PHASE_ID.match(node_id)
+            if phase_match is None:
+                self._labels[node_id] = label
+                return None
+            # A phase declaration is also the phase's header line
+            if not PHASE_HEADER_PATTERN.match(label):
+                label = f"Phase {int(phase_match.group(1))}: {label}"
+            self._labels[node_id] = label
+            return label
+        parts = [part.strip() for part in line.split('>') if part.strip()]
+        return " > ".join(self._label(part) for part in parts)
+
+
+def expand_compact(summary_text):
+    """Converts compact synthesis output into the '>' delimited line format."""
+    expander = CompactExpander()
+    lines = (expander.expand_line(line) for line in summary_text.split('\n'))
+    return "\n".join(line for line in lines if line)
+
+
+def validate_summary(summary_text):
+    """
+    Fast structural check of synthesizer output before it is mapped.
+
+    Returns a list of problems (empty if the text is usable): numbered
+    "Phase N:" headers from 1, at least one '>' chain per phase, an
+    "Estimated Time (...)" leaf in every phase and exactly one
+    "Total Estimated Time" node.
+    """
+    if summary_text.startswith("Error calling OpenAI API"):
+        return ["model call failed"]
+
+    phases = set()
+    phases_with_estimate = set()
+    totals = set()
+    chains = 0
+    current_phase = None
+    for line in summary_text.split('\n'):
+        parts = [part.strip() for part in line.split('>') if part.strip()]
+        if not parts:
+            continue
+        totals.update(part for part in parts if "total estimated time" in part.lower())
+        phase_match = PHASE_PATTERN.match(parts[0])
+        if phase_match:
+            current_phase = int(phase_match.group(1)[6:])
+            phases.add(current_phase)
+        if len(parts) > 1:
+            chains += 1
+            if parts[-1].lower().startswith("estimated time") and current_phase is not None:
+                phases_with_estimate.add(current_phase)
+
+    problems = []
+    if len(phases) < MIN_PHASES:
+        problems.append(f"expected at least {MIN_PHASES} 'Phase N: Title' lines, found {len(phases)}")
+    elif sorted(phases) != list(range(1, len(phases) + 1)):
+        problems.append(f"phases must be numbered 1 to {len(phases)}, found {sorted(phases)}")
+    if chains < max(1, len(phases)):
+        problems.append(f"expected at least one 'A > B' line per phase, found {chains}")
+    without_estimate = sorted(phases - phases_with_estimate)
+    if without_estimate:
+        problems.append(
+            "phases without an 'Estimated Time (X months)' leaf: " + ", ".join(map(str, without_estimate))
+        )
+    if len(totals) != 1:
+        problems.append(f"expected exactly one 'Total Estimated Time' node, found {len(totals)}")
+    return problems
+
+
+def validate_phase(phase_text, header):
+    """
+    validate_summary for the lines of a single phase (refresh output):
+    they must start with ``header``, stay within that phase, have at least
+    one '>' chain ending in "Estimated Time (...)" and no total.
+    """
+    if phase_text.startswith("Error calling OpenAI API"):
+        return ["model call failed"]
+
+    lines = [[part.strip() for part in line.split('>') if part.strip()] for line in phase_text.split('\n')]
+    lines = [parts for parts in lines if parts]
+    problems = []
+    if not lines or lines[0][0] != header:
+        problems.append(f"the first line must be '{header}'")
+    other_phases = sorted({parts[0] for parts in lines if PHASE_HEADER_PATTERN.match(parts[0]) and parts[0] != header})
+    if other_phases:
+        problems.append("lines belong to other phases: " + ", ".join(other_phases))
+    if not any(len(parts) > 1 and parts[-1].lower().startswith("estimated time") for parts in lines):
+        problems.append("expected an 'A > B' line ending in 'Estimated Time (X months)'")
+    if any("total estimated time" in part.lower() for parts in lines for part in parts):
+        problems.append("the 'Total Estimated Time' line is not part of a phase")
+    return problems
+
+
+class IncrementalMapper:
+    """
+    Maps a roadmap that arrives in pieces, e.g. streamed from the LLM.
+
+    Text chunks are split into complete lines; a partial trailing line is
+    held back until its newline arrives. ``snapshot()`` returns the graph
+    for all complete lines fed so far, in the same shape as map_to_graph.
+    With ``compact=True`` the input is in the compact format and is expanded
+    line by line; ``summary`` is then the expanded '>' text.
+    """
+
+    def __init__(self, compact=False):
+        self._builder = RoadmapGraphBuilder()
+        self._expander = CompactExpander() if compact else None
+        self._lines = []
+        self._pending = ""
+
+    def feed_text(self, chunk):
+        """Buffers a text chunk and returns the lines it completed."""
+        self._pending += chunk
+        if "\n" not in self._pending:
+            return []
+        *complete, self._pending = self._pending.split("\n")
+        return [line for line in (self.feed_line(line) for line in complete) if line]
+
+    def feed_line(self, line):
+        """Adds one complete line; returns it stripped (expanded), or None if it added nothing."""
+        line = line.strip()
+        if self._expander is not None:
+            line = self._expander.expand_line(line)
+        if not line:
+            return None
+        self._lines.append(line)
+        self._builder.add_line(line)
+        return line
+
+    def flush(self):
+        """Treats any buffered partial line as complete (call at end of stream)."""
+        pending, self._pending = self._pending, ""
+        line = self.feed_line(pending)
+        return [line] if line else []
+
+    @staticmethod
+    def is_phase_header(line):
+        return bool(PHASE_HEADER_PATTERN.match(line))
+
+    @property
+    def summary(self):
+        return "\n".join(self._lines)
+
+    def snapshot(self):
+        return self._builder.snapshot()
+
+    def to_graph(self):
+        return self._builder.to_graph()
@@ -1,22 +1,123 @@
-from helpers.serpapi_tool import google_search
-from helpers.wikipedia_tool import search_wikipedia
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from helpers import tracing
+from helpers.config import RESEARCH_DEADLINE_SECONDS
+from helpers.context_builder import build_context
+from helpers.serpapi_tool import google_search, agoogle_search
+from helpers.wikipedia_tool import search_wikipedia, asearch_wikipedia, MISSING_SUMMARY_PREFIXES
+
+# Shared across calls so concurrent roadmaps do not each spin up threads.
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="research")
+
+
+def gather_research(topic, deadline=RESEARCH_DEADLINE_SECONDS):
+    """
+    Fetches Google and Wikipedia results for a topic concurrently.
+
+    Each tool enforces its own request timeout; ``deadline`` bounds the total
+    wait. Sources that fail or do not finish in time are reported in
+    ``missing`` (source name -> reason) instead of failing the whole call.
+    """
+    # Copy the context so tool spans land in the caller's trace
+    futures = {
+        _executor.submit(contextvars.copy_context().run, google_search, topic): "google",
+        _executor.submit(contextvars.copy_context().run, search_wikipedia, topic): "wikipedia",
+    }
+    done, not_done = wait(futures, timeout=deadline)
+
+    research = {"google": None, "wikipedia": None, "missing": {}}
+    for future in done:
+        source = futures[future]
+        try:
+            research[source] = future.result()
+        except Exception as e:
+            research["missing"][source] = str(e) or type(e).__name__
+    for future in not_done:
+        # The request itself is bounded by its timeout; we just stop waiting.
+        future.cancel()
+        research["missing"][futures[future]] = f"timed out after {deadline}s"
+
+    return research
+
+
+async def agather_research(topic, deadline=RESEARCH_DEADLINE_SECONDS):
+    """Async variant of gather_research; returns the same dict shape."""
+    tasks = {
+        asyncio.ensure_future(agoogle_search(topic)): "google",
+        asyncio.ensure_future(asearch_wikipedia(topic)): "wikipedia",
+    }
+    done, not_done = await asyncio.wait(tasks, timeout=deadline)
+
+    research = {"google": None, "wikipedia": None, "missing": {}}
+    for task in done:
+        source = tasks[task]
+        try:
+            research[source] = task.result()
+        except Exception as e:
+            research["missing"][source] = str(e) or type(e).__name__
+    for task in not_done:
+        task.cancel()
+        research["missing"][tasks[task]] = f"timed out after {deadline}s"
+
+    return research
+
+
+def format_research(research, topic):
+    """
+    Turns gathered research into the context passed to the synthesizer.
+
+    Passages from every organic result and the Wikipedia extract are
+    deduplicated, ranked and packed into the token budget (see
+    helpers.context_builder). Sources that failed are left out of the
+    context; they are recorded on the current span as ``missing``.
+    """
+    missing = research["missing"]
+    if len(missing) == 2:
+        reasons = "; ".join(f"{source}: {reason}" for source, reason in missing.items())
+        return f"An error occurred during research: {reasons}"
+
+    wiki_text = research["wikipedia"]
+    if wiki_text and wiki_text.startswith(MISSING_SUMMARY_PREFIXES):
+        wiki_text = None
+    result, stats = build_context(topic, research["google"], wiki_text)
+    tracing.record(context_tokens=stats["tokens"], context_passages=stats["passages"],
+                   context_duplicates=stats["duplicates"])
+    if missing:
+        tracing.record(missing="; ".join(f"{source}: {reason}" for source, reason in missing.items()))
+    if not result:
+        result = "No search results found on Google.\n\nNo Wikipedia data found."
+    return result
+
 
 def research_topic(topic):
-    """Fetches information about a topic from Google and Wikipedia."""
-    try:
-        google_data = google_search(topic)
+    """Fetches information about a topic from Google and Wikipedia; returns the context text."""
+    return gather_context(topic)[0]
 
-        # Check if 'organic_results' exists and is non-empty
-        organic_results = google_data.get('organic_results', [])
-        if not organic_results:
-            snippet = "No search results found on Google."
-        else:
-            snippet = organic_results[0].get('snippet', "No snippet available.")
 
-        wiki_data = search_wikipedia(topic) or "No Wikipedia data found."
+async def aresearch_topic(topic):
+    """Async variant of research_topic."""
+    return (await agather_context(topic))[0]
 
-        return f"{snippet}\n\n{wiki_data}"
 
+def gather_context(topic):
+    """
+    Like research_topic, but returns (context, missing): ``missing`` maps
+    each source that failed or timed out to the reason. A context built
+    without some sources must not be cached.
+    """
+    try:
+        research = gather_research(topic)
+        return format_research(research, topic), research["missing"]
     except Exception as e:
-        return f"An error occurred during research: {str(e)}"
+        return f"An error occurred during research: {str(e)}", {}
+
 
+async def agather_context(topic):
+    """Async variant of gather_context."""
+    try:
+        research = await agather_research(topic)
+        return format_research(research, topic), research["missing"]
+    except Exception as e:
+        return f"An error occurred during research: {str(e)}", {}
@@ -1,11 +1,37 @@
 #pip install openai
 #from knowledge_graph_builder.workflows.langgraph_router import generate_roadmap
 
-from helpers.research_api_tool import call_openai
+import threading
 
+from agents.mapper import validate_summary, validate_phase, expand_compact
+from helpers import tracing
+from helpers.config import (
+    SYNTHESIS_ROUTING_ENABLED,
+    SYNTHESIS_FAST_MODEL,
+    SYNTHESIS_LARGE_MODEL,
+    SYNTHESIS_LARGE_EXPECTED_SECONDS,
+    SYNTHESIS_OUTPUT_FORMAT,
+    REFRESH_PHASE_MAX_TOKENS,
+)
+from helpers.research_api_tool import call_openai, acall_openai, stream_openai, OpenAIStreamError
 
-def synthesize_snippet(topic, snippet):
-    prompt = f"""
+# Yielded by stream_synthesis when it discards the fast model's output and
+# starts over with the large model
+SYNTHESIS_RESTART = object()
+# Weight of each new observation in the large model's latency estimate
+LATENCY_SMOOTHING = 0.2
+# Model output is in the compact ID format and is expanded before mapping
+COMPACT_OUTPUT = SYNTHESIS_OUTPUT_FORMAT == "compact"
+
+
+def build_synthesis_prompt(topic, snippet):
+    if COMPACT_OUTPUT:
+        return build_compact_synthesis_prompt(topic, snippet)
+    return build_line_synthesis_prompt(topic, snippet)
+
+
+def build_line_synthesis_prompt(topic, snippet):
+    return f"""
     You are an expert career coach and educator.
 
     Based on the topic: "{topic}", break down the roadmap into clear phases.
@@ -38,4 +64,238 @@ def synthesize_snippet(topic, snippet):
     Format it as a clear hierarchy for building a knowledge graph.
     Encourage commitment and clarity with timelines.
     """
-    return call_openai(prompt)
+
+
+def build_compact_synthesis_prompt(topic, snippet):
+    """
+    Prompt for the compact format: every label is written once, so the
+    completion is much shorter than with the line format.
+    """
+    return f"""
+    You are an expert career coach and educator.
+
+    Based on the topic: "{topic}", break down the roadmap into clear phases.
+
+    Output Format(Strict, compact):
+    Declare every node once as "ID = Label", before the first line that uses it.
+    Phases are P1, P2, ... in order; other nodes use short IDs such as A, B, C.
+    Then give each branch as one line of IDs joined by " > ":
+    Phase -> Prerequisites (subtopic) -> Core Topic/Module -> Tool/Platform/Framework -> ~X months
+    "~X months" is the branch's Estimated Time. Never repeat a label.
+    End with a single 'Total Estimated Time' line.
+
+    Example:
+    P1 = Fundamentals
+    A = Mathematics, Statistics, Programming Basics
+    B = High School Mathematics, Introductory Logic Courses
+    P1 > A > B > ~3 months
+    P2 = Advanced Programming
+    C = Data Structures and Algorithms
+    D = Algorithms, Part I & II by Princeton University on Coursera, Intro to Data Structures and Algorithms by Udacity
+    P2 > C > D > ~4 months
+    Total Estimated Time (X years) Note: ...
+
+    Context:
+    {snippet}
+
+    Encourage commitment and clarity with timelines.
+    """
+
+
+def expand_summary(text):
+    """The model's output in the '>' line format the mapper and cache expect."""
+    if not COMPACT_OUTPUT or not text or text.startswith("Error calling OpenAI API"):
+        return text
+    return expand_compact(text)
+
+
+def build_escalation_prompt(topic, snippet, problems):
+    """Tighter follow-up prompt for the larger model after the fast model's output failed validation."""
+    issues = "\n".join(f"    - {problem}" for problem in problems)
+    if COMPACT_OUTPUT:
+        phase_line, estimate = 'a declaration "PN = Title"', '"~X months"'
+    else:
+        phase_line, estimate = 'a line "Phase N: Title"', '"Estimated Time (X months)"'
+    return build_synthesis_prompt(topic, snippet) + f"""
+    A previous answer could not be turned into a graph because:
+{issues}
+
+    Strict requirements:
+    - Output only roadmap lines: no introduction, numbering, bullets, markdown or blank commentary.
+    - Start every phase with {phase_line}, numbered from 1 without gaps.
+    - Every phase has at least one "A > B" line, and each branch ends in {estimate}.
+    - End with exactly one line starting with "Total Estimated Time".
+    """
+
+
+# Running estimate of the large model's latency, for recording routing savings
+_large_latency = {"seconds": SYNTHESIS_LARGE_EXPECTED_SECONDS}
+_large_latency_lock = threading.Lock()
+
+
+def _observe_large_latency(seconds):
+    with _large_latency_lock:
+        _large_latency["seconds"] += LATENCY_SMOOTHING * (seconds - _large_latency["seconds"])
+
+
+def _record_route(route, fast_seconds, problems):
+    """Records the routing decision on the current (synthesis) span."""
+    with _large_latency_lock:
+        expected_large = _large_latency["seconds"]
+    # Accepted fast output saves a large-model call; an escalation wasted the fast one.
+    # Savings and waste are recorded separately, each non-negative.
+    saved = expected_large - fast_seconds if route == "fast" else -fast_seconds
+    tracing.record(
+        route=route,
+        fast_model=SYNTHESIS_FAST_MODEL,
+        large_model=SYNTHESIS_LARGE_MODEL,
+        validation="; ".join(problems) if problems else "ok",
+        saved_seconds=round(max(saved, 0.0), 3),
+        wasted_seconds=round(max(-saved, 0.0), 3),
+    )
+
+
+def synthesize_snippet(topic, snippet):
+    """
+    Synthesizes the roadmap text, trying the fast model first.
+
+    Output that fails validate_summary is regenerated by the large model
+    with a tighter prompt. With routing disabled the large model is used
+    directly. The result is always in the '>' line format.
+    """
+    prompt = build_synthesis_prompt(topic, snippet)
+    if not SYNTHESIS_ROUTING_ENABLED:
+        return expand_summary(call_openai(prompt, model=SYNTHESIS_LARGE_MODEL))
+
+    with tracing.span("synthesis_fast", model=SYNTHESIS_FAST_MODEL) as fast_span:
+        summary = expand_summary(call_openai(prompt, model=SYNTHESIS_FAST_MODEL))
+        problems = validate_summary(summary)
+        fast_span.set(valid=not problems)
+    if not problems:
+        _record_route("fast", fast_span.duration, problems)
+        return summary
+
+    with tracing.span("synthesis_escalated", model=SYNTHESIS_LARGE_MODEL) as large_span:
+        summary = expand_summary(
+            call_openai(build_escalation_prompt(topic, snippet, problems), model=SYNTHESIS_LARGE_MODEL)
+        )
+        large_span.set(valid=not validate_summary(summary))
+    _observe_large_latency(large_span.duration)
+    _record_route("escalated", fast_span.duration, problems)
+    return summary
+
+
+def stream_synthesis(topic, snippet):
+    """
+    Yields the synthesized roadmap text chunk by chunk as the model produces it.
+    Chunks are raw model output, so in the compact format they still need
+    expanding (IncrementalMapper(compact=True) or expand_summary).
+
+    Routed like synthesize_snippet. When the fast model's output fails
+    validation (or its stream fails), SYNTHESIS_RESTART is yielded before
+    the large model's chunks: everything streamed so far must be discarded.
+    A failed large-model stream raises OpenAIStreamError.
+    """
+    prompt = build_synthesis_prompt(topic, snippet)
+    if not SYNTHESIS_ROUTING_ENABLED:
+        yield from stream_openai(prompt, model=SYNTHESIS_LARGE_MODEL)
+        return
+
+    chunks = []
+    with tracing.span("synthesis_fast", model=SYNTHESIS_FAST_MODEL) as fast_span:
+        try:
+            for chunk in stream_openai(prompt, model=SYNTHESIS_FAST_MODEL):
+                chunks.append(chunk)
+                yield chunk
+            problems = validate_summary(expand_summary("".join(chunks)))
+        except OpenAIStreamError as e:
+            fast_span.set(error=str(e))
+            problems = ["model call failed"]
+        fast_span.set(valid=not problems)
+    if not problems:
+        _record_route("fast", fast_span.duration, problems)
+        return
+
+    yield SYNTHESIS_RESTART
+    chunks = []
+    with tracing.span("synthesis_escalated", model=SYNTHESIS_LARGE_MODEL) as large_span:
+        for chunk in stream_openai(build_escalation_prompt(topic, snippet, problems), model=SYNTHESIS_LARGE_MODEL):
+            chunks.append(chunk)
+            yield chunk
+        large_span.set(valid=not validate_summary(expand_summary("".join(chunks))))
+    _observe_large_latency(large_span.duration)
+    _record_route("escalated", fast_span.duration, problems)
+
+
+async def asynthesize_snippet(topic, snippet):
+    """Async variant of synthesize_snippet."""
+    prompt = build_synthesis_prompt(topic, snippet)
+    if not SYNTHESIS_ROUTING_ENABLED:
+        return expand_summary(await acall_openai(prompt, model=SYNTHESIS_LARGE_MODEL))
+
+    with tracing.span("synthesis_fast", model=SYNTHESIS_FAST_MODEL) as fast_span:
+        summary = expand_summary(await acall_openai(prompt, model=SYNTHESIS_FAST_MODEL))
+        problems = validate_summary(summary)
+        fast_span.set(valid=not problems)
+    if not problems:
+        _record_route("fast", fast_span.duration, problems)
+        return summary
+
+    with tracing.span("synthesis_escalated", model=SYNTHESIS_LARGE_MODEL) as large_span:
+        summary = expand_summary(
+            await acall_openai(build_escalation_prompt(topic, snippet, problems), model=SYNTHESIS_LARGE_MODEL)
+        )
+        large_span.set(valid=not validate_summary(summary))
+    _observe_large_latency(large_span.duration)
+    _record_route("escalated", fast_span.duration, problems)
+    return summary
+
+
+def build_phase_prompt(topic, headers, header, lines, passages):
+    """
+    Prompt to rewrite one phase of an existing roadmap from changed research.
+    Always in the '>' line format: a phase is short, and its lines are
+    spliced back into the stored summary.
+    """
+    outline = "\n".join(f"    {other}" for other in headers)
+    current = "\n".join(f"    {line}" for line in lines)
+    context = "\n\n".join(passages)
+    return f"""
+    You are an expert career coach and educator.
+
+    The roadmap for the topic "{topic}" has these phases:
+{outline}
+
+    New research affects the phase "{header}". Its current lines are:
+{current}
+
+    Rewrite only this phase so it reflects the new research below. Keep what is still accurate.
+
+    Output Format(Strict, Multi-line for hierarchy):
+    Start with the line "{header}" exactly, then one line per connection, in the same
+    format as the current lines ("A > B"), ending each branch in "Estimated Time (X months)".
+    Do not output other phases, a 'Total Estimated Time' line or any commentary.
+
+    New research:
+    {context}
+    """
+
+
+async def aresynthesize_phase(topic, headers, header, lines, passages):
+    """
+    Re-synthesizes one phase; returns its new lines, or None if no model
+    produced a valid phase (the caller keeps the old lines). Routed like
+    asynthesize_snippet, with a much smaller completion.
+    """
+    prompt = build_phase_prompt(topic, headers, header, lines, passages)
+    models = [SYNTHESIS_FAST_MODEL, SYNTHESIS_LARGE_MODEL] if SYNTHESIS_ROUTING_ENABLED else [SYNTHESIS_LARGE_MODEL]
+    for model in models:
+        with tracing.span("synthesis_phase", model=model, phase=header) as span:
+            text = await acall_openai(prompt, model=model, max_tokens=REFRESH_PHASE_MAX_TOKENS)
+            problems = validate_phase(text, header)
+            span.set(valid=not problems)
+            if problems:
+                span.set(validation="; ".join(problems))
+        if not problems:
+            return [line.strip() for line in text.split("\n") if line.strip()]
+    return None
@@ -1,36 +1,154 @@
+import base64
 import streamlit as st
-from workflows.langgraph_router import generate_roadmap
-from helpers.graphviz_exporter import export_to_graphviz
+from helpers import tracing
+from helpers.config import JOB_SERVICE_URL, METRICS_PORT, RENDER_LARGE_GRAPH_NODES
+from helpers.render_cache import dot_source, render_graph, start_render
+from helpers.roadmap_graph import RoadmapGraph
+
+if JOB_SERVICE_URL:
+    # Generation runs in the job service's workers; this session only submits and renders
+    from helpers.job_client import JobClient
+
+    _job_client = JobClient(JOB_SERVICE_URL)
+    generate_roadmap, stream_roadmap = _job_client.generate_roadmap, _job_client.stream_roadmap
+    refresh_roadmap = None  # Refreshes run in-process only
+else:
+    from workflows.langgraph_router import generate_roadmap, stream_roadmap, refresh_roadmap
 
 st.set_page_config(page_title="Career Roadmap Generator", layout="wide")
 
+if METRICS_PORT:
+    tracing.serve_metrics(METRICS_PORT)  # Started once per process, not per rerun
+
 st.title("🚀 Career Path Roadmap Generator")
 topic = st.text_input("🎯 Enter a career topic (e.g., Data Scientist, DevOps Engineer)")
 
 # Add a checkbox to toggle debug output
 show_debug_output = st.checkbox("Show Raw Synthesis Output (for Debugging)", value=False)
+# Stream the synthesis and redraw the graph phase by phase as it arrives
+stream_output = st.checkbox("Stream roadmap as it is generated", value=True)
+# Re-research the topic and regenerate only the phases the new research changes
+refresh = refresh_roadmap is not None and st.button("🔄 Refresh with the latest research")
+
+
+def show_svg(placeholder, svg, graph_data, highlight=None, persist=True):
+    """Shows a server-side SVG; falls back to browser layout for small graphs."""
+    if svg is not None:
+        encoded = base64.b64encode(svg).decode("ascii")
+        placeholder.markdown(f'<img src="data:image/svg+xml;base64,{encoded}" style="max-width:100%"/>',
+                             unsafe_allow_html=True)
+    elif RoadmapGraph.from_dict(graph_data).num_nodes <= RENDER_LARGE_GRAPH_NODES:
+        # Graphviz not installed locally or layout failed: let the browser lay it out
+        placeholder.graphviz_chart(dot_source(graph_data, highlight, persist)[1])
+    else:
+        placeholder.warning("⚠️ Graph is too large to lay out in time. Use the debug DOT output to render it offline.")
+
+
+def show_graph(placeholder, graph_data, highlight=None):
+    """Shows the cached server-side SVG of a finished roadmap."""
+    show_svg(placeholder, render_graph(graph_data, fmt="svg", highlight=highlight), graph_data, highlight)
+
+
+def stream_into_page(topic, graph_placeholder, text_placeholder):
+    """
+    Consumes stream_roadmap, redrawing the partial graph; returns the final result.
+
+    Partial graphs are laid out in the background and kept out of the disk
+    cache. While one is being laid out, newer ones are skipped, so tokens
+    keep streaming and the next redraw shows the latest graph.
+    """
+    streamed_text = ""
+    layout = None  # (future of the SVG, partial graph) being laid out
+    for event in stream_roadmap(topic):
+        if layout is not None and layout[0].done():
+            show_svg(graph_placeholder, layout[0].result(), layout[1], persist=False)
+            layout = None
+        if event["type"] == "token":
+            streamed_text += event["text"]
+            if text_placeholder is not None:
+                text_placeholder.code(streamed_text)
+        elif event["type"] == "graph":
+            if layout is None:
+                layout = (start_render(event["graph"], fmt="svg", persist=False), event["graph"])
+        elif event["type"] == "restart":
+            # The fast model's draft failed validation; a larger model is redoing it
+            streamed_text = ""
+            layout = None
+            graph_placeholder.info("Refining the roadmap with a larger model...")
+        elif event["type"] == "done":
+            return event["result"]
+    return {"error": "Generation ended without a result"}
+
 
 if topic:
-    graph_data = generate_roadmap(topic)
+    debug_area = st.container()
+    graph_header = st.empty()
+    graph_placeholder = st.empty()
+
+    if refresh:
+        graph_header.subheader("📊 Career Roadmap Graph (refreshing...)")
+        graph_data = refresh_roadmap(topic)
+    elif stream_output:
+        graph_header.subheader("📊 Career Roadmap Graph (generating...)")
+        text_placeholder = debug_area.empty() if show_debug_output else None
+        graph_data = stream_into_page(topic, graph_placeholder, text_placeholder)
+        if text_placeholder is not None:
+            text_placeholder.empty()
+    else:
+        graph_data = generate_roadmap(topic)
 
     #st.subheader("🧠 Raw Output (for Debugging)")
     #st.json(graph_data)
 
+    trace = graph_data.pop("trace", None)
+    if 'topic_match' in graph_data:
+        match = graph_data['topic_match']
+        st.info(f"Showing the existing roadmap for \"{match['topic']}\" (similarity {match['score']:.2f}).")
+    # Nodes added by a refresh are outlined in the graph
+    highlight = graph_data.get('delta', {}).get('nodes_added')
+    if 'refresh' in graph_data:
+        report = graph_data['refresh']
+        regenerated = len(report['phases_regenerated'])
+        what = {"unchanged": "No phase was affected by the new research",
+                "phases": f"Regenerated {regenerated} of {report['phases']} phases",
+                "full": f"Regenerated the whole roadmap ({report['reason']})"}[report['mode']]
+        st.info(f"{what}: +{report['nodes_added']}/-{report['nodes_removed']} nodes, "
+                f"+{report['edges_added']}/-{report['edges_removed']} edges.")
+
     if 'error' in graph_data:
+        graph_header.empty()
+        graph_placeholder.empty()
         st.error(graph_data['error'])
     else:
         if show_debug_output:
-            st.subheader("Raw Synthesis Output (for Debugging)")
-            st.code(graph_data.get('summary', "Summary not available."))
+            debug_area.subheader("Raw Synthesis Output (for Debugging)")
+            debug_area.code(graph_data.get('summary', "Summary not available."))
             # Display raw DOT string for debugging graph layout
-            st.subheader("Raw Graphviz DOT Output (for Debugging)")
-            dot = export_to_graphviz(graph_data)
-            st.code(dot.source) # Display the raw .dot source
+            debug_area.subheader("Raw Graphviz DOT Output (for Debugging)")
+            debug_area.code(dot_source(graph_data, highlight)[1]) # Cached, so this does not rebuild the graph
 
         if 'nodes' in graph_data and 'edges' in graph_data:
-            st.subheader("📊 Career Roadmap Graph")
-            # We re-render here to avoid issues if the above debug display consumes the dot object
-            dot = export_to_graphviz(graph_data)
-            st.graphviz_chart(dot)
+            graph_header.subheader("📊 Career Roadmap Graph")
+            # Rendering spans are added to the request's trace
+            with tracing.use(trace):
+                show_graph(graph_placeholder, graph_data, highlight)
+            # The PNG is only laid out once a download is asked for
+            graph_key = dot_source(graph_data, highlight)[0]
+            if st.button("Prepare PNG download"):
+                st.session_state["png_requested"] = graph_key
+            if st.session_state.get("png_requested") == graph_key:
+                with tracing.use(trace):
+                    png = render_graph(graph_data, fmt="png", highlight=highlight)
+                if png is not None:
+                    st.download_button("Download PNG", png, file_name="career_roadmap.png", mime="image/png")
+                else:
+                    st.warning("⚠️ The PNG could not be rendered.")
         else:
-            st.warning("⚠️ Graph format incorrect. Expected 'nodes' and 'edges'.")
\ No newline at end of file
+            graph_header.empty()
+            graph_placeholder.empty()
+            st.warning("⚠️ Graph format incorrect. Expected 'nodes' and 'edges'.")
+
+    if show_debug_output and trace is not None:
+        debug_area.subheader("Timing (for Debugging)")
+        debug_area.caption(f"Trace {trace.id}: {trace.duration * 1000:.0f} ms to generate")
+        debug_area.dataframe(trace.table(), use_container_width=True)
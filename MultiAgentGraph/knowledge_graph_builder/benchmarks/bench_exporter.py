@@ -0,0 +1,44 @@
+"""
+DOT generation benchmark for export_to_graphviz.
+
+Builds synthetic roadmaps of roughly 1k, 10k and 50k nodes and times how long
+it takes to produce the DOT source. Runs offline; only the graphviz Python
+package is needed (the Graphviz binaries are not invoked).
+
+Usage (from the knowledge_graph_builder directory):
+    python -m benchmarks.bench_exporter
+    python -m benchmarks.bench_exporter --sizes 1000 10000 50000 100000
+"""
+import argparse
+import time
+
+from agents.mapper import build_roadmap_graph
+from helpers.graphviz_exporter import export_to_graphviz
+from benchmarks.synthetic import make_summary_with_nodes
+
+
+def time_export(graph, repeat=3):
+    """Best-of-``repeat`` seconds to build the Digraph and render its DOT source."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        export_to_graphviz(graph).source
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark DOT generation at several graph sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'nodes':>8} {'edges':>8} {'seconds':>9} {'us/node':>9}")
+    for size in args.sizes:
+        graph = build_roadmap_graph(make_summary_with_nodes(size))
+        seconds = time_export(graph, repeat=args.repeat)
+        print(f"{graph.num_nodes:>8} {graph.num_edges:>8} {seconds:>9.3f} {seconds / graph.num_nodes * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Merge latency of the cross-roadmap knowledge graph (helpers.graph_merge).
+
+Merges --roadmaps synthetic roadmaps into one MergedGraph. Their labels mix
+a long tail of rare skills with reworded variants of common ones ("Python",
+"Python Programming", "Programming Basics (Python)"), so both merges and
+new nodes happen throughout. Prints per-roadmap merge latency as the graph
+grows, then times the level-of-detail export of the final graph. Runs
+offline; the default run grows the graph to about a million nodes.
+
+Usage (from the knowledge_graph_builder directory):
+    python -m benchmarks.bench_graph_merge
+    python -m benchmarks.bench_graph_merge --roadmaps 20000 --nodes-per-roadmap 30
+"""
+import argparse
+import random
+import statistics
+import time
+
+from helpers.graph_merge import MergedGraph
+from helpers.graphviz_exporter import export_to_graphviz
+from helpers.roadmap_graph import RoadmapGraph
+
+COMMON_SKILLS = ("Python", "SQL", "Statistics", "Linux", "Git", "Docker", "Kubernetes", "Spark",
+                 "Machine Learning", "Data Structures", "Algorithms", "Networking", "Cloud Computing")
+VARIANTS = ("{}", "{} Programming", "Programming Basics ({})", "Introduction to {}", "{} Fundamentals",
+            "Advanced {}", "{} Essentials")
+
+
+def make_roadmap(rng, phases, nodes_per_roadmap, vocabulary):
+    """A RoadmapGraph of ``phases`` chains; about a third of its labels are common skills."""
+    graph = RoadmapGraph()
+    per_phase = max(1, nodes_per_roadmap // phases)
+    for phase in range(1, phases + 1):
+        previous = graph.intern(f"Phase {phase}: Stage {phase}")
+        header = previous
+        for _ in range(per_phase):
+            if rng.random() < 0.33:
+                label = rng.choice(VARIANTS).format(rng.choice(COMMON_SKILLS))
+            else:
+                words = [f"w{rng.randrange(vocabulary)}" for _ in range(rng.randint(2, 4))]
+                label = " ".join(words).title()
+            node = graph.intern(label)
+            graph.assign_phase(node, header)
+            graph.add_edge(previous, node)
+            previous = node
+        estimate = graph.intern(f"Estimated Time ({rng.randint(1, 6)} months)")
+        graph.add_edge(previous, estimate)
+    return graph
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark merging roadmaps into one knowledge graph.")
+    parser.add_argument("--roadmaps", type=int, default=40000)
+    parser.add_argument("--nodes-per-roadmap", type=int, default=40)
+    parser.add_argument("--phases", type=int, default=5)
+    parser.add_argument("--vocabulary", type=int, default=2000000, help="Distinct rare words")
+    parser.add_argument("--reports", type=int, default=5, help="Latency reports while the graph grows")
+    parser.add_argument("--max-nodes", type=int, default=400, help="Node budget of the exported view")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    merged = MergedGraph()
+    every = max(1, args.roadmaps // args.reports)
+    latencies = []
+    for index in range(args.roadmaps):
+        graph = make_roadmap(rng, args.phases, args.nodes_per_roadmap, args.vocabulary)
+        started = time.perf_counter()
+        merged.merge(f"Role {index}", graph)
+        latencies.append(time.perf_counter() - started)
+        if (index + 1) % every == 0:
+            latencies.sort()
+            print(f"{index + 1:7d} roadmaps  {merged.num_nodes:9,d} nodes  {merged.num_edges:9,d} edges  "
+                  f"merge p50 {statistics.median(latencies) * 1e3:6.2f}ms  "
+                  f"p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1e3:6.2f}ms")
+            latencies = []
+
+    started = time.perf_counter()
+    view = merged.to_roadmap_graph(max_nodes=args.max_nodes)
+    print(f"level-of-detail view: {view.num_nodes} nodes, {view.num_edges} edges "
+          f"in {time.perf_counter() - started:.2f}s")
+    started = time.perf_counter()
+    source = export_to_graphviz(view, splines="line").source
+    print(f"export_to_graphviz: {len(source):,d} bytes of DOT in {(time.perf_counter() - started) * 1e3:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Bulk insert and query latency benchmark for the roadmap graph store.
+
+Bulk-loads synthetic roadmaps into a temporary store (15k roadmaps, about
+1.3M edges by default), then times label, neighbourhood, shared-node and
+shortest-path queries. Short labels make many nodes shared between roadmaps,
+as real ones are. Runs offline.
+
+Usage (from the knowledge_graph_builder directory):
+    python -m benchmarks.bench_graph_store
+    python -m benchmarks.bench_graph_store --roadmaps 50000 --queries 200
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from agents.mapper import build_roadmap_graph
+from benchmarks.synthetic import make_roadmap_summary
+from helpers.graph_store import GraphStore
+
+
+def _timed(function, count):
+    latencies = []
+    for index in range(count):
+        started = time.perf_counter()
+        function(index)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return (f"p50 {statistics.median(latencies) * 1e3:.2f}ms  "
+            f"p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1e3:.2f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the roadmap graph store.")
+    parser.add_argument("--roadmaps", type=int, default=15000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        store = GraphStore(os.path.join(directory, "graphs.sqlite"), bulk_size=500)
+
+        # Only time spent in the store counts, not generating and mapping summaries
+        generating = 0.0
+        started = time.perf_counter()
+        with store.bulk():
+            for index in range(args.roadmaps):
+                generated = time.perf_counter()
+                summary = make_roadmap_summary(label_length=24, seed=args.seed + index)
+                graph = build_roadmap_graph(summary)
+                generating += time.perf_counter() - generated
+                store.add_roadmap(f"topic {index}", graph, summary)
+        elapsed = time.perf_counter() - started - generating
+        stats = store.stats()
+        print(f"Stored {stats['roadmaps']} roadmaps: {stats['nodes']} nodes, {stats['edges']} edges "
+              f"in {elapsed:.1f}s ({stats['edges'] / elapsed:,.0f} edges/s)")
+
+        terms = ["python", "cloud", "security", "databases", "linux"]
+        labels = [label for label, _ in store.most_shared_nodes(limit=50)]
+        topics = [f"topic {rng.randrange(args.roadmaps)}" for _ in range(args.queries)]
+        print(f"roadmaps_with      {_timed(lambda i: store.roadmaps_with(terms[i % len(terms)], limit=50), args.queries)}")
+        print(f"neighbours (all)   {_timed(lambda i: store.neighbours(labels[i % len(labels)], 'both'), args.queries)}")
+        print(f"neighbours (topic) {_timed(lambda i: store.neighbours('Phase 2', topic=topics[i]), args.queries)}")
+        print(f"shared_nodes       {_timed(lambda i: store.shared_nodes(topics[i], topics[-i - 1]), args.queries)}")
+        print(f"shortest_path      {_timed(lambda i: store.shortest_path('Phase 1', 'Total Estimated Time', topic=topics[i]), args.queries)}")
+        print(f"get_graph          {_timed(lambda i: store.get_graph(topics[i]), args.queries)}")
+        print(f"most_shared_nodes  {_timed(lambda i: store.most_shared_nodes(limit=20), 3)}")
+
+
+if __name__ == "__main__":
+    main()
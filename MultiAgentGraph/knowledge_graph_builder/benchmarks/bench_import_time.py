@@ -0,0 +1,118 @@
+"""
+Import-time (cold start) regression benchmark.
+
+Imports what the Streamlit app and the batch workers load at startup in fresh
+interpreters under ``python -X importtime``. It reports the median import
+time and the slowest modules, and fails if a module that should only load on
+first use (API clients, HTTP libraries, Graphviz, the tokenizer) is imported
+at startup. Streamlit itself is left out: the app cannot start without it.
+
+Usage (from the knowledge_graph_builder directory):
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --save-baseline .cache/import_baseline.json
+    python -m benchmarks.bench_import_time --baseline .cache/import_baseline.json --tolerance 1.2
+
+Exits with status 1 on a deferred-module or baseline regression.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# What each entry point imports before it can do any work
+TARGETS = {
+    "app": ("workflows.langgraph_router", "helpers.render_cache", "helpers.tracing", "helpers.config"),
+    "batch_worker": ("workflows.batch_runner",),
+}
+
+# Modules that must only be imported on first use
+DEFERRED_MODULES = ("openai", "requests", "httpx", "graphviz", "tiktoken", "http.server")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(code, importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    completed = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True)
+    return completed
+
+
+def parse_importtime(stderr):
+    """Returns (total microseconds, [(self us, cumulative us, module), ...]) from -X importtime output."""
+    modules = []
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((int(self_us), int(cumulative_us), name.strip()))
+        # Top-level imports (not indented) add up to the whole import
+        if not name[1:].startswith(" "):
+            total += int(cumulative_us)
+    return total, modules
+
+
+def profile(modules, repeat):
+    code = "; ".join(f"import {module}" for module in modules)
+    totals, profiles = [], []
+    for _ in range(repeat):
+        total, imported = parse_importtime(_run(code, importtime=True).stderr)
+        totals.append(total)
+        profiles.append(imported)
+    return statistics.median(totals), profiles[totals.index(min(totals))]
+
+
+def loaded_deferred(modules):
+    code = (
+        "import json, sys; "
+        + "; ".join(f"import {module}" for module in modules)
+        + f"; print(json.dumps([m for m in {list(DEFERRED_MODULES)!r} if m in sys.modules]))"
+    )
+    return json.loads(_run(code).stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure startup import time of the app and batch workers.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list per target")
+    parser.add_argument("--baseline", help="JSON file from --save-baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="Fail if a target is slower than baseline by more than this factor")
+    parser.add_argument("--save-baseline", help="Write the measured times to this JSON file")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+
+    failed = False
+    results = {}
+    for name, modules in TARGETS.items():
+        median_us, imported = profile(modules, args.repeat)
+        results[name] = median_us
+        print(f"{name}: {median_us / 1000:.1f} ms median over {args.repeat} runs")
+        for self_us, cumulative_us, module in sorted(imported, reverse=True)[:args.top]:
+            print(f"    {self_us / 1000:>7.2f} ms self {cumulative_us / 1000:>8.2f} ms cumulative  {module}")
+
+        eager = loaded_deferred(modules)
+        if eager:
+            failed = True
+            print(f"    FAIL: imported at startup: {', '.join(eager)}")
+        if name in baseline and median_us > baseline[name] * args.tolerance:
+            failed = True
+            print(f"    FAIL: {median_us / 1000:.1f} ms vs baseline {baseline[name] / 1000:.1f} ms")
+
+    if args.save_baseline:
+        directory = os.path.dirname(args.save_baseline)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.save_baseline, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
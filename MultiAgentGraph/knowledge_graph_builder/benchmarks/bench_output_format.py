@@ -0,0 +1,139 @@
+"""
+Completion size of the line and compact synthesis output formats.
+
+Writes the same synthetic roadmaps in both formats, checks that they map to
+the same graph, and compares their token counts (with the synthesis model's
+tokenizer), the decode time those tokens imply at a given generation speed,
+and parsing time. Runs offline.
+
+With --live TOPIC both prompts are also sent to the API once each (needs
+OPENAI_API_KEY, or a recorded cassette in replay mode) and the measured
+completion tokens and wall time are reported.
+
+Usage (from the knowledge_graph_builder directory):
+    python -m benchmarks.bench_output_format
+    python -m benchmarks.bench_output_format --tokens-per-second 40 --live "Data Scientist"
+"""
+import argparse
+import string
+import time
+
+from agents.mapper import build_roadmap_graph, expand_compact, PHASE_PATTERN
+from agents.synthesizer import build_line_synthesis_prompt, build_compact_synthesis_prompt
+from benchmarks.synthetic import make_roadmap_summary
+from helpers import tracing
+from helpers.context_builder import count_tokens
+
+SHAPES = (
+    ("small", dict(phases=3, fan_out=2, depth=3, label_length=30)),
+    ("typical", dict(phases=5, fan_out=3, depth=3, label_length=40)),
+    ("large", dict(phases=8, fan_out=4, depth=3, label_length=50)),
+)
+
+
+def _node_id(index):
+    # A, B, ..., Z, AA, AB, ...
+    letters = string.ascii_uppercase
+    node_id = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        node_id = letters[remainder] + node_id
+    return node_id
+
+
+def to_compact(chained_summary):
+    """Rewrites a chained '>' summary (one branch per line) in the compact format."""
+    ids = {}
+    lines = []
+    for line in chained_summary.split("\n"):
+        parts = [part.strip() for part in line.split(">")]
+        if len(parts) == 1:
+            # A lone phase header is implied by its "PN = Title" declaration
+            if not PHASE_PATTERN.match(line):
+                lines.append(line)
+            continue
+        chain = []
+        for part in parts:
+            if part.startswith("Estimated Time (") and part.endswith(")"):
+                chain.append("~" + part[len("Estimated Time ("):-1])
+                continue
+            if part not in ids:
+                phase_match = PHASE_PATTERN.match(part)
+                if phase_match:
+                    ids[part] = "P" + phase_match.group(1)[6:]
+                    lines.append(f"{ids[part]} = {phase_match.group(2)}")
+                else:
+                    ids[part] = _node_id(len(ids) - sum(1 for key in ids if PHASE_PATTERN.match(key)))
+                    lines.append(f"{ids[part]} = {part}")
+            chain.append(ids[part])
+        lines.append(" > ".join(chain))
+    return "\n".join(lines)
+
+
+def _best_seconds(function, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _same_graph(first, second):
+    return first.labels == second.labels and sorted(first.edges()) == sorted(second.edges())
+
+
+def compare_offline(tokens_per_second):
+    print(f"{'shape':>8} {'nodes':>6} {'line tok':>9} {'compact tok':>12} {'saved':>7} "
+          f"{'line s':>7} {'compact s':>10} {'line parse':>11} {'compact parse':>14}")
+    for name, shape in SHAPES:
+        lines = make_roadmap_summary(**shape)
+        compact = to_compact(make_roadmap_summary(chained=True, **shape))
+        graph = build_roadmap_graph(lines)
+        if not _same_graph(graph, build_roadmap_graph(expand_compact(compact))):
+            raise SystemExit(f"{name}: compact output maps to a different graph")
+
+        line_tokens, compact_tokens = count_tokens(lines), count_tokens(compact)
+        line_parse = _best_seconds(lambda: build_roadmap_graph(lines))
+        compact_parse = _best_seconds(lambda: build_roadmap_graph(expand_compact(compact)))
+        print(f"{name:>8} {graph.num_nodes:>6} {line_tokens:>9} {compact_tokens:>12} "
+              f"{1 - compact_tokens / line_tokens:>7.0%} "
+              f"{line_tokens / tokens_per_second:>7.1f} {compact_tokens / tokens_per_second:>10.1f} "
+              f"{line_parse * 1e3:>9.2f}ms {compact_parse * 1e3:>12.2f}ms")
+
+
+def compare_live(topic, model):
+    from helpers.research_api_tool import call_openai
+
+    snippet = f"General knowledge about becoming a {topic}."
+    for name, build in (("line", build_line_synthesis_prompt), ("compact", build_compact_synthesis_prompt)):
+        with tracing.trace("bench_output_format", format=name) as trace:
+            started = time.perf_counter()
+            output = call_openai(build(topic, snippet), model=model)
+            seconds = time.perf_counter() - started
+        if output.startswith("Error calling OpenAI API"):
+            print(f"{name:>8}: {output}")
+            continue
+        tokens = sum(span.attrs.get("completion_tokens", 0) for span in trace.spans)
+        summary = expand_compact(output) if name == "compact" else output
+        graph = build_roadmap_graph(summary)
+        print(f"{name:>8}: {tokens} completion tokens, {seconds:.1f}s, "
+              f"{graph.num_nodes} nodes, {graph.num_edges} edges")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare line and compact synthesis output formats.")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0,
+                        help="Generation speed used to turn completion tokens into decode time")
+    parser.add_argument("--live", metavar="TOPIC", help="Also measure both prompts against the API for TOPIC")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    args = parser.parse_args(argv)
+
+    compare_offline(args.tokens_per_second)
+    if args.live:
+        compare_live(args.live, args.model)
+
+
+if __name__ == "__main__":
+    main()
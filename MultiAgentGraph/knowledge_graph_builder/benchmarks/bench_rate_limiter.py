@@ -0,0 +1,133 @@
+"""
+Interactive latency and 429s under batch load, with and without the OpenAI rate limiter.
+
+A simulated API enforces requests-per-minute and tokens-per-minute limits
+(continuously refilled buckets, like OpenAI's) and answers over-limit
+requests with 429 and a Retry-After. Batch workers keep it saturated while
+an interactive request arrives every --interactive-every seconds. Each
+scenario runs the same load through helpers.rate_limiter.acall:
+
+    none     no retries, no limiter: a 429 fails the request (the old behaviour)
+    retry    jittered backoff retries only
+    limiter  token buckets with priority lanes, plus retries
+
+Runs offline in real time (about --seconds per scenario). All load comes
+from one process, which owns the whole budget: the limiter's buckets and
+lanes are process-local, so several processes sharing a key each need their
+share (OPENAI_RATE_LIMIT_PROCESSES) and interactive requests only go first
+among the requests of their own process.
+
+Usage (from the knowledge_graph_builder directory):
+    python -m benchmarks.bench_rate_limiter
+    python -m benchmarks.bench_rate_limiter --rpm 600 --tpm 100000 --batch-workers 64 --seconds 15
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from helpers import rate_limiter
+
+MODEL = "simulated-model"
+
+
+class RateLimited(Exception):
+    """What the simulated API raises, shaped like openai.RateLimitError."""
+
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("Rate limit reached")
+        self.response = type("Response", (), {"headers": {"retry-after-ms": str(int(retry_after * 1000))}})()
+
+
+class SimulatedAPI:
+    def __init__(self, rpm, tpm, latency):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.latency = latency
+        self.requests = float(rpm)
+        self.tokens = float(tpm)
+        self.updated = time.monotonic()
+        self.rejected = 0
+        self.accepted_tokens = 0
+
+    async def complete(self, tokens):
+        now = time.monotonic()
+        elapsed, self.updated = now - self.updated, now
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+        if self.requests < 1 or self.tokens < tokens:
+            self.rejected += 1
+            await asyncio.sleep(self.latency / 4)  # A rejection still costs a round trip
+            raise RateLimited(max((1 - self.requests) * 60 / self.rpm, (tokens - self.tokens) * 60 / self.tpm, 0.0))
+        self.requests -= 1
+        self.tokens -= tokens
+        self.accepted_tokens += tokens
+        await asyncio.sleep(self.latency)
+
+
+async def _run_scenario(scenario, args):
+    api = SimulatedAPI(args.rpm, args.tpm, args.latency)
+    rate_limiter.set_limits(MODEL, *((args.rpm, args.tpm) if scenario == "limiter" else (0, 0)))
+    rate_limiter.OPENAI_MAX_RETRIES = 0 if scenario == "none" else args.retries
+    deadline = time.monotonic() + args.seconds
+    outcomes = {rate_limiter.INTERACTIVE: [], rate_limiter.BATCH: []}
+
+    async def request(lane):
+        started = time.monotonic()
+        with rate_limiter.priority(lane):
+            try:
+                await rate_limiter.acall(MODEL, args.tokens, lambda: api.complete(args.tokens))
+                outcomes[lane].append(time.monotonic() - started)
+            except RateLimited:
+                outcomes[lane].append(None)
+
+    async def batch_worker():
+        while time.monotonic() < deadline:
+            await request(rate_limiter.BATCH)
+
+    async def interactive_user():
+        pending = []
+        while time.monotonic() < deadline:
+            pending.append(asyncio.ensure_future(request(rate_limiter.INTERACTIVE)))
+            await asyncio.sleep(args.interactive_every)
+        await asyncio.gather(*pending)
+
+    started = time.monotonic()
+    await asyncio.gather(interactive_user(), *(batch_worker() for _ in range(args.batch_workers)))
+    elapsed = time.monotonic() - started
+
+    interactive = outcomes[rate_limiter.INTERACTIVE]
+    latencies = sorted(latency for latency in interactive if latency is not None)
+    batch_ok = sum(latency is not None for latency in outcomes[rate_limiter.BATCH])
+    limit_tokens = args.tpm * elapsed / 60 + args.tpm  # Refill over the run plus the initial bucket
+    print(f"{scenario:8s} 429s {api.rejected:6d}  "
+          f"interactive failed {interactive.count(None):3d}/{len(interactive):<3d} "
+          f"p50 {statistics.median(latencies) if latencies else float('nan'):6.2f}s "
+          f"p95 {latencies[int(0.95 * (len(latencies) - 1))] if latencies else float('nan'):6.2f}s  "
+          f"batch done {batch_ok:5d}  TPM used {api.accepted_tokens / limit_tokens:5.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the OpenAI rate limiter against a simulated API.")
+    parser.add_argument("--rpm", type=int, default=300)
+    parser.add_argument("--tpm", type=int, default=60000)
+    parser.add_argument("--tokens", type=int, default=250, help="Estimated tokens per request")
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated completion time in seconds")
+    parser.add_argument("--batch-workers", type=int, default=32)
+    parser.add_argument("--interactive-every", type=float, default=0.5)
+    parser.add_argument("--retries", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=8)
+    parser.add_argument("--scenarios", nargs="+", default=["none", "retry", "limiter"],
+                        choices=["none", "retry", "limiter"])
+    args = parser.parse_args(argv)
+
+    # Keep backoff short relative to the run
+    rate_limiter.OPENAI_RETRY_BASE_SECONDS = 0.1
+    for scenario in args.scenarios:
+        asyncio.run(_run_scenario(scenario, args))
+
+
+if __name__ == "__main__":
+    main()
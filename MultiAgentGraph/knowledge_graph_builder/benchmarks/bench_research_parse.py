@@ -0,0 +1,124 @@
+"""
+Parse cost of research responses (helpers.json_fields).
+
+Builds a synthetic full Google engine payload (organic results plus ads,
+related questions, inline images, knowledge graph and pagination) and the
+field-restricted payload SerpAPI returns with json_restrictor, then times
+and memory-profiles (tracemalloc peak) three ways of reading them:
+json.loads of the full payload, extract_fields of the full payload and
+extract_fields of the restricted one. Also reports what extract_fields
+recovers from a full payload cut off at SERPAPI_MAX_BYTES. Runs offline.
+
+Usage (from the knowledge_graph_builder directory):
+    python -m benchmarks.bench_research_parse
+    python -m benchmarks.bench_research_parse --results 100 --repeat 200
+"""
+import argparse
+import gc
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from helpers.config import SERPAPI_MAX_BYTES
+from helpers.json_fields import extract_fields
+from helpers.serpapi_tool import SEARCH_FIELDS
+
+
+def _text(rng, words):
+    return " ".join(f"word{rng.randrange(5000)}" for _ in range(words))
+
+
+def make_payload(rng, results, extras):
+    """A Google engine payload with ``results`` organic results and ``extras`` items per other section."""
+    def result(position):
+        return {
+            "position": position,
+            "title": _text(rng, 8),
+            "link": f"https://example.com/{position}/{_text(rng, 3).replace(' ', '/')}",
+            "displayed_link": "https://example.com",
+            "snippet": _text(rng, 30),
+            "snippet_highlighted_words": _text(rng, 4).split(),
+            "sitelinks": {"inline": [{"title": _text(rng, 3), "link": "https://example.com/a"}] * 4},
+            "about_this_result": {"source": {"description": _text(rng, 40)}},
+            "cached_page_link": "https://webcache.example.com/" + "x" * 120,
+        }
+
+    return {
+        "search_metadata": {"id": "0" * 24, "status": "Success", "json_endpoint": "https://serpapi.com/x" * 3},
+        "search_parameters": {"engine": "google", "q": "data scientist", "google_domain": "google.com"},
+        "search_information": {"total_results": 123000000, "time_taken_displayed": 0.41},
+        "ads": [result(index) for index in range(extras)],
+        "answer_box": {"type": "organic_result", "title": _text(rng, 6), "snippet": _text(rng, 40)},
+        "knowledge_graph": {
+            "title": "Data scientist",
+            "description": _text(rng, 50),
+            "images": [{"image": "data:image/jpeg;base64," + "A" * 2000} for _ in range(extras)],
+        },
+        "inline_images": [{"thumbnail": "data:image/jpeg;base64," + "B" * 3000} for _ in range(extras)],
+        "related_questions": [
+            {"question": _text(rng, 10), "snippet": _text(rng, 60), "list": _text(rng, 40).split()}
+            for _ in range(extras)
+        ],
+        "organic_results": [result(index) for index in range(results)],
+        "related_searches": [{"query": _text(rng, 4), "link": "https://google.com/search"} for _ in range(extras)],
+        "pagination": {"current": 1, "other_pages": {str(page): "https://google.com/search" for page in range(2, 11)}},
+    }
+
+
+def restrict(payload):
+    """The payload as SerpAPI returns it with json_restrictor (see helpers.serpapi_tool)."""
+    restricted = {
+        "organic_results": [
+            {key: item[key] for key in SEARCH_FIELDS["organic_results"]} for item in payload["organic_results"]
+        ],
+        "answer_box": {"snippet": payload["answer_box"]["snippet"]},
+        "knowledge_graph": {"description": payload["knowledge_graph"]["description"]},
+    }
+    return json.dumps(restricted).encode("utf-8")
+
+
+def _measure(func, repeat):
+    """Median wall time over ``repeat`` runs, plus peak traced memory of one run."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark parsing SerpAPI responses.")
+    parser.add_argument("--results", type=int, default=10, help="Organic results per payload")
+    parser.add_argument("--extras", type=int, default=20, help="Items in each of the other sections")
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    payload = make_payload(random.Random(args.seed), args.results, args.extras)
+    full = json.dumps(payload).encode("utf-8")
+    restricted = restrict(payload)
+    cases = {
+        "json.loads (full)": (full, lambda: json.loads(full)),
+        "extract_fields (full)": (full, lambda: extract_fields(full, SEARCH_FIELDS)),
+        "extract_fields (restricted)": (restricted, lambda: extract_fields(restricted, SEARCH_FIELDS)),
+    }
+    for name, (content, func) in cases.items():
+        seconds, peak = _measure(func, args.repeat)
+        print(f"{name:28s} {len(content):9,d} bytes  {seconds * 1e3:7.3f}ms  peak {peak / 1024:8.1f} KiB")
+
+    capped = full[:SERPAPI_MAX_BYTES]
+    data, complete = extract_fields(capped, SEARCH_FIELDS)
+    print(f"capped at {len(capped):,d} bytes: complete={complete}, "
+          f"{len(data.get('organic_results', []))}/{args.results} organic results recovered")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Aggregate query latency of the columnar roadmap store (helpers.roadmap_analytics).
+
+Loads --roadmaps synthetic roadmaps (cycling through --unique distinct
+summaries, spread over a handful of career families) into a RoadmapColumns
+store, then times the vectorized queries. For comparison it also times the
+old way of answering "median total time per family": reparsing each summary
+with the mapper, measured on a sample and extrapolated to all roadmaps.
+Needs numpy; runs offline.
+
+Usage (from the knowledge_graph_builder directory):
+    python -m benchmarks.bench_roadmap_analytics
+    python -m benchmarks.bench_roadmap_analytics --roadmaps 200000 --unique 5000
+"""
+import argparse
+import math
+import os
+import statistics
+import tempfile
+import time
+
+from agents.mapper import build_roadmap_graph
+from benchmarks.synthetic import make_roadmap_summary
+from helpers.roadmap_analytics import RoadmapColumns, TOOL, MODULE, career_family
+from helpers.roadmap_graph import TOTAL_TIME
+
+FAMILIES = ("engineer", "scientist", "analyst", "developer", "administrator", "architect", "designer", "manager")
+
+
+def _timed(function, repeat=5):
+    """Best of ``repeat`` runs, in milliseconds, and the last result."""
+    best = math.inf
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark aggregate queries over the columnar roadmap store.")
+    parser.add_argument("--roadmaps", type=int, default=100000)
+    parser.add_argument("--unique", type=int, default=2000, help="Distinct synthetic summaries to cycle through")
+    parser.add_argument("--reparse-sample", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    summaries = [make_roadmap_summary(phases=3 + seed % 5, fan_out=2 + seed % 3, label_length=30, seed=seed)
+                 for seed in range(args.unique)]
+    graphs = [build_roadmap_graph(summary) for summary in summaries]
+    topics = [f"Role {index} {FAMILIES[index % len(FAMILIES)]}" for index in range(args.roadmaps)]
+
+    columns = RoadmapColumns()
+    started = time.perf_counter()
+    for index, topic in enumerate(topics):
+        columns.add(topic, graphs[index % args.unique])
+    elapsed = time.perf_counter() - started
+    print(f"Added {len(columns)} roadmaps ({len(columns.table('phases')['number'])} phases, "
+          f"{len(columns.table('items')['term'])} items) in {elapsed:.1f}s "
+          f"({len(columns) / elapsed:,.0f} roadmaps/s)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "columns.npz")
+        save_ms, _ = _timed(lambda: columns.save(path), repeat=1)
+        load_ms, loaded = _timed(lambda: RoadmapColumns.load(path), repeat=1)
+        print(f"save {save_ms:8.1f}ms  load {load_ms:8.1f}ms  ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+    # Queries on a freshly loaded store, including the one-off conversion to numpy
+    first_ms, _ = _timed(loaded.median_total_by_family, repeat=1)
+    print(f"median_total_by_family (first) {first_ms:8.1f}ms")
+    for name, query in (
+        ("median_total_by_family", loaded.median_total_by_family),
+        ("median_months_by_phase", loaded.median_months_by_phase),
+        ("phase_duration_histogram", loaded.phase_duration_histogram),
+        ("top_items (tools)", lambda: loaded.top_items(TOOL, limit=10)),
+        ("top_items (modules, family)", lambda: loaded.top_items(MODULE, limit=10, family="engineer")),
+    ):
+        query_ms, _ = _timed(query)
+        print(f"{name:30s} {query_ms:8.1f}ms")
+
+    # The alternative: reparse every summary to find its total
+    def reparse(sample):
+        totals = {}
+        for index in range(sample):
+            graph = build_roadmap_graph(summaries[index % args.unique])
+            months = [graph.months[node] for node in graph.nodes_of_kind(TOTAL_TIME)]
+            totals.setdefault(career_family(topics[index]), []).append(months[0] if months else math.nan)
+        return {family: statistics.median(values) for family, values in totals.items()}
+
+    sample = min(args.reparse_sample, args.roadmaps)
+    reparse_ms, _ = _timed(lambda: reparse(sample), repeat=1)
+    print(f"{'reparsing summaries (est.)':30s} {reparse_ms * args.roadmaps / sample:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Lookup latency benchmark for the fuzzy topic index.
+
+Fills a temporary index with synthetic topics (100k by default), then times
+lookups of near-duplicate and unseen topics. Runs offline.
+
+Usage (from the knowledge_graph_builder directory):
+    python -m benchmarks.bench_topic_index
+    python -m benchmarks.bench_topic_index --topics 100000 --queries 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.synthetic import WORDS
+from helpers.topic_index import TopicIndex, canonical_topic
+
+ROLES = (
+    "engineer", "scientist", "analyst", "developer", "architect", "manager",
+    "administrator", "designer", "specialist", "consultant", "researcher", "tester",
+)
+VARIANTS = ("{} career", "{} roadmap", "how to become a {}", "{}s", "{}")
+
+
+def make_topics(count, seed=0):
+    rng = random.Random(seed)
+    topics, seen = [], set()
+    while len(topics) < count:
+        topic = " ".join(rng.sample(WORDS, rng.randint(1, 3)) + [rng.choice(ROLES)])
+        # A numeric tag keeps 100k topics distinct with a small vocabulary
+        topic = f"{topic} {rng.randint(0, count)}"
+        if topic not in seen:
+            seen.add(topic)
+            topics.append(topic)
+    return topics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark fuzzy topic index lookups.")
+    parser.add_argument("--topics", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    topics = make_topics(args.topics, seed=args.seed)
+    rng = random.Random(args.seed + 1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "topics.sqlite")
+        started = time.perf_counter()
+        index = TopicIndex(path)
+        conn = index._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO topics (key, topic, created_at) VALUES (?, ?, ?)",
+            ((canonical_topic(topic), topic, time.time()) for topic in topics),
+        )
+        conn.commit()
+        index._sync()
+        print(f"Indexed {len(index)} topics in {time.perf_counter() - started:.2f}s")
+
+        # Half are rephrasings of a stored topic (expected match), half unseen
+        queries = []
+        for _ in range(args.queries):
+            if rng.random() < 0.5:
+                topic = rng.choice(topics)
+                queries.append((rng.choice(VARIANTS).format(topic), topic))
+            else:
+                queries.append((" ".join(rng.sample(WORDS, 2) + [rng.choice(ROLES)]), None))
+
+        latencies = []
+        expected = found = 0
+        for query, topic in queries:
+            started = time.perf_counter()
+            match = index.match(query)
+            latencies.append(time.perf_counter() - started)
+            if topic is not None:
+                expected += 1
+                found += match is not None and match[0] == topic
+        latencies.sort()
+        print(f"rephrased topics matched: {found}/{expected}")
+        print(f"lookups: {len(latencies)}  "
+              f"p50 {statistics.median(latencies) * 1e6:.0f}us  "
+              f"p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1e6:.0f}us  "
+              f"p99 {latencies[int(0.99 * (len(latencies) - 1))] * 1e6:.0f}us")
+
+
+if __name__ == "__main__":
+    main()
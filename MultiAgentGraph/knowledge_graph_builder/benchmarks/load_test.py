@@ -0,0 +1,141 @@
+"""
+Offline load test for the full generate_roadmap pipeline.
+
+Runs agenerate_roadmap concurrently against recorded cassettes (replay
+transport), so no API quota or network access is used. Record cassettes
+first with TRANSPORT_MODE=record, or pass --synthesize to write a small set
+of generic ones and serve every topic from them (fallback matching).
+
+The stage cache is disabled so every request goes through research,
+synthesis and mapping.
+
+Usage (from the knowledge_graph_builder directory):
+    TRANSPORT_MODE=record streamlit run app.py               # record real calls
+    python -m benchmarks.load_test --requests 2000 --concurrency 500
+    python -m benchmarks.load_test --synthesize --requests 5000 --concurrency 2000 \\
+        --latency-ms 300 --jitter-ms 100 --error-rate 0.01
+"""
+import os
+
+# Must be set before the pipeline (and its cache singleton) is imported
+os.environ["ROADMAP_CACHE_ENABLED"] = "0"
+
+import argparse
+import asyncio
+import glob
+import json
+import time
+
+from benchmarks.synthetic import make_roadmap_summary
+from helpers import transport
+from helpers.config import CASSETTE_DIR
+from helpers.serpapi_tool import SERPAPI_URL
+from workflows.langgraph_router import agenerate_roadmap
+
+
+def synthesize_cassettes(cassette_dir, count=8, seed=0):
+    """Writes ``count`` generic cassettes per source for fallback replay."""
+    transport.configure(cassette_dir=cassette_dir)
+    for index in range(count):
+        request = {"synthetic": index}
+        search = {"organic_results": [{"snippet": f"Synthetic search result {index} for load testing."}]}
+        wiki = {"extract": f"Synthetic Wikipedia summary {index} for load testing."}
+        transport.save_cassette("serpapi", request, transport.encode_response(
+            200, json.dumps(search).encode("utf-8"), {"content-type": "application/json"}))
+        transport.save_cassette("wikipedia", request, transport.encode_response(
+            200, json.dumps(wiki).encode("utf-8"), {"content-type": "application/json"}))
+        summary = make_roadmap_summary(phases=4 + index % 3, fan_out=3, depth=2, seed=seed + index)
+        transport.save_cassette("openai", request, {"content": summary, "usage": None})
+
+
+def recorded_topics(cassette_dir):
+    """Topics of the recorded SerpAPI cassettes (their "q" parameter)."""
+    topics = []
+    for path in sorted(glob.glob(os.path.join(cassette_dir, "serpapi", "*.json"))):
+        with open(path, "r", encoding="utf-8") as fh:
+            request = json.load(fh)["request"]
+        if request.get("url") == SERPAPI_URL and request.get("params", {}).get("q"):
+            topics.append(request["params"]["q"])
+    return topics
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_load(topics, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = {}
+
+    async def one(index):
+        topic = topics[index % len(topics)]
+        async with semaphore:
+            started = time.perf_counter()
+            result = await agenerate_roadmap(topic)
+            latencies.append(time.perf_counter() - started)
+        if "error" in result:
+            reason = result["error"].split(":")[0]
+            errors[reason] = errors.get(reason, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    return time.perf_counter() - started, sorted(latencies), errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay-mode load test of the roadmap pipeline.")
+    parser.add_argument("--cassette-dir", default=CASSETTE_DIR)
+    parser.add_argument("--topics", metavar="PATH",
+                        help="File with one topic per line (default: topics of the recorded cassettes)")
+    parser.add_argument("--synthesize", action="store_true",
+                        help="Write generic cassettes and replay every topic from them")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean injected latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Std deviation of injected latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls that fail (0-1)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.synthesize:
+        synthesize_cassettes(args.cassette_dir, seed=args.seed)
+    transport.configure(
+        mode="replay",
+        cassette_dir=args.cassette_dir,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        fallback=args.synthesize,
+        seed=args.seed,
+    )
+
+    if args.topics:
+        with open(args.topics, "r", encoding="utf-8") as fh:
+            topics = [line.strip() for line in fh if line.strip()]
+    elif args.synthesize:
+        topics = [f"synthetic topic {index}" for index in range(100)]
+    else:
+        topics = recorded_topics(args.cassette_dir)
+    if not topics:
+        parser.error(f"No topics: record cassettes into {args.cassette_dir} or pass --synthesize")
+
+    elapsed, latencies, errors = asyncio.run(run_load(topics, args.requests, args.concurrency))
+
+    print(f"requests:    {args.requests} ({args.concurrency} concurrent, {len(topics)} topics)")
+    print(f"elapsed:     {elapsed:.2f}s")
+    print(f"throughput:  {args.requests / elapsed:.1f} roadmaps/s")
+    print(f"latency ms:  p50 {_percentile(latencies, 0.50) * 1000:.1f}  "
+          f"p95 {_percentile(latencies, 0.95) * 1000:.1f}  "
+          f"p99 {_percentile(latencies, 0.99) * 1000:.1f}  "
+          f"max {latencies[-1] * 1000 if latencies else 0:.1f}")
+    print(f"errors:      {sum(errors.values())}")
+    for reason, count in sorted(errors.items(), key=lambda item: -item[1]):
+        print(f"  {count:>6}  {reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Offline benchmark suite for the CPU stages (mapper and DOT exporter).
+
+Each case builds a synthetic roadmap summary, then times and memory-profiles
+map_to_graph and export_to_graphviz separately. Results can be saved as a
+JSON baseline and later compared against it; the run fails (exit code 1)
+when any metric regresses by more than the threshold.
+
+Baselines are machine-specific: record and compare them on the same host.
+
+Usage (from the knowledge_graph_builder directory):
+    python -m benchmarks.run_benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json --threshold 0.25
+"""
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+from agents.mapper import map_to_graph, build_roadmap_graph
+from benchmarks.synthetic import make_roadmap_summary
+
+CASES = {
+    # name: make_roadmap_summary keyword arguments
+    "typical": dict(phases=5, fan_out=4, depth=3, label_length=40),
+    "wide": dict(phases=10, fan_out=100, depth=2, label_length=30),
+    "deep": dict(phases=5, fan_out=10, depth=40, label_length=30),
+    "long_labels": dict(phases=8, fan_out=20, depth=3, label_length=200),
+    "merged": dict(phases=50, fan_out=400, depth=3, label_length=30),
+}
+
+
+def _measure(func, repeat):
+    """Median wall time over ``repeat`` runs, plus peak traced memory of one run."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": statistics.median(times), "peak_bytes": peak}
+
+
+def run_case(name, params, repeat=5, include_exporter=True):
+    summary = make_roadmap_summary(**params)
+    graph = build_roadmap_graph(summary)
+    result = {
+        "params": params,
+        "lines": summary.count("\n") + 1,
+        "nodes": graph.num_nodes,
+        "edges": graph.num_edges,
+        "mapper": _measure(lambda: map_to_graph(summary), repeat),
+    }
+    if include_exporter:
+        from helpers.graphviz_exporter import export_to_graphviz
+        result["exporter"] = _measure(lambda: export_to_graphviz(graph).source, repeat)
+    return result
+
+
+def compare(results, baseline, threshold):
+    """Returns a list of human-readable regressions beyond ``threshold`` (a fraction)."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or previous.get("params") != current["params"]:
+            continue
+        for stage in ("mapper", "exporter"):
+            if stage not in current or stage not in previous:
+                continue
+            for metric in ("seconds", "peak_bytes"):
+                before, after = previous[stage][metric], current[stage][metric]
+                if before > 0 and (after - before) / before > threshold:
+                    regressions.append(
+                        f"{name}/{stage}/{metric}: {before:.6g} -> {after:.6g} (+{(after - before) / before:.0%})"
+                    )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mapper and DOT exporter offline.")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per stage (median is kept)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write results as a JSON baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed relative regression before failing (default 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    try:
+        import graphviz  # noqa: F401
+        include_exporter = True
+    except ImportError:
+        print("graphviz package not installed; benchmarking the mapper only.", file=sys.stderr)
+        include_exporter = False
+
+    results = {}
+    print(f"{'case':<12} {'nodes':>7} {'edges':>7} {'stage':<9} {'ms':>9} {'peak KiB':>9}")
+    for name in args.cases:
+        result = run_case(name, CASES[name], repeat=args.repeat, include_exporter=include_exporter)
+        results[name] = result
+        for stage in ("mapper", "exporter"):
+            if stage in result:
+                print(f"{name:<12} {result['nodes']:>7} {result['edges']:>7} {stage:<9} "
+                      f"{result[stage]['seconds'] * 1000:>9.2f} {result[stage]['peak_bytes'] / 1024:>9.0f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("Regressions beyond threshold:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
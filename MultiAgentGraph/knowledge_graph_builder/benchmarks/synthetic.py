@@ -0,0 +1,56 @@
+"""Synthetic roadmap summaries for offline benchmarks."""
+import random
+
+WORDS = (
+    "data", "systems", "cloud", "python", "statistics", "design", "security", "networks",
+    "machine", "learning", "testing", "devops", "databases", "algorithms", "frontend",
+    "backend", "analytics", "containers", "linux", "modeling", "ethics", "product",
+)
+
+
+def _label(rng, prefix, index, label_length):
+    words = [prefix, str(index)]
+    while sum(len(word) + 1 for word in words) < label_length:
+        words.append(rng.choice(WORDS))
+    return " ".join(words)
+
+
+def make_roadmap_summary(phases=5, fan_out=4, depth=3, label_length=40, seed=0, chained=False):
+    """
+    Builds a roadmap summary in the synthesizer's output format.
+
+    Each of ``phases`` phases has ``fan_out`` branches. Each branch is a path of
+    ``depth`` content nodes ending in an "Estimated Time (X months)" leaf.
+    Labels are padded with filler words to about ``label_length`` characters.
+    By default every hop is its own "A > B" line, as the prompt asks for.
+    With ``chained=True`` each branch is one "Phase N: ... > ... > Estimated
+    Time" line. A single "Total Estimated Time" line ends the summary.
+    """
+    rng = random.Random(seed)
+    lines = []
+    total_months = 0
+    for phase in range(1, phases + 1):
+        header = f"Phase {phase}: {_label(rng, 'Stage', phase, label_length)}"
+        lines.append(header)
+        for branch in range(fan_out):
+            path = [header]
+            for level in range(depth):
+                path.append(_label(rng, f"Topic {phase}.{branch}.{level}", level, label_length))
+            months = rng.randint(1, 6)
+            total_months += months
+            path.append(f"Estimated Time ({months} months)")
+            if chained:
+                lines.append(" > ".join(path))
+            else:
+                lines.extend(f"{source} > {target}" for source, target in zip(path, path[1:]))
+    years = max(1, round(total_months / 12))
+    lines.append(f"Total Estimated Time ({years} years) Note: synthetic roadmap")
+    return "\n".join(lines)
+
+
+def make_summary_with_nodes(num_nodes, label_length=20, seed=0):
+    """A summary with roughly ``num_nodes`` unique nodes, spread over ~sqrt(n)/3 phases."""
+    phases = max(2, int(num_nodes ** 0.5 / 3))
+    fan_out = max(1, num_nodes // (phases * 2))
+    return make_roadmap_summary(phases=phases, fan_out=fan_out, depth=2,
+                                label_length=label_length, seed=seed)
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from helpers.config import CACHE_ENABLED, CACHE_PATH, CACHE_TTL_SECONDS, CACHE_MAX_BYTES
+
+
+def normalize_topic(topic):
+    """Case- and whitespace-insensitive form of a topic, used as a cache key."""
+    return " ".join(topic.lower().split())
+
+
+def hash_text(text):
+    """Stable content hash for prompts and summaries."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class StageCache:
+    """
+    Disk-backed, content-addressed cache for the roadmap pipeline stages.
+
+    Entries are stored in a single SQLite table keyed by a hash of the stage
+    name and its key parts. Expired entries (older than ``ttl_seconds``) are
+    treated as misses, and the least recently used entries are evicted once
+    the stored values exceed ``max_bytes``.
+    """
+
+    def __init__(self, path, ttl_seconds=CACHE_TTL_SECONDS, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)")
+        conn.commit()
+        self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared across threads (Streamlit runs
+        # each session in its own thread), so keep one per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(stage, *parts):
+        payload = json.dumps([stage, *parts], ensure_ascii=False)
+        return hash_text(payload)
+
+    def _count(self, stage, outcome):
+        with self._lock:
+            counters = self._counters.setdefault(stage, {"hits": 0, "misses": 0})
+            counters[outcome] += 1
+
+    def get(self, stage, *parts):
+        """Returns the cached value for a stage, or None on a miss or expiry."""
+        key = self.make_key(stage, *parts)
+        conn = self._connection()
+        row = conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+
+        if row is None or now - row[1] > self.ttl_seconds:
+            if row is not None:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                conn.commit()
+            self._count(stage, "misses")
+            return None
+
+        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        conn.commit()
+        self._count(stage, "hits")
+        return json.loads(row[0])
+
+    def contains(self, stage, *parts):
+        """Whether a fresh value is cached for a stage; unlike get, counts no hit or miss."""
+        key = self.make_key(stage, *parts)
+        row = self._connection().execute("SELECT created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttl_seconds
+
+    def set(self, stage, value, *parts):
+        """Stores a JSON-serializable value for a stage and evicts if over budget."""
+        key = self.make_key(stage, *parts)
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        now = time.time()
+
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, stage, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, stage, payload, size, now, now),
+        )
+        conn.commit()
+
+        with self._lock:
+            self._total_bytes += size
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self._evict(conn)
+
+    def _evict(self, conn):
+        # Other processes may share the file, so resync the total before evicting.
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        if total > self.max_bytes:
+            cursor = conn.execute("SELECT key, size FROM entries ORDER BY accessed_at ASC")
+            doomed = []
+            for key, size in cursor:
+                if total <= target:
+                    break
+                doomed.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+            conn.commit()
+        with self._lock:
+            self._total_bytes = total
+
+    def clear(self, stage=None):
+        conn = self._connection()
+        if stage is None:
+            conn.execute("DELETE FROM entries")
+        else:
+            conn.execute("DELETE FROM entries WHERE stage = ?", (stage,))
+        conn.commit()
+        with self._lock:
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def stats(self):
+        """Hit/miss counters per stage for this process, plus stored size."""
+        with self._lock:
+            stages = {stage: dict(counts) for stage, counts in self._counters.items()}
+            total_bytes = self._total_bytes
+        return {"stages": stages, "total_bytes": total_bytes}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the shared stage cache, or None when caching is disabled."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = StageCache(CACHE_PATH)
+    return _cache
@@ -4,3 +4,138 @@ from dotenv import load_dotenv
 load_dotenv()
 SERP_API_KEY = os.getenv("SERP_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# Stage cache (research, synthesis and mapping results)
+CACHE_ENABLED = os.getenv("ROADMAP_CACHE_ENABLED", "1") != "0"
+CACHE_PATH = os.getenv(
+    "ROADMAP_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "roadmap_cache.sqlite"),
+)
+CACHE_TTL_SECONDS = int(os.getenv("ROADMAP_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv("ROADMAP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Research fan-out (seconds)
+SERPAPI_TIMEOUT_SECONDS = float(os.getenv("SERPAPI_TIMEOUT_SECONDS", "8"))
+WIKIPEDIA_TIMEOUT_SECONDS = float(os.getenv("WIKIPEDIA_TIMEOUT_SECONDS", "5"))
+RESEARCH_DEADLINE_SECONDS = float(os.getenv("RESEARCH_DEADLINE_SECONDS", "10"))
+# Research responses: organic results requested from SerpAPI, whether SerpAPI
+# returns only the fields the context builder reads, and the most bytes read
+# of each response
+SERPAPI_NUM_RESULTS = int(os.getenv("SERPAPI_NUM_RESULTS", "10"))
+SERPAPI_FIELD_SELECTION = os.getenv("SERPAPI_FIELD_SELECTION", "1") != "0"
+SERPAPI_MAX_BYTES = int(os.getenv("SERPAPI_MAX_BYTES", str(256 * 1024)))
+WIKIPEDIA_MAX_BYTES = int(os.getenv("WIKIPEDIA_MAX_BYTES", str(64 * 1024)))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv("ASYNC_HTTP_MAX_CONNECTIONS", "200"))
+
+# Graph rendering
+RENDER_CACHE_DIR = os.getenv(
+    "RENDER_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "renders"),
+)
+# Rendered artifacts on disk; the least recently used are evicted above this size
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+# Rendered artifacts kept in memory in front of the disk cache
+RENDER_MEMORY_MAX_BYTES = int(os.getenv("RENDER_MEMORY_MAX_BYTES", str(16 * 1024 * 1024)))
+# Longest a render may take, including its wait for a free layout worker
+RENDER_TIMEOUT_SECONDS = float(os.getenv("RENDER_TIMEOUT_SECONDS", "20"))
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+# Above these node counts, fall back to cheaper layouts
+RENDER_LARGE_GRAPH_NODES = int(os.getenv("RENDER_LARGE_GRAPH_NODES", "400"))
+RENDER_HUGE_GRAPH_NODES = int(os.getenv("RENDER_HUGE_GRAPH_NODES", "5000"))
+
+# External call transport: "live", "record" (live + save cassettes) or "replay"
+TRANSPORT_MODE = os.getenv("TRANSPORT_MODE", "live").lower()
+CASSETTE_DIR = os.getenv(
+    "CASSETTE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cassettes"),
+)
+# Replay only: injected latency (milliseconds), error rate (0-1) and fallback matching
+REPLAY_LATENCY_MS = float(os.getenv("REPLAY_LATENCY_MS", "0"))
+REPLAY_LATENCY_JITTER_MS = float(os.getenv("REPLAY_LATENCY_JITTER_MS", "0"))
+REPLAY_ERROR_RATE = float(os.getenv("REPLAY_ERROR_RATE", "0"))
+REPLAY_FALLBACK = os.getenv("REPLAY_FALLBACK", "0") == "1"
+
+# Tracing: serve aggregated metrics (/metrics, /metrics.json) on this port; 0 disables
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Coalescing of concurrent requests for the same topic (in-process and across processes)
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "1") != "0"
+SINGLEFLIGHT_DIR = os.getenv(
+    "SINGLEFLIGHT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "inflight"),
+)
+# How long a follower waits for the leader before running the request itself
+SINGLEFLIGHT_WAIT_SECONDS = float(os.getenv("SINGLEFLIGHT_WAIT_SECONDS", "300"))
+SINGLEFLIGHT_POLL_SECONDS = float(os.getenv("SINGLEFLIGHT_POLL_SECONDS", "0.1"))
+
+# Fuzzy topic matching: near-duplicate topics reuse an existing roadmap from the cache
+TOPIC_MATCH_ENABLED = os.getenv("TOPIC_MATCH_ENABLED", "1") != "0"
+TOPIC_MATCH_THRESHOLD = float(os.getenv("TOPIC_MATCH_THRESHOLD", "0.75"))
+TOPIC_INDEX_PATH = os.getenv(
+    "TOPIC_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "topic_index.sqlite"),
+)
+
+# Research context passed to the synthesizer, in tokens of the synthesis model
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "800"))
+
+# Synthesis model routing: try the fast model, escalate to the large one if its
+# output fails structural validation
+SYNTHESIS_ROUTING_ENABLED = os.getenv("SYNTHESIS_ROUTING_ENABLED", "1") != "0"
+SYNTHESIS_FAST_MODEL = os.getenv("SYNTHESIS_FAST_MODEL", "gpt-4o-mini")
+SYNTHESIS_LARGE_MODEL = os.getenv("SYNTHESIS_LARGE_MODEL", "gpt-4")
+# Initial guess of a large-model synthesis, refined as escalations are observed
+SYNTHESIS_LARGE_EXPECTED_SECONDS = float(os.getenv("SYNTHESIS_LARGE_EXPECTED_SECONDS", "30"))
+
+# Synthesis output format: "lines" (one "A > B" line per edge, labels repeated)
+# or "compact" (labels declared once under short IDs, branches as ID chains)
+SYNTHESIS_OUTPUT_FORMAT = os.getenv("SYNTHESIS_OUTPUT_FORMAT", "lines")
+
+# Persistent graph store of generated roadmaps (helpers.graph_store)
+GRAPH_STORE_ENABLED = os.getenv("GRAPH_STORE_ENABLED", "1") != "0"
+GRAPH_STORE_PATH = os.getenv(
+    "GRAPH_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "graph_store.sqlite"),
+)
+# Roadmaps written per transaction during bulk (batch) inserts
+GRAPH_STORE_BULK_SIZE = int(os.getenv("GRAPH_STORE_BULK_SIZE", "200"))
+
+# Local generation job service (workflows.job_service). When JOB_SERVICE_URL is
+# set, the app only enqueues jobs there and renders their progress.
+JOB_SERVICE_URL = os.getenv("JOB_SERVICE_URL", "")
+JOB_SERVICE_PORT = int(os.getenv("JOB_SERVICE_PORT", "8765"))
+JOB_QUEUE_PATH = os.getenv(
+    "JOB_QUEUE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "jobs.sqlite"),
+)
+JOB_WORKER_PROCESSES = int(os.getenv("JOB_WORKER_PROCESSES", "2"))
+JOB_WORKER_THREADS = int(os.getenv("JOB_WORKER_THREADS", "4"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "0.2"))
+# A running job whose worker has not reported for this long is requeued
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "120"))
+# Runs of a job before a worker that stops reporting fails it instead of requeuing it
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Finished jobs (and their events) are deleted after this long
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+
+# OpenAI rate limiting (helpers.rate_limiter). Set these to the account's limits;
+# 0 leaves that limit unenforced. OPENAI_RATE_LIMITS overrides them per model,
+# e.g. '{"gpt-4": {"rpm": 500, "tpm": 30000}, "gpt-4o-mini": {"rpm": 5000, "tpm": 2000000}}'
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "0"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "0"))
+OPENAI_RATE_LIMITS = os.getenv("OPENAI_RATE_LIMITS", "")
+# The limiter's buckets and priority lanes live in each process. Set this to the
+# number of processes calling OpenAI with the same key (app, job workers, batch
+# runs); each process then enforces that share of the limits.
+OPENAI_RATE_LIMIT_PROCESSES = max(1, int(os.getenv("OPENAI_RATE_LIMIT_PROCESSES", "1")))
+# Retries of rate-limited (429) and overloaded (503) calls, with jittered exponential backoff
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+OPENAI_RETRY_BASE_SECONDS = float(os.getenv("OPENAI_RETRY_BASE_SECONDS", "1"))
+OPENAI_RETRY_MAX_SECONDS = float(os.getenv("OPENAI_RETRY_MAX_SECONDS", "60"))
+
+# Incremental refresh (workflows.langgraph_router.refresh_roadmap): phases the
+# fresh research affects are re-synthesized with at most this many tokens each;
+# when more than this fraction of the phases is affected, the roadmap is regenerated
+REFRESH_PHASE_MAX_TOKENS = int(os.getenv("REFRESH_PHASE_MAX_TOKENS", "600"))
+REFRESH_MAX_PHASE_FRACTION = float(os.getenv("REFRESH_MAX_PHASE_FRACTION", "0.5"))
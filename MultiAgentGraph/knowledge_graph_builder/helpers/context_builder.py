@@ -0,0 +1,164 @@
+import math
+import re
+from functools import lru_cache
+
+from helpers.config import CONTEXT_TOKEN_BUDGET
+from helpers.topic_index import canonical_topic
+
+# Tokenizer of the synthesis model (call_openai defaults to gpt-4)
+TOKENIZER_MODEL = "gpt-4"
+# Rough characters per token, used only if tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+# Word-shingle Jaccard similarity above which two passages count as duplicates
+DUPLICATE_SIMILARITY = 0.6
+# Wikipedia sentences grouped into one passage
+SENTENCES_PER_PASSAGE = 2
+
+PASSAGE_SEPARATOR = "\n\n"
+
+_WORD = re.compile(r"[0-9a-z+#]+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9])")
+
+
+@lru_cache(maxsize=4)
+def _encoding(model):
+    # tiktoken is imported on the first count, not when the app starts
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        # Unknown model name, or the encoding file cannot be downloaded offline
+        return None
+
+
+def count_tokens(text, model=TOKENIZER_MODEL):
+    """Token count of ``text`` with the model's tokenizer (estimated without tiktoken)."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text))
+
+
+def truncate_to_tokens(text, max_tokens, model=TOKENIZER_MODEL):
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    return encoding.decode(encoding.encode(text)[:max_tokens])
+
+
+def _words(text):
+    return _WORD.findall(text.lower())
+
+
+def _shingles(words, size=3):
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def passage_shingles(text):
+    """Word 3-shingles of a passage, for near-duplicate checks."""
+    return _shingles(_words(text))
+
+
+def is_near_duplicate(shingles, other):
+    return len(shingles & other) / len(shingles | other) >= DUPLICATE_SIMILARITY
+
+
+def collect_passages(google_data, wiki_text):
+    """
+    Candidate passages as (source, rank, text), in source order.
+
+    Google contributes its answer box, knowledge graph description and every
+    organic result (title and snippet); the Wikipedia extract is split into
+    passages of a few sentences.
+    """
+    passages = []
+    google_data = google_data or {}
+
+    answer = (google_data.get("answer_box") or {}).get("snippet")
+    if answer:
+        passages.append(("google answer", 0, answer))
+    description = (google_data.get("knowledge_graph") or {}).get("description")
+    if description:
+        passages.append(("google knowledge graph", 0, description))
+    for rank, result in enumerate(google_data.get("organic_results") or []):
+        snippet = result.get("snippet")
+        if snippet:
+            title = result.get("title")
+            passages.append(("google", rank, f"{title}: {snippet}" if title else snippet))
+
+    if wiki_text:
+        sentences = _SENTENCE_END.split(wiki_text.strip())
+        for index in range(0, len(sentences), SENTENCES_PER_PASSAGE):
+            text = " ".join(sentences[index:index + SENTENCES_PER_PASSAGE])
+            passages.append(("wikipedia", index // SENTENCES_PER_PASSAGE, text))
+    return passages
+
+
+def _relevance(topic_terms, text, rank, on_topic=False):
+    """
+    Topic term overlap (stemmed, length-normalized) plus a prior for
+    higher-ranked results; None for passages that never mention the topic,
+    unless ``on_topic`` says the whole source is about it.
+    """
+    terms = canonical_topic(text).split()
+    hits = sum(1 for term in terms if term in topic_terms)
+    if not hits and not on_topic:
+        return None
+    coverage = len(topic_terms.intersection(terms)) / len(topic_terms)
+    return coverage + (hits / math.sqrt(len(terms)) if terms else 0.0) + 0.5 / (1 + rank)
+
+
+def build_context(topic, google_data, wiki_text, budget=CONTEXT_TOKEN_BUDGET, model=TOKENIZER_MODEL):
+    """
+    Packs the most relevant research passages into ``budget`` tokens.
+
+    Passages that never mention the topic (except those of the Wikipedia
+    summary) and near-duplicates (keeping the more relevant one) are
+    dropped; the rest are ranked by relevance to the topic and added
+    greedily while they fit. Returns (context text, stats)
+    where stats has the candidate, off-topic, duplicate and kept passage
+    counts and the context's token count.
+    """
+    topic_terms = set(canonical_topic(topic).split())
+    passages = collect_passages(google_data, wiki_text)
+    candidates = []
+    for source, rank, text in passages:
+        # The Wikipedia summary is the topic's own page, so its sentences rarely repeat the title
+        relevance = _relevance(topic_terms, text, rank, on_topic=source == "wikipedia")
+        if relevance is not None:
+            candidates.append((relevance, source, text))
+    candidates.sort(key=lambda candidate: -candidate[0])
+
+    unique, seen_shingles = [], []
+    for candidate in candidates:
+        shingles = passage_shingles(candidate[2])
+        if any(is_near_duplicate(shingles, other) for other in seen_shingles):
+            continue
+        seen_shingles.append(shingles)
+        unique.append(candidate)
+
+    separator_tokens = count_tokens(PASSAGE_SEPARATOR, model)
+    packed, used = [], 0
+    for _, _, text in unique:
+        cost = count_tokens(text, model) + (separator_tokens if packed else 0)
+        if used + cost <= budget:
+            packed.append(text)
+            used += cost
+        elif not packed:
+            # Even the best passage is over budget: keep its beginning
+            packed.append(truncate_to_tokens(text, budget, model))
+            used = count_tokens(packed[0], model)
+
+    stats = {
+        "candidates": len(passages),
+        "off_topic": len(passages) - len(candidates),
+        "duplicates": len(candidates) - len(unique),
+        "passages": len(packed),
+        "tokens": used,
+    }
+    return PASSAGE_SEPARATOR.join(packed), stats
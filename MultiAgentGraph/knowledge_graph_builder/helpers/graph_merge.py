@@ -0,0 +1,419 @@
+import heapq
+import json
+import os
+import re
+from array import array
+
+from helpers.cache import normalize_topic
+from helpers.config import RENDER_LARGE_GRAPH_NODES
+from helpers.roadmap_graph import RoadmapGraph, PHASE_HEADER, CONTENT, NO_PHASE
+
+# Words that do not change which skill a label names: "Python", "Python
+# Programming" and "Programming Basics (Python)" are all "python"
+GENERIC_WORDS = frozenset((
+    "a", "an", "the", "and", "or", "of", "to", "for", "with", "in", "on", "by", "using", "via",
+    "basics", "basic", "introduction", "intro", "fundamentals", "fundamental", "essentials", "overview",
+    "programming", "language", "course", "courses", "beginner", "beginners", "advanced", "intermediate",
+))
+# Labels whose term sets overlap at least this much (Jaccard) are one node
+MERGE_SIMILARITY = 0.8
+# A new label is compared only with nodes sharing one of its rarest terms...
+BLOCKING_TERMS = 2
+# ...and, for each term, only with the most recently added nodes that have it
+MAX_CANDIDATES = 64
+
+_WORD = re.compile(r"[0-9a-z+#]+")
+_PHASE_NUMBER = re.compile(r"^\s*phase\s+(\d+)", re.IGNORECASE)
+
+
+def _singular(word):
+    if len(word) > 4 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def skill_terms(label):
+    """The distinct words that identify a skill label, singular and without generic words."""
+    words = [_singular(word) for word in _WORD.findall(label.lower())]
+    kept = [word for word in words if word not in GENERIC_WORDS]
+    return sorted(set(kept or words))
+
+
+def canonical_skill(label):
+    """Merge key of a content label: its skill terms in sorted order."""
+    return " ".join(skill_terms(label))
+
+
+class MergedGraph:
+    """
+    One graph of many roadmaps, with equivalent nodes merged.
+
+    Content labels are canonicalized (skill_terms) so rewordings of the same
+    skill share a node; near-misses are merged when their terms are at least
+    MERGE_SIMILARITY alike. Candidates come from an inverted index over
+    terms, and only the rarest terms of a label are looked up, each capped
+    at MAX_CANDIDATES nodes, so merging a roadmap costs the same however
+    large the graph is. Phase headers merge by number ("Phase 2"); time
+    estimates are roadmap specific and are left out.
+
+    Provenance is kept per roadmap: the nodes and edges it contributed are
+    a contiguous slice of ``prov_nodes`` / ``prov_edges`` (with the phase of
+    each node in ``prov_phases``), and every node and edge counts the
+    roadmaps that contain it. A node's phase is the one the earliest roadmap
+    still in the graph lists it under. Merging a topic again replaces its
+    earlier roadmap.
+    """
+
+    def __init__(self):
+        self.labels = []
+        self.keys = []
+        self.kinds = array('b')
+        self.phase_of = array('i')
+        self.node_roadmaps = array('i')
+        self.edge_src = array('i')
+        self.edge_dst = array('i')
+        self.edge_roadmaps = array('i')
+        self.topics = []
+        self.prov_nodes = array('i')
+        self.prov_phases = array('i')
+        self.prov_edges = array('i')
+        # Start of each roadmap's provenance slice, plus a final end offset
+        self.node_offsets = array('i', [0])
+        self.edge_offsets = array('i', [0])
+        self._key_ids = {}
+        self._label_ids = {}
+        self._postings = {}
+        self._edge_ids = {}
+        self._topic_ids = {}
+        self._retired = set()
+        self._phase_ids = {}
+        self._by_node = None
+
+    @property
+    def num_nodes(self):
+        return len(self.labels)
+
+    @property
+    def num_edges(self):
+        return len(self.edge_src)
+
+    @property
+    def num_roadmaps(self):
+        return len(self._topic_ids)
+
+    def _new_node(self, label, key, kind):
+        node_id = len(self.labels)
+        self.labels.append(label)
+        self.keys.append(key)
+        self.kinds.append(kind)
+        self.phase_of.append(NO_PHASE)
+        self.node_roadmaps.append(0)
+        self._key_ids[key] = node_id
+        if kind == CONTENT:
+            for term in key.split():
+                self._postings.setdefault(term, array('i')).append(node_id)
+        return node_id
+
+    def _phase_node(self, label):
+        match = _PHASE_NUMBER.match(label)
+        if not match:
+            return None
+        number = int(match.group(1))
+        node_id = self._phase_ids.get(number)
+        if node_id is None:
+            node_id = self._phase_ids[number] = self._new_node(f"Phase {number}", f"phase {number}", PHASE_HEADER)
+        return node_id
+
+    def _similar_node(self, terms):
+        """The most similar existing content node to a label with ``terms``, or None."""
+        postings = [self._postings[term] for term in terms if term in self._postings]
+        if not postings:
+            return None
+        postings.sort(key=len)
+        wanted = set(terms)
+        best, best_score = None, MERGE_SIMILARITY
+        seen = set()
+        for nodes in postings[:BLOCKING_TERMS]:
+            for node_id in nodes[-MAX_CANDIDATES:]:
+                if node_id in seen:
+                    continue
+                seen.add(node_id)
+                other = self.keys[node_id].split()
+                shared = len(wanted.intersection(other))
+                score = shared / (len(wanted) + len(other) - shared)
+                if score >= best_score:
+                    best, best_score = node_id, score
+        return best
+
+    def resolve(self, label):
+        """The merged node for a content label, adding it if nothing matches."""
+        node_id = self._label_ids.get(label)
+        if node_id is not None:
+            return node_id
+        terms = skill_terms(label)
+        key = " ".join(terms)
+        node_id = self._key_ids.get(key)
+        if node_id is None:
+            node_id = self._similar_node(terms)
+        if node_id is None:
+            node_id = self._new_node(label, key, CONTENT)
+        self._label_ids[label] = node_id
+        return node_id
+
+    def merge(self, topic, graph):
+        """
+        Adds one roadmap (a RoadmapGraph or a generate_roadmap dict) and
+        returns {"nodes", "new_nodes", "edges", "new_edges"} for it.
+        """
+        if not isinstance(graph, RoadmapGraph):
+            graph = RoadmapGraph.from_dict(graph)
+        topic_key = normalize_topic(topic)
+        if topic_key in self._topic_ids:
+            self._retire(self._topic_ids[topic_key])
+        roadmap_id = len(self.topics)
+        self.topics.append(topic)
+        self._topic_ids[topic_key] = roadmap_id
+
+        first_new_node, first_new_edge = self.num_nodes, self.num_edges
+        merged = [None] * graph.num_nodes
+        for node_id, (label, kind) in enumerate(zip(graph.labels, graph.kinds)):
+            if kind == PHASE_HEADER:
+                merged[node_id] = self._phase_node(label)
+            elif kind == CONTENT:
+                merged[node_id] = self.resolve(label)
+
+        nodes = dict.fromkeys((node for node in merged if node is not None), NO_PHASE)
+        for node_id in nodes:
+            self.node_roadmaps[node_id] += 1
+        for node_id, phase_id in enumerate(graph.phase_of):
+            node = merged[node_id]
+            if node is not None and phase_id != NO_PHASE and nodes[node] == NO_PHASE:
+                phase = merged[phase_id]
+                if phase is not None and self.kinds[node] == CONTENT:
+                    nodes[node] = phase
+                    if self.phase_of[node] == NO_PHASE:
+                        self.phase_of[node] = phase
+
+        edges = {}
+        for source, target in graph.edges():
+            source, target = merged[source], merged[target]
+            if source is None or target is None or source == target:
+                continue
+            edge_key = source << 32 | target
+            edge_id = self._edge_ids.get(edge_key)
+            if edge_id is None:
+                edge_id = self._edge_ids[edge_key] = self.num_edges
+                self.edge_src.append(source)
+                self.edge_dst.append(target)
+                self.edge_roadmaps.append(0)
+            edges[edge_id] = None
+        for edge_id in edges:
+            self.edge_roadmaps[edge_id] += 1
+
+        self.prov_nodes.extend(array('i', nodes))
+        self.prov_phases.extend(array('i', nodes.values()))
+        self.prov_edges.extend(array('i', edges))
+        self.node_offsets.append(len(self.prov_nodes))
+        self.edge_offsets.append(len(self.prov_edges))
+        self._by_node = None
+        return {"nodes": len(nodes), "new_nodes": self.num_nodes - first_new_node,
+                "edges": len(edges), "new_edges": self.num_edges - first_new_edge}
+
+    def _retire(self, roadmap_id):
+        # Its provenance stays in place but no longer counts
+        self._retired.add(roadmap_id)
+        pending = set()
+        for node_id in self.prov_nodes[self.node_offsets[roadmap_id]:self.node_offsets[roadmap_id + 1]]:
+            self.node_roadmaps[node_id] -= 1
+            if self.phase_of[node_id] != NO_PHASE:
+                self.phase_of[node_id] = NO_PHASE
+                if self.node_roadmaps[node_id] > 0:
+                    pending.add(node_id)
+        for edge_id in self.prov_edges[self.edge_offsets[roadmap_id]:self.edge_offsets[roadmap_id + 1]]:
+            self.edge_roadmaps[edge_id] -= 1
+        self._assign_phases(pending)
+
+    def _assign_phases(self, pending):
+        """Gives each node in ``pending`` the phase of the earliest remaining roadmap that has one for it."""
+        for other in range(len(self.topics)):
+            if not pending:
+                return
+            if other in self._retired:
+                continue
+            start, end = self.node_offsets[other], self.node_offsets[other + 1]
+            for node_id, phase_id in zip(self.prov_nodes[start:end], self.prov_phases[start:end]):
+                if phase_id != NO_PHASE and node_id in pending:
+                    self.phase_of[node_id] = phase_id
+                    pending.discard(node_id)
+
+    # --- Queries ---
+
+    def find(self, label):
+        """The merged node a label resolves to, or None; does not add anything."""
+        node_id = self._label_ids.get(label)
+        if node_id is None:
+            terms = skill_terms(label)
+            node_id = self._key_ids.get(" ".join(terms))
+            if node_id is None:
+                node_id = self._similar_node(terms)
+        return node_id
+
+    def roadmaps_of(self, node_id):
+        """Topics of the roadmaps containing a node (built on first use after a merge)."""
+        if self._by_node is None:
+            by_node = {}
+            for roadmap_id in range(len(self.topics)):
+                if roadmap_id in self._retired:
+                    continue
+                for node in self.prov_nodes[self.node_offsets[roadmap_id]:self.node_offsets[roadmap_id + 1]]:
+                    by_node.setdefault(node, []).append(roadmap_id)
+            self._by_node = by_node
+        return [self.topics[roadmap_id] for roadmap_id in self._by_node.get(node_id, [])]
+
+    def aliases(self, node_id):
+        """Every label that was merged into a node."""
+        return [label for label, merged in self._label_ids.items() if merged == node_id]
+
+    # --- Export ---
+
+    def to_roadmap_graph(self, max_nodes=RENDER_LARGE_GRAPH_NODES, min_roadmaps=1, max_edges=None):
+        """
+        A RoadmapGraph of the merged graph for export_to_graphviz, with level of detail.
+
+        Nodes in fewer than ``min_roadmaps`` roadmaps are left out; content
+        whose phase header is left out is shown without a phase. If more
+        than ``max_nodes`` remain, each phase keeps its share of the budget,
+        choosing the nodes found in the most roadmaps, and the rest of the
+        phase collapses into one "+N more in Phase K" node that takes over
+        their edges. Likewise at most ``max_edges`` edges are kept (by
+        default 3 per node), those backed by the most roadmaps.
+        """
+        if max_edges is None:
+            max_edges = 3 * max_nodes
+        active = [node_roadmaps >= min_roadmaps and node_roadmaps > 0 for node_roadmaps in self.node_roadmaps]
+        phases = [self._phase_ids[number] for number in sorted(self._phase_ids) if active[self._phase_ids[number]]]
+        members = {}
+        for node_id, kind in enumerate(self.kinds):
+            if kind == CONTENT and active[node_id]:
+                phase_id = self.phase_of[node_id]
+                members.setdefault(phase_id if phase_id == NO_PHASE or active[phase_id] else NO_PHASE,
+                                   []).append(node_id)
+
+        total = sum(len(nodes) for nodes in members.values())
+        budget = max(len(members), max_nodes - len(phases) - len(members))
+        graph = RoadmapGraph()
+        shown = {}
+        for node_id in phases:
+            shown[node_id] = graph.intern(self.labels[node_id])
+        for phase_id in phases + ([NO_PHASE] if NO_PHASE in members else []):
+            nodes = members.get(phase_id)
+            if not nodes:
+                continue
+            keep = nodes
+            if total > budget:
+                share = max(1, budget * len(nodes) // total)
+                if share < len(nodes):
+                    keep = heapq.nlargest(share, nodes, key=self.node_roadmaps.__getitem__)
+            for node_id in keep:
+                shown[node_id] = graph.intern(self.labels[node_id])
+            if len(keep) < len(nodes):
+                where = f" in {self.labels[phase_id]}" if phase_id != NO_PHASE else ""
+                collapsed = graph.intern(f"+{len(nodes) - len(keep)} more{where}")
+                kept = set(keep)
+                for node_id in nodes:
+                    if node_id not in kept:
+                        shown[node_id] = collapsed
+            if phase_id != NO_PHASE:
+                for node_id in nodes:
+                    graph.assign_phase(shown[node_id], shown[phase_id])
+
+        # Edges between the shown nodes, weighted by the roadmaps behind them
+        weights = {}
+        for source, target, count in zip(self.edge_src, self.edge_dst, self.edge_roadmaps):
+            if count <= 0 or source not in shown or target not in shown:
+                continue
+            edge = (shown[source], shown[target])
+            if edge[0] != edge[1]:
+                weights[edge] = weights.get(edge, 0) + count
+        if len(weights) > max_edges:
+            weights = dict.fromkeys(heapq.nlargest(max_edges, weights, key=weights.__getitem__))
+        for edge in sorted(weights):
+            graph.add_edge(*edge)
+        return graph
+
+    # --- Persistence ---
+
+    def to_json(self):
+        return {
+            "topics": self.topics,
+            "retired": sorted(self._retired),
+            "labels": self.labels,
+            "aliases": self._label_ids,
+            "kinds": self.kinds.tolist(),
+            "phase_of": self.phase_of.tolist(),
+            "src": self.edge_src.tolist(),
+            "dst": self.edge_dst.tolist(),
+            "prov_nodes": self.prov_nodes.tolist(),
+            "prov_phases": self.prov_phases.tolist(),
+            "prov_edges": self.prov_edges.tolist(),
+            "node_offsets": self.node_offsets.tolist(),
+            "edge_offsets": self.edge_offsets.tolist(),
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        merged = cls()
+        for label, kind in zip(data["labels"], data["kinds"]):
+            if kind == PHASE_HEADER:
+                merged._phase_node(label)
+            else:
+                merged._new_node(label, canonical_skill(label), kind)
+        merged.phase_of = array('i', data["phase_of"])
+        merged._label_ids = data["aliases"]
+        merged.edge_src = array('i', data["src"])
+        merged.edge_dst = array('i', data["dst"])
+        merged._edge_ids = {source << 32 | target: edge_id
+                            for edge_id, (source, target) in enumerate(zip(merged.edge_src, merged.edge_dst))}
+        merged.prov_nodes = array('i', data["prov_nodes"])
+        # Files saved before per-roadmap phases were kept: each node keeps its one phase
+        merged.prov_phases = array('i', data.get("prov_phases")
+                                   or [merged.phase_of[node_id] for node_id in merged.prov_nodes])
+        merged.prov_edges = array('i', data["prov_edges"])
+        merged.node_offsets = array('i', data["node_offsets"])
+        merged.edge_offsets = array('i', data["edge_offsets"])
+        merged.topics = data["topics"]
+        merged._retired = set(data["retired"])
+        merged._topic_ids = {normalize_topic(topic): roadmap_id for roadmap_id, topic in enumerate(merged.topics)
+                             if roadmap_id not in merged._retired}
+        # Counts are recomputed from the provenance of the roadmaps still in the graph
+        merged.edge_roadmaps = array('i', bytes(4 * merged.num_edges))
+        for roadmap_id in merged._topic_ids.values():
+            for node_id in merged.prov_nodes[merged.node_offsets[roadmap_id]:merged.node_offsets[roadmap_id + 1]]:
+                merged.node_roadmaps[node_id] += 1
+            for edge_id in merged.prov_edges[merged.edge_offsets[roadmap_id]:merged.edge_offsets[roadmap_id + 1]]:
+                merged.edge_roadmaps[edge_id] += 1
+        return merged
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(self.to_json(), fh, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as fh:
+            return cls.from_json(json.load(fh))
+
+    @classmethod
+    def from_graph_store(cls, store):
+        """Merges every roadmap in a GraphStore."""
+        merged = cls()
+        for topic in store.topics():
+            graph = store.get_graph(topic)
+            if graph is not None:
+                merged.merge(topic, graph)
+        return merged
@@ -0,0 +1,549 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from helpers.cache import normalize_topic, hash_text
+from helpers.config import GRAPH_STORE_ENABLED, GRAPH_STORE_PATH, GRAPH_STORE_BULK_SIZE
+from helpers.roadmap_graph import RoadmapGraph, CONTENT, NO_PHASE
+
+# SQLite limits bound parameters per statement; IN (...) lists are chunked to this
+MAX_PARAMS = 500
+# canonical label -> node id, kept for bulk inserts; cleared when it grows past this
+NODE_ID_CACHE_SIZE = 200000
+# SQLite page cache per connection; the secondary edge indexes are written at random
+CACHE_KIB = 64 * 1024
+
+_TERM = re.compile(r"[0-9a-z+#]+")
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS roadmaps (
+        id INTEGER PRIMARY KEY,
+        topic_key TEXT NOT NULL UNIQUE,
+        topic TEXT NOT NULL,
+        summary_hash TEXT NOT NULL,
+        num_nodes INTEGER NOT NULL,
+        num_edges INTEGER NOT NULL,
+        created_at REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS nodes (
+        id INTEGER PRIMARY KEY,
+        canonical TEXT NOT NULL UNIQUE,
+        label TEXT NOT NULL,
+        kind INTEGER NOT NULL
+    )""",
+    # Label index: the words of every node label
+    """CREATE TABLE IF NOT EXISTS node_terms (
+        term TEXT NOT NULL,
+        node_id INTEGER NOT NULL,
+        PRIMARY KEY (term, node_id)
+    ) WITHOUT ROWID""",
+    # A roadmap's nodes in their original order, with the position of their phase
+    # header and the label as written in that roadmap (nodes.label is the first
+    # roadmap's spelling of the shared node)
+    """CREATE TABLE IF NOT EXISTS roadmap_nodes (
+        roadmap_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        node_id INTEGER NOT NULL,
+        phase_position INTEGER NOT NULL,
+        label TEXT,
+        PRIMARY KEY (roadmap_id, position)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS edges (
+        roadmap_id INTEGER NOT NULL,
+        src INTEGER NOT NULL,
+        dst INTEGER NOT NULL,
+        PRIMARY KEY (roadmap_id, src, dst)
+    ) WITHOUT ROWID""",
+    # What each roadmap was generated from (its research context and summary), so
+    # a refresh can tell which phases the fresh research affects
+    """CREATE TABLE IF NOT EXISTS roadmap_sources (
+        topic_key TEXT PRIMARY KEY,
+        summary TEXT NOT NULL,
+        context TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )""",
+    # Adjacency indexes (successors and predecessors across all roadmaps)
+    "CREATE INDEX IF NOT EXISTS idx_edges_src ON edges(src, dst, roadmap_id)",
+    "CREATE INDEX IF NOT EXISTS idx_edges_dst ON edges(dst, src, roadmap_id)",
+    "CREATE INDEX IF NOT EXISTS idx_roadmap_nodes_node ON roadmap_nodes(node_id, roadmap_id)",
+)
+
+
+class GraphStoreWriteError(sqlite3.Error):
+    """A batch of roadmaps could not be written; ``topics`` lists them."""
+
+    def __init__(self, message, topics):
+        super().__init__(message)
+        self.topics = topics
+
+
+def canonical_label(label):
+    """Identity of a node across roadmaps: case- and whitespace-insensitive label."""
+    return " ".join(label.lower().split())
+
+
+def label_terms(label):
+    return set(_TERM.findall(label.lower()))
+
+
+def _chunks(values, size=MAX_PARAMS):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class GraphStore:
+    """
+    Persistent SQLite store of generated roadmap graphs.
+
+    Nodes are shared between roadmaps by canonical label, so a module that
+    appears in many roadmaps is a single row. Edges keep the roadmap they
+    came from and are indexed in both directions, and node labels are
+    indexed by word. Neighbourhood, shared-node and path queries therefore
+    touch only the rows they need, however many roadmaps are stored.
+
+    Inside ``bulk()`` added roadmaps are buffered and written in
+    transactions of ``bulk_size`` roadmaps (used by batch runs).
+    """
+
+    def __init__(self, path=GRAPH_STORE_PATH, bulk_size=GRAPH_STORE_BULK_SIZE):
+        self.path = path
+        self.bulk_size = bulk_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # Guards the node id cache; SQLite has one writer anyway
+        self._node_ids = {}
+        self._pending = []
+        self._bulk_depth = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        for statement in SCHEMA:
+            conn.execute(statement)
+        # Stores created before roadmap_nodes kept each roadmap's own label;
+        # their rows have none and fall back to nodes.label
+        if "label" not in [row[1] for row in conn.execute("PRAGMA table_info(roadmap_nodes)")]:
+            conn.execute("ALTER TABLE roadmap_nodes ADD COLUMN label TEXT")
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA cache_size=-{CACHE_KIB}")
+            self._local.conn = conn
+        return conn
+
+    # --- Writes ---
+
+    def add_roadmap(self, topic, graph, summary=""):
+        """
+        Stores (or replaces) the roadmap for ``topic``.
+
+        ``graph`` is a RoadmapGraph or the dict returned by map_to_graph. A
+        roadmap whose summary is unchanged since it was stored is skipped.
+
+        Raises GraphStoreWriteError if the write fails. Inside ``bulk()`` the
+        failed batch is requeued and retried with the next one.
+        """
+        if not isinstance(graph, RoadmapGraph):
+            graph = RoadmapGraph.from_dict(graph)
+        with self._lock:
+            self._pending.append((topic, graph, hash_text(summary or "")))
+            if self._bulk_depth and len(self._pending) < self.bulk_size:
+                return
+            pending, self._pending = self._pending, []
+        try:
+            self._write(pending)
+        except GraphStoreWriteError:
+            with self._lock:
+                if self._bulk_depth:
+                    self._pending[:0] = pending
+            raise
+
+    def save_source(self, topic, summary, context):
+        """Records the research context and summary the roadmap for ``topic`` was generated from."""
+        conn = self._connection()
+        with self._write_lock:
+            conn.execute(
+                "INSERT OR REPLACE INTO roadmap_sources (topic_key, summary, context, updated_at) VALUES (?, ?, ?, ?)",
+                (normalize_topic(topic), summary, context, time.time()),
+            )
+            conn.commit()
+
+    def add_roadmaps(self, roadmaps):
+        """Bulk-stores (topic, graph, summary) tuples in transactions of ``bulk_size``."""
+        with self.bulk():
+            for topic, graph, summary in roadmaps:
+                self.add_roadmap(topic, graph, summary)
+
+    @contextmanager
+    def bulk(self):
+        """
+        Buffers add_roadmap calls and writes them in batches; flushes on exit.
+        The flush raises GraphStoreWriteError (listing every topic it could
+        not store, requeued ones included) if it fails.
+        """
+        with self._lock:
+            self._bulk_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._bulk_depth -= 1
+                pending = [] if self._bulk_depth else self._pending
+                if not self._bulk_depth:
+                    self._pending = []
+            if pending:
+                self._write(pending)
+
+    def _lookup_node_ids(self, conn, canonicals):
+        found = {}
+        for chunk in _chunks(canonicals):
+            placeholders = ",".join("?" * len(chunk))
+            found.update(conn.execute(
+                f"SELECT canonical, id FROM nodes WHERE canonical IN ({placeholders})", chunk
+            ))
+        return found
+
+    def _node_ids_for(self, conn, graphs):
+        """Canonical label -> node id for every node of ``graphs``, creating missing nodes."""
+        wanted = {}
+        for graph in graphs:
+            for label, kind in zip(graph.labels, graph.kinds):
+                wanted.setdefault(canonical_label(label), (label, kind))
+
+        if len(self._node_ids) > NODE_ID_CACHE_SIZE:
+            self._node_ids.clear()
+        ids = {key: self._node_ids[key] for key in wanted if key in self._node_ids}
+        ids.update(self._lookup_node_ids(conn, [key for key in wanted if key not in ids]))
+
+        missing = [key for key in wanted if key not in ids]
+        if missing:
+            conn.executemany(
+                "INSERT OR IGNORE INTO nodes (canonical, label, kind) VALUES (?, ?, ?)",
+                ((key, wanted[key][0], wanted[key][1]) for key in missing),
+            )
+            created = self._lookup_node_ids(conn, missing)
+            conn.executemany(
+                "INSERT OR IGNORE INTO node_terms (term, node_id) VALUES (?, ?)",
+                ((term, created[key]) for key in missing for term in label_terms(wanted[key][0])),
+            )
+            ids.update(created)
+        self._node_ids.update(ids)
+        return ids
+
+    def _write(self, pending):
+        with self._write_lock:
+            try:
+                self._write_locked(pending)
+            except sqlite3.Error as e:
+                topics = list(dict.fromkeys(topic for topic, _, _ in pending))
+                raise GraphStoreWriteError(f"{e} ({len(topics)} roadmaps not stored)", topics) from e
+
+    def _write_locked(self, pending):
+        conn = self._connection()
+        # The last write for a topic wins within a batch
+        latest = {}
+        for topic, graph, summary_hash in pending:
+            latest[normalize_topic(topic)] = (topic, graph, summary_hash)
+
+        existing = {}
+        for chunk in _chunks(latest):
+            placeholders = ",".join("?" * len(chunk))
+            existing.update(
+                (key, (roadmap_id, summary_hash)) for key, roadmap_id, summary_hash in conn.execute(
+                    f"SELECT topic_key, id, summary_hash FROM roadmaps WHERE topic_key IN ({placeholders})", chunk
+                )
+            )
+        changed = {
+            key: value for key, value in latest.items()
+            if key not in existing or existing[key][1] != value[2]
+        }
+        if not changed:
+            return
+
+        try:
+            ids = self._node_ids_for(conn, [graph for _, graph, _ in changed.values()])
+            now = time.time()
+            node_rows, edge_rows = [], []
+            for key, (topic, graph, summary_hash) in changed.items():
+                if key in existing:
+                    roadmap_id = existing[key][0]
+                    conn.execute("DELETE FROM roadmap_nodes WHERE roadmap_id = ?", (roadmap_id,))
+                    conn.execute("DELETE FROM edges WHERE roadmap_id = ?", (roadmap_id,))
+                    conn.execute(
+                        "UPDATE roadmaps SET topic = ?, summary_hash = ?, num_nodes = ?, num_edges = ?, "
+                        "created_at = ? WHERE id = ?",
+                        (topic, summary_hash, graph.num_nodes, graph.num_edges, now, roadmap_id),
+                    )
+                else:
+                    roadmap_id = conn.execute(
+                        "INSERT INTO roadmaps (topic_key, topic, summary_hash, num_nodes, num_edges, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, topic, summary_hash, graph.num_nodes, graph.num_edges, now),
+                    ).lastrowid
+
+                node_ids = [ids[canonical_label(label)] for label in graph.labels]
+                node_rows.extend(
+                    (roadmap_id, position, node_id, graph.phase_of[position], graph.labels[position])
+                    for position, node_id in enumerate(node_ids)
+                )
+                # Labels differing only in case share a node, so edges can repeat
+                edge_rows.extend({(roadmap_id, node_ids[src], node_ids[dst]) for src, dst in graph.edges()})
+
+            conn.executemany(
+                "INSERT INTO roadmap_nodes (roadmap_id, position, node_id, phase_position, label) "
+                "VALUES (?, ?, ?, ?, ?)",
+                node_rows,
+            )
+            # Key order keeps the B-tree inserts appending rather than splitting pages
+            edge_rows.sort()
+            conn.executemany("INSERT OR IGNORE INTO edges (roadmap_id, src, dst) VALUES (?, ?, ?)", edge_rows)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            self._node_ids.clear()  # May hold ids of rolled-back nodes
+            raise
+
+    # --- Queries ---
+
+    def _roadmap_id(self, topic):
+        row = self._connection().execute(
+            "SELECT id FROM roadmaps WHERE topic_key = ?", (normalize_topic(topic),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _labels(self, node_ids):
+        conn = self._connection()
+        labels = {}
+        for chunk in _chunks(node_ids):
+            placeholders = ",".join("?" * len(chunk))
+            labels.update(conn.execute(f"SELECT id, label FROM nodes WHERE id IN ({placeholders})", chunk))
+        return labels
+
+    def find_nodes(self, text, topic=None):
+        """
+        Ids of nodes matching ``text``: its exact (canonical) label if such a
+        node exists, otherwise every node whose label contains all its words.
+        With ``topic`` only that roadmap's nodes are considered.
+        """
+        conn = self._connection()
+        canonical = canonical_label(text)
+        terms = label_terms(text)
+        if topic is not None:
+            # A roadmap has few nodes: match them directly rather than through
+            # the term index, whose common words (e.g. "2") have long postings
+            roadmap_id = self._roadmap_id(topic)
+            if roadmap_id is None:
+                return []
+            nodes = conn.execute(
+                """SELECT n.id, n.canonical FROM roadmap_nodes rn JOIN nodes n ON n.id = rn.node_id
+                   WHERE rn.roadmap_id = ? ORDER BY rn.position""",
+                (roadmap_id,),
+            ).fetchall()
+            exact = [node_id for node_id, key in nodes if key == canonical]
+            if exact or not terms:
+                return exact[:1]
+            return list(dict.fromkeys(node_id for node_id, key in nodes if terms <= label_terms(key)))
+
+        row = conn.execute("SELECT id FROM nodes WHERE canonical = ?", (canonical,)).fetchone()
+        if row:
+            return [row[0]]
+        if not terms:
+            return []
+        matches = " INTERSECT ".join("SELECT node_id FROM node_terms WHERE term = ?" for _ in terms)
+        return [node_id for node_id, in conn.execute(matches, tuple(sorted(terms)))]
+
+    def roadmaps_with(self, text, limit=100):
+        """Roadmaps containing a node that matches ``text``, as (topic, matching label) pairs."""
+        node_ids = self.find_nodes(text)
+        if not node_ids:
+            return []
+        conn = self._connection()
+        found = []
+        for chunk in _chunks(node_ids):
+            placeholders = ",".join("?" * len(chunk))
+            found.extend(conn.execute(
+                f"""SELECT r.topic, n.label FROM roadmap_nodes rn
+                    JOIN roadmaps r ON r.id = rn.roadmap_id
+                    JOIN nodes n ON n.id = rn.node_id
+                    WHERE rn.node_id IN ({placeholders})
+                    ORDER BY rn.roadmap_id DESC LIMIT ?""",
+                chunk + [limit - len(found)],
+            ))
+            if len(found) >= limit:
+                break
+        return found
+
+    def neighbours(self, text, direction="out", topic=None, limit=100):
+        """
+        Labels one edge away from the nodes matching ``text``, with the number
+        of roadmaps containing that edge, most common first.
+
+        ``direction`` is "out" (successors), "in" (predecessors) or "both".
+        With ``topic`` only edges of that roadmap are followed.
+        """
+        node_ids = self.find_nodes(text, topic)
+        if not node_ids:
+            return []
+        roadmap_id = self._roadmap_id(topic) if topic is not None else None
+        queries = {"out": [("src", "dst")], "in": [("dst", "src")], "both": [("src", "dst"), ("dst", "src")]}
+        counts = {}
+        conn = self._connection()
+        for near, far in queries[direction]:
+            for chunk in _chunks(node_ids):
+                placeholders = ",".join("?" * len(chunk))
+                where = f"{near} IN ({placeholders})"
+                params = list(chunk)
+                if roadmap_id is not None:
+                    where += " AND roadmap_id = ?"
+                    params.append(roadmap_id)
+                for node_id, count in conn.execute(
+                    f"SELECT {far}, COUNT(*) FROM edges WHERE {where} GROUP BY {far}", params
+                ):
+                    counts[node_id] = counts.get(node_id, 0) + count
+        ranked = sorted(counts.items(), key=lambda item: -item[1])[:limit]
+        labels = self._labels([node_id for node_id, _ in ranked])
+        return [(labels[node_id], count) for node_id, count in ranked]
+
+    def shared_nodes(self, topic_a, topic_b, kind=CONTENT):
+        """Labels (as written in ``topic_a``) of ``kind`` nodes, content by default, present in both roadmaps."""
+        first, second = self._roadmap_id(topic_a), self._roadmap_id(topic_b)
+        if first is None or second is None:
+            return []
+        return [label for label, in self._connection().execute(
+            """SELECT COALESCE(a.label, n.label) FROM roadmap_nodes a
+               JOIN roadmap_nodes b ON b.node_id = a.node_id AND b.roadmap_id = ?
+               JOIN nodes n ON n.id = a.node_id
+               WHERE a.roadmap_id = ? AND n.kind = ?
+               ORDER BY a.position""",
+            (second, first, kind),
+        )]
+
+    def most_shared_nodes(self, limit=20, kind=CONTENT):
+        """The ``kind`` nodes that appear in the most roadmaps, as (label, roadmap count)."""
+        return self._connection().execute(
+            """SELECT n.label, COUNT(*) AS roadmaps FROM roadmap_nodes rn
+               JOIN nodes n ON n.id = rn.node_id
+               WHERE n.kind = ?
+               GROUP BY rn.node_id ORDER BY roadmaps DESC LIMIT ?""",
+            (kind, limit),
+        ).fetchall()
+
+    def shortest_path(self, source, target, topic=None, max_depth=20):
+        """
+        Shortest directed path (a list of labels) from a node matching
+        ``source`` to one matching ``target``, or None.
+
+        Breadth-first, one indexed query per frontier chunk. With ``topic`` the
+        path stays within that roadmap; otherwise it may cross roadmaps
+        through shared nodes.
+        """
+        sources, targets = self.find_nodes(source, topic), set(self.find_nodes(target, topic))
+        if not sources or not targets:
+            return None
+        roadmap_id = self._roadmap_id(topic) if topic is not None else None
+        conn = self._connection()
+
+        parents = {node_id: None for node_id in sources}
+        frontier = list(sources)
+        found = next((node_id for node_id in sources if node_id in targets), None)
+        depth = 0
+        while found is None and frontier and depth < max_depth:
+            depth += 1
+            next_frontier = []
+            for chunk in _chunks(frontier):
+                placeholders = ",".join("?" * len(chunk))
+                if roadmap_id is None:
+                    rows = conn.execute(f"SELECT src, dst FROM edges WHERE src IN ({placeholders})", chunk)
+                else:
+                    rows = conn.execute(
+                        f"SELECT src, dst FROM edges WHERE roadmap_id = ? AND src IN ({placeholders})",
+                        [roadmap_id] + chunk,
+                    )
+                for src, dst in rows:
+                    if dst not in parents:
+                        parents[dst] = src
+                        next_frontier.append(dst)
+                        if dst in targets:
+                            found = dst
+                            break
+                if found is not None:
+                    break
+            frontier = next_frontier
+        if found is None:
+            return None
+
+        path = []
+        while found is not None:
+            path.append(found)
+            found = parents[found]
+        labels = self._labels(path)
+        return [labels[node_id] for node_id in reversed(path)]
+
+    def topics(self):
+        """Topics of all stored roadmaps, oldest first."""
+        return [topic for (topic,) in self._connection().execute("SELECT topic FROM roadmaps ORDER BY id")]
+
+    def get_graph(self, topic):
+        """The stored roadmap for ``topic`` as a RoadmapGraph (with its own labels), or None."""
+        roadmap_id = self._roadmap_id(topic)
+        if roadmap_id is None:
+            return None
+        conn = self._connection()
+        rows = conn.execute(
+            """SELECT rn.node_id, COALESCE(rn.label, n.label), rn.phase_position FROM roadmap_nodes rn
+               JOIN nodes n ON n.id = rn.node_id
+               WHERE rn.roadmap_id = ? ORDER BY rn.position""",
+            (roadmap_id,),
+        ).fetchall()
+        graph = RoadmapGraph()
+        # Positions are the ids of the stored RoadmapGraph; phase_position refers to them
+        by_position = [graph.intern(label) for _, label, _ in rows]
+        # Labels differing only in case share a node id; its edges attach to the first
+        by_node = {}
+        for position, (node_id, _, _) in enumerate(rows):
+            by_node.setdefault(node_id, by_position[position])
+        for position, (_, _, phase_position) in enumerate(rows):
+            if phase_position != NO_PHASE:
+                graph.assign_phase(by_position[position], by_position[phase_position])
+        for src, dst in conn.execute("SELECT src, dst FROM edges WHERE roadmap_id = ?", (roadmap_id,)):
+            graph.add_edge(by_node[src], by_node[dst])
+        return graph
+
+    def get_source(self, topic):
+        """(summary, research context) the stored roadmap was generated from, or None."""
+        row = self._connection().execute(
+            "SELECT summary, context FROM roadmap_sources WHERE topic_key = ?", (normalize_topic(topic),)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def stats(self):
+        conn = self._connection()
+        return {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("roadmaps", "nodes", "edges")
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_graph_store():
+    """Returns the shared graph store, or None when it is disabled."""
+    global _store
+    if not GRAPH_STORE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = GraphStore(GRAPH_STORE_PATH)
+    return _store
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import weakref
+
+# requests and httpx are imported on first use: replayed and cached runs never need them
+from helpers.config import HTTP_POOL_SIZE, ASYNC_HTTP_MAX_CONNECTIONS
+
+_session = None
+_session_lock = threading.Lock()
+
+# httpx.AsyncClient is bound to the event loop it was first used on, so keep
+# one per loop. Entries disappear when their loop is garbage collected.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_session():
+    """
+    Returns a process-wide requests.Session with pooled keep-alive connections.
+
+    Reusing one session means repeated calls to the same host skip the TCP and
+    TLS handshakes. The pool is sized so concurrent research threads do not
+    block waiting for a free connection.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def get_async_client():
+    """Returns the pooled httpx.AsyncClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        import httpx
+
+        limits = httpx.Limits(
+            max_connections=ASYNC_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=ASYNC_HTTP_MAX_CONNECTIONS,
+        )
+        # Follow redirects like requests does (Wikipedia redirects renamed titles)
+        client = httpx.AsyncClient(limits=limits, follow_redirects=True)
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_client():
+    """Closes the running loop's client; call before a short-lived loop exits."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
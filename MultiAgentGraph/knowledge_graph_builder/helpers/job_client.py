@@ -0,0 +1,114 @@
+import json
+import socket
+import urllib.error
+import urllib.request
+
+from helpers.config import JOB_SERVICE_URL
+from helpers.job_queue import decode_event, decode_result
+
+# An idle progress stream is reopened (from the last event seen) after this long
+EVENTS_READ_TIMEOUT = 60
+RECONNECT_ATTEMPTS = 3
+
+
+class JobClient:
+    """
+    Client for the local job service (workflows/job_service.py).
+
+    stream_roadmap and generate_roadmap have the same results and events as
+    the functions in workflows.langgraph_router, so the app can use either.
+    Only the standard library is used.
+    """
+
+    def __init__(self, base_url=JOB_SERVICE_URL, timeout=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=data, method=method, headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                return json.loads(e.read())
+            except ValueError:
+                return {"error": f"Job service returned HTTP {e.code}"}
+
+    def submit(self, topic):
+        """Queues a roadmap job and returns its id."""
+        return self._request("POST", "/jobs", {"topic": topic})["job_id"]
+
+    def status(self, job_id):
+        """The job's status; "result" holds the decoded result once it has finished."""
+        job = self._request("GET", f"/jobs/{job_id}")
+        if job.get("result"):
+            job["result"] = decode_result(job["result"])
+        return job
+
+    def cancel(self, job_id):
+        return self._request("DELETE", f"/jobs/{job_id}").get("status")
+
+    def events(self, job_id, after=0):
+        """
+        Yields the job's progress events (decoded, with their "seq") until
+        "done". A dropped or idle connection is reopened from the last event.
+        """
+        failures = 0
+        while True:
+            url = f"{self.base_url}/jobs/{job_id}/events?after={after}"
+            try:
+                with urllib.request.urlopen(url, timeout=EVENTS_READ_TIMEOUT) as response:
+                    for line in response:
+                        event = decode_event(json.loads(line))
+                        after = event["seq"]
+                        failures = 0
+                        yield event
+                        if event["type"] == "done":
+                            return
+            except (urllib.error.URLError, socket.timeout, ConnectionError) as e:
+                failures += 1
+                if failures > RECONNECT_ATTEMPTS:
+                    raise ConnectionError(f"Lost the job service progress stream: {e}") from e
+                continue
+            # The server closed the stream without "done" (the job was purged)
+            failures += 1
+            if failures > RECONNECT_ATTEMPTS:
+                raise ConnectionError(f"Job {job_id} is no longer available")
+
+    def stream_roadmap(self, topic):
+        """
+        Runs a job and yields its events like langgraph_router.stream_roadmap.
+        Closing the generator before "done" cancels the job.
+        """
+        try:
+            job_id = self.submit(topic)
+        except (urllib.error.URLError, socket.timeout, ConnectionError, KeyError) as e:
+            yield {"type": "done", "result": {"error": f"Job service unavailable: {str(e)}"}}
+            return
+
+        finished = False
+        try:
+            for event in self.events(job_id):
+                event.pop("seq", None)
+                finished = event["type"] == "done"
+                yield event
+        except ConnectionError as e:
+            finished = True
+            yield {"type": "done", "result": {"error": str(e)}}
+        finally:
+            if not finished:
+                try:
+                    self.cancel(job_id)
+                except (urllib.error.URLError, socket.timeout, ConnectionError):
+                    pass
+
+    def generate_roadmap(self, topic):
+        """Runs a job and returns its result like langgraph_router.generate_roadmap."""
+        for event in self.stream_roadmap(topic):
+            if event["type"] == "done":
+                return event["result"]
+        return {"error": "Job service stream ended without a result"}
@@ -0,0 +1,293 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from helpers import tracing
+from helpers.config import JOB_QUEUE_PATH, JOB_STALE_SECONDS, JOB_RETENTION_SECONDS, JOB_MAX_ATTEMPTS
+from helpers.roadmap_graph import RoadmapGraph
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+CANCELLED_ERROR = "Generation was cancelled"
+ABANDONED_ERROR = "Generation stopped reporting {attempts} times"
+
+
+def encode_result(result):
+    """JSON form of a roadmap result: the RoadmapGraph and the trace are serialized."""
+    encoded = dict(result)
+    if isinstance(encoded.get("graph"), RoadmapGraph):
+        encoded["graph"] = encoded["graph"].to_json()
+    if isinstance(encoded.get("trace"), tracing.Trace):
+        encoded["trace"] = encoded["trace"].to_dict()
+    return encoded
+
+
+def decode_result(encoded):
+    result = dict(encoded)
+    if "graph" in result:
+        result["graph"] = RoadmapGraph.from_json(result["graph"])
+    if "trace" in result:
+        result["trace"] = tracing.Trace.from_dict(result["trace"])
+    return result
+
+
+def encode_event(event):
+    """JSON form of a stream_roadmap event."""
+    encoded = dict(event)
+    for key in ("graph", "result"):
+        if isinstance(encoded.get(key), dict):
+            encoded[key] = encode_result(encoded[key])
+    return encoded
+
+
+def decode_event(encoded):
+    event = dict(encoded)
+    for key in ("graph", "result"):
+        if isinstance(event.get(key), dict):
+            event[key] = decode_result(event[key])
+    return event
+
+
+class JobQueue:
+    """
+    Durable queue of roadmap generation jobs in SQLite.
+
+    Frontends submit jobs, poll them and read their progress events; worker
+    processes claim queued jobs, append events and finish them. Everything
+    goes through the database file, so any number of frontends and workers
+    on the host can share one queue. A running job whose worker stops
+    reporting for ``stale_seconds`` is handed to another worker, unless it
+    was cancelled or has already run ``max_attempts`` times.
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH, stale_seconds=JOB_STALE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                topic TEXT NOT NULL,
+                status TEXT NOT NULL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                result TEXT,
+                created_at REAL NOT NULL,
+                heartbeat_at REAL,
+                finished_at REAL
+            )"""
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            ) WITHOUT ROWID"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; claims use explicit BEGIN IMMEDIATE transactions
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Frontend side ---
+
+    def submit(self, topic):
+        """Queues a generation job and returns its id."""
+        job_id = uuid.uuid4().hex
+        self._connection().execute(
+            "INSERT INTO jobs (id, topic, status, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, topic, QUEUED, time.time()),
+        )
+        return job_id
+
+    def get(self, job_id):
+        """The job as a dict (result decoded to JSON, not to objects), or None."""
+        row = self._connection().execute(
+            """SELECT id, topic, status, error, result, created_at, heartbeat_at, finished_at, attempts
+               FROM jobs WHERE id = ?""",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(
+            ("job_id", "topic", "status", "error", "result", "created_at", "heartbeat_at", "finished_at", "attempts"),
+            row,
+        ))
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def events(self, job_id, after=0):
+        """Events of a job with a sequence number above ``after``, as (seq, encoded event)."""
+        return [
+            (seq, json.loads(event)) for seq, event in self._connection().execute(
+                "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+            )
+        ]
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so read-then-update is atomic
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def cancel(self, job_id):
+        """
+        Cancels a job. A queued job is finished at once; a running one is
+        flagged and its worker stops at its next progress report. Returns
+        the job's status afterwards, or None for an unknown job.
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row[0] in FINISHED:
+                return row[0] if row else None
+            if row[0] == QUEUED:
+                self._finish(conn, job_id, CANCELLED, {"error": CANCELLED_ERROR})
+                return CANCELLED
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            return RUNNING
+
+    def counts(self):
+        return dict(self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+    # --- Worker side ---
+
+    def claim(self, worker):
+        """
+        Atomically takes the oldest queued job (or a stale running one) for
+        ``worker``. Returns (job id, topic), or None if there is nothing to do.
+
+        Stale jobs that were cancelled, or have run ``max_attempts`` times,
+        are finished (cancelled or failed) instead of being run again.
+        """
+        now = time.time()
+        stale = now - self.stale_seconds
+        with self._transaction() as conn:
+            for job_id, cancel_requested, attempts in conn.execute(
+                """SELECT id, cancel_requested, attempts FROM jobs
+                   WHERE status = ? AND heartbeat_at < ? AND (cancel_requested = 1 OR attempts >= ?)""",
+                (RUNNING, stale, self.max_attempts),
+            ).fetchall():
+                if cancel_requested:
+                    self._finish(conn, job_id, CANCELLED, {"error": CANCELLED_ERROR})
+                else:
+                    self._finish(conn, job_id, FAILED, {"error": ABANDONED_ERROR.format(attempts=attempts)})
+
+            row = conn.execute(
+                "SELECT id, topic FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                row = conn.execute(
+                    "SELECT id, topic FROM jobs WHERE status = ? AND heartbeat_at < ? ORDER BY created_at LIMIT 1",
+                    (RUNNING, stale),
+                ).fetchone()
+                if row is not None:
+                    # Readers discard what the abandoned run streamed so far
+                    self._append_event(conn, row[0], {"type": "restart"})
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, heartbeat_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    (RUNNING, worker, now, row[0]),
+                )
+            return row
+
+    def _owned(self, conn, job_id, worker):
+        """cancel_requested for a job ``worker`` still runs, or None if it lost the job."""
+        row = conn.execute(
+            "SELECT cancel_requested FROM jobs WHERE id = ? AND status = ? AND worker = ?", (job_id, RUNNING, worker)
+        ).fetchone()
+        return row[0] if row else None
+
+    def add_event(self, job_id, worker, event):
+        """
+        Appends a (JSON-encoded) progress event and refreshes the heartbeat.
+
+        Returns False if the worker should stop: the job was cancelled, or it
+        was given to another worker after this one stopped reporting.
+        """
+        with self._transaction() as conn:
+            cancel_requested = self._owned(conn, job_id, worker)
+            if cancel_requested is None:
+                return False
+            self._append_event(conn, job_id, event)
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+        return not cancel_requested
+
+    def heartbeat(self, job_id, worker):
+        """Marks a job as still running; returns False like add_event does."""
+        with self._transaction() as conn:
+            cancel_requested = self._owned(conn, job_id, worker)
+            if cancel_requested is None:
+                return False
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+        return not cancel_requested
+
+    def _append_event(self, conn, job_id, event):
+        conn.execute(
+            """INSERT INTO job_events (job_id, seq, event)
+               VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?), ?)""",
+            (job_id, job_id, json.dumps(event, ensure_ascii=False)),
+        )
+
+    def _finish(self, conn, job_id, status, result):
+        self._append_event(conn, job_id, {"type": "done", "result": result})
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, result = ?, finished_at = ? WHERE id = ?",
+            (status, result.get("error"), json.dumps(result, ensure_ascii=False), time.time(), job_id),
+        )
+
+    def finish(self, job_id, worker, result):
+        """
+        Stores a job's (encoded) result and its final "done" event. A job
+        with a pending cancel request finishes as cancelled. Returns the final
+        status, or None if the job now belongs to another worker.
+        """
+        with self._transaction() as conn:
+            cancel_requested = self._owned(conn, job_id, worker)
+            if cancel_requested is None:
+                return None
+            if cancel_requested:
+                status, result = CANCELLED, {"error": CANCELLED_ERROR}
+            else:
+                status = FAILED if "error" in result else DONE
+            self._finish(conn, job_id, status, result)
+        return status
+
+    def purge(self, older_than=JOB_RETENTION_SECONDS):
+        """Deletes jobs (and their events) that finished more than ``older_than`` seconds ago."""
+        cutoff = time.time() - older_than
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE finished_at < ?)", (cutoff,)
+            )
+            return conn.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,)).rowcount
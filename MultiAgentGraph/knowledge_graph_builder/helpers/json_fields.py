@@ -0,0 +1,117 @@
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+# Everything up to the next bracket outside a string: plain text and whole strings
+_UNTIL_BRACKET = re.compile(r'(?:[^"\[\]{}]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.DOTALL)
+_SCALAR = re.compile(r"[^,\]}\s]+")
+
+
+def _skip_whitespace(text, index):
+    return _WHITESPACE.match(text, index).end()
+
+
+def _skip_value(text, index):
+    """
+    Returns the index after the JSON value at ``index`` without decoding it:
+    strings and brackets are matched, nothing inside is parsed or validated.
+    """
+    if text.startswith('"', index):
+        match = _STRING.match(text, index)
+        if match is None:
+            raise json.JSONDecodeError("Unterminated string", text, index)
+        return match.end()
+    if text.startswith(("[", "{"), index):
+        depth = 0
+        while True:
+            bracket = text[index:index + 1]
+            if bracket not in ("[", "]", "{", "}"):
+                # The end of the text, or a string cut off before its closing quote
+                raise json.JSONDecodeError("Unterminated value", text, index)
+            depth += 1 if bracket in ("[", "{") else -1
+            if depth == 0:
+                return index + 1
+            index = _UNTIL_BRACKET.match(text, index + 1).end()
+    match = _SCALAR.match(text, index)
+    if match is None:
+        raise json.JSONDecodeError("Expecting value", text, index)
+    return match.end()
+
+
+def _project(value, keys):
+    """``value`` reduced to ``keys``: for an object its keys, for a list every object item's."""
+    if keys is None:
+        return value
+    if isinstance(value, dict):
+        return {key: value[key] for key in keys if key in value}
+    if isinstance(value, list):
+        return [_project(item, keys) for item in value if isinstance(item, dict)]
+    return value
+
+
+def _decode_list(text, index, keys, items):
+    """Decodes the list at ``index`` item by item into ``items``; returns the index after it."""
+    index = _skip_whitespace(text, index + 1)
+    if text.startswith("]", index):
+        return index + 1
+    while True:
+        item, index = _decoder.raw_decode(text, index)
+        if isinstance(item, dict):
+            items.append(_project(item, keys))
+        index = _skip_whitespace(text, index)
+        if text.startswith(",", index):
+            index = _skip_whitespace(text, index + 1)
+        elif text.startswith("]", index):
+            return index + 1
+        else:
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, index)
+
+
+def extract_fields(content, fields):
+    """
+    Reads only ``fields`` from the top-level JSON object in ``content`` (bytes).
+
+    ``fields`` maps each wanted top-level key to the keys to keep of its
+    value: None keeps the value whole, a tuple keeps those keys of an object
+    or of every object in a list. Only wanted top-level values are decoded,
+    one at a time and lists item by item; the others are skipped by
+    matching their strings and brackets, so the full object tree is never
+    built. A body cut off by a size cap
+    still yields every field and list item that arrived complete.
+
+    Returns (values, complete). Raises json.JSONDecodeError if ``content``
+    does not start with a JSON object.
+    """
+    text = content.decode("utf-8", errors="ignore") if isinstance(content, bytes) else content
+    index = _skip_whitespace(text, 0)
+    if not text.startswith("{", index):
+        raise json.JSONDecodeError("Expecting object", text, index)
+    values = {}
+    index += 1
+    try:
+        while True:
+            index = _skip_whitespace(text, index)
+            if text.startswith("}", index):
+                return values, True
+            key, index = _decoder.raw_decode(text, index)
+            index = _skip_whitespace(text, index)
+            if not text.startswith(":", index):
+                return values, False
+            index = _skip_whitespace(text, index + 1)
+            if key in fields and fields[key] is not None and text.startswith("[", index):
+                index = _decode_list(text, index, fields[key], values.setdefault(key, []))
+            elif key in fields:
+                value, index = _decoder.raw_decode(text, index)
+                values[key] = _project(value, fields[key])
+            else:
+                index = _skip_value(text, index)
+            index = _skip_whitespace(text, index)
+            if text.startswith(",", index):
+                index += 1
+            elif not text.startswith("}", index):
+                return values, False
+    except ValueError:
+        # Truncated or malformed from here on; keep what was complete
+        return values, False
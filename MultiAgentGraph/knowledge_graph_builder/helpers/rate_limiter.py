@@ -0,0 +1,311 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from helpers import tracing
+from helpers.config import (
+    OPENAI_RPM_LIMIT,
+    OPENAI_TPM_LIMIT,
+    OPENAI_RATE_LIMITS,
+    OPENAI_RATE_LIMIT_PROCESSES,
+    OPENAI_MAX_RETRIES,
+    OPENAI_RETRY_BASE_SECONDS,
+    OPENAI_RETRY_MAX_SECONDS,
+)
+
+# Priority lanes, highest first: a waiting interactive request is always let
+# through before any waiting batch request
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)
+
+# HTTP statuses that are retried after a backoff
+RETRY_STATUSES = (429, 503)
+# Random extra wait, as a fraction of the backoff, so retries do not line up
+RETRY_JITTER = 0.25
+# Waiting requests re-check the buckets at least this often
+MAX_POLL_SECONDS = 1.0
+
+_lane = contextvars.ContextVar("rate_limit_lane", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(lane):
+    """Runs a block's OpenAI calls in ``lane`` (e.g. BATCH in the batch runner)."""
+    if lane not in LANES:
+        raise ValueError(f"Unknown priority lane: {lane}")
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane():
+    return _lane.get()
+
+
+class _Waiter:
+    __slots__ = ("tokens", "lane", "granted", "cancelled", "event", "future")
+
+    def __init__(self, tokens, lane, future=None):
+        self.tokens = tokens
+        self.lane = lane
+        self.granted = False
+        self.cancelled = False
+        self.event = threading.Event() if future is None else None
+        self.future = future
+
+    def grant(self):
+        self.granted = True
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.future.get_loop().call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute token buckets for one model.
+
+    Each request takes one request and its estimated tokens from the buckets,
+    which refill continuously up to the per-minute limits (a limit of 0 is not
+    enforced). Requests that do not fit wait in lane order, then arrival order,
+    so interactive requests go ahead of batch ones and a large request is not
+    overtaken forever by smaller ones. Threads and asyncio tasks can share one
+    limiter; other processes cannot, so lane order only holds within a
+    process (see OPENAI_RATE_LIMIT_PROCESSES).
+    """
+
+    def __init__(self, rpm=0, tpm=0, name=""):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self._lock = threading.Lock()
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []  # heap of (lane rank, arrival, waiter)
+        self._arrivals = itertools.count()
+        self._depth = dict.fromkeys(LANES, 0)
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def _delay(self, tokens, now):
+        """Seconds until a request of ``tokens`` fits in both buckets."""
+        delay = self._paused_until - now
+        if self.rpm:
+            delay = max(delay, (1 - self._requests) * 60 / self.rpm)
+        if self.tpm:
+            delay = max(delay, (tokens - self._tokens) * 60 / self.tpm)
+        return max(delay, 0.0)
+
+    def _dispatch(self):
+        """
+        Lets waiting requests through while the head of the queue fits; returns
+        the seconds until the head fits, or None if nothing is waiting.
+        Called with the lock held.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        while self._waiters:
+            waiter = self._waiters[0][2]
+            if not waiter.cancelled:
+                delay = self._delay(waiter.tokens, now)
+                if delay > 0:
+                    return delay
+                self._requests -= 1
+                self._tokens -= waiter.tokens
+                self._depth[waiter.lane] -= 1
+                waiter.grant()
+            heapq.heappop(self._waiters)
+        return None
+
+    def _enqueue(self, tokens, lane, future=None):
+        # A request larger than the whole TPM budget could never fit; let it use all of it
+        tokens = min(tokens, self.tpm) if self.tpm else tokens
+        waiter = _Waiter(tokens, lane, future)
+        heapq.heappush(self._waiters, (LANES.index(lane), next(self._arrivals), waiter))
+        self._depth[lane] += 1
+        return waiter
+
+    def acquire(self, tokens, lane=None):
+        """
+        Blocks until a request of ``tokens`` estimated tokens may be sent and
+        returns the wait in seconds. The wait is recorded as a
+        "rate_limit.<lane>" span, so wait times show up in the metrics.
+        """
+        lane = lane or current_lane()
+        with tracing.span(f"rate_limit.{lane}", model=self.name) as span:
+            with self._lock:
+                span.set(queued=len(self._waiters))
+                waiter = self._enqueue(tokens, lane)
+                delay = self._dispatch()
+            while not waiter.granted:
+                waiter.event.wait(min(delay or MAX_POLL_SECONDS, MAX_POLL_SECONDS))
+                with self._lock:
+                    delay = self._dispatch()
+        return span.duration
+
+    async def aacquire(self, tokens, lane=None):
+        """Async variant of acquire; waiting does not block the event loop."""
+        lane = lane or current_lane()
+        with tracing.span(f"rate_limit.{lane}", model=self.name) as span:
+            with self._lock:
+                span.set(queued=len(self._waiters))
+                waiter = self._enqueue(tokens, lane, asyncio.get_running_loop().create_future())
+                delay = self._dispatch()
+            try:
+                while not waiter.granted:
+                    try:
+                        await asyncio.wait_for(
+                            asyncio.shield(waiter.future), min(delay or MAX_POLL_SECONDS, MAX_POLL_SECONDS)
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                    with self._lock:
+                        delay = self._dispatch()
+            except asyncio.CancelledError:
+                with self._lock:
+                    if not waiter.granted:
+                        # Skipped (and dropped) when it reaches the head of the queue
+                        waiter.cancelled = True
+                        self._depth[lane] -= 1
+                raise
+        return span.duration
+
+    def pause(self, seconds):
+        """Lets no request through for ``seconds``, e.g. after a 429 with Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def depth(self):
+        """Waiting requests per lane."""
+        with self._lock:
+            return dict(self._depth)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _limits(model, processes=OPENAI_RATE_LIMIT_PROCESSES):
+    """This process's share of the (rpm, tpm) limits for ``model``."""
+    overrides = json.loads(OPENAI_RATE_LIMITS) if OPENAI_RATE_LIMITS else {}
+    limits = overrides.get(model, {})
+    rpm, tpm = limits.get("rpm", OPENAI_RPM_LIMIT), limits.get("tpm", OPENAI_TPM_LIMIT)
+    return rpm / processes, tpm / processes
+
+
+def get_rate_limiter(model):
+    """
+    The process-wide limiter for ``model``, or None if it has no limits
+    configured. It enforces this process's share of the account's limits.
+    """
+    with _limiters_lock:
+        if model not in _limiters:
+            rpm, tpm = _limits(model)
+            _limiters[model] = RateLimiter(rpm, tpm, name=model) if rpm or tpm else None
+        return _limiters[model]
+
+
+def set_limits(model, rpm=0, tpm=0):
+    """Overrides a model's limits at runtime (e.g. from a benchmark); 0 and 0 removes them."""
+    with _limiters_lock:
+        _limiters[model] = RateLimiter(rpm, tpm, name=model) if rpm or tpm else None
+
+
+def queue_depth():
+    """Waiting OpenAI requests per lane, over all models."""
+    with _limiters_lock:
+        limiters = [limiter for limiter in _limiters.values() if limiter is not None]
+    depth = dict.fromkeys(LANES, 0)
+    for limiter in limiters:
+        for lane, count in limiter.depth().items():
+            depth[lane] += count
+    return depth
+
+
+tracing.METRICS.register_gauge("openai_queue_depth", "lane", queue_depth)
+
+
+def _retry_after(error):
+    """Seconds the server asked us to wait (Retry-After headers), or 0."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # An HTTP date; fall back to the backoff
+    return 0.0
+
+
+def retry_delay(error, attempt):
+    """Seconds to wait before retrying ``error``, or None if it should not be retried."""
+    if getattr(error, "status_code", None) not in RETRY_STATUSES or attempt >= OPENAI_MAX_RETRIES:
+        return None
+    backoff = min(OPENAI_RETRY_MAX_SECONDS, OPENAI_RETRY_BASE_SECONDS * 2 ** attempt)
+    delay = max(_retry_after(error), backoff)
+    return delay + random.uniform(0, delay * RETRY_JITTER)
+
+
+def call(model, tokens, live_call):
+    """
+    Runs ``live_call`` once the model's limiter lets a request of ``tokens``
+    through, retrying rate-limited and overloaded calls.
+    """
+    limiter = get_rate_limiter(model)
+    for attempt in itertools.count():
+        if limiter is not None:
+            limiter.acquire(tokens)
+        try:
+            return live_call()
+        except Exception as e:
+            delay = retry_delay(e, attempt)
+            if delay is None:
+                raise
+            tracing.record(retries=1)
+            if limiter is not None:
+                # The limit is per account, so every caller of the model backs off
+                limiter.pause(delay)
+            else:
+                time.sleep(delay)
+
+
+async def acall(model, tokens, live_call):
+    """Async variant of call; ``live_call`` is a coroutine function."""
+    limiter = get_rate_limiter(model)
+    for attempt in itertools.count():
+        if limiter is not None:
+            await limiter.aacquire(tokens)
+        try:
+            return await live_call()
+        except Exception as e:
+            delay = retry_delay(e, attempt)
+            if delay is None:
+                raise
+            tracing.record(retries=1)
+            if limiter is not None:
+                limiter.pause(delay)
+            else:
+                await asyncio.sleep(delay)
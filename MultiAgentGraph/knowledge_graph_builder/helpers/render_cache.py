@@ -0,0 +1,233 @@
+import contextvars
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+from helpers import tracing
+from helpers.cache import hash_text
+from helpers.config import (
+    RENDER_CACHE_DIR,
+    RENDER_CACHE_MAX_BYTES,
+    RENDER_MEMORY_MAX_BYTES,
+    RENDER_TIMEOUT_SECONDS,
+    RENDER_WORKERS,
+    RENDER_LARGE_GRAPH_NODES,
+    RENDER_HUGE_GRAPH_NODES,
+)
+from helpers.graphviz_exporter import export_to_graphviz
+from helpers.roadmap_graph import RoadmapGraph
+
+# Layouts run in separate Graphviz processes; these threads only wait on them,
+# so the Streamlit script thread is never the one doing layout work.
+_layout_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="graphviz-layout")
+
+# Small in-memory layer in front of the on-disk artifacts, least recently used
+# first, holding at most RENDER_MEMORY_MAX_BYTES
+_memory = {}
+_memory_bytes = {"bytes": 0}
+_memory_lock = threading.Lock()
+
+# Bytes of artifacts on disk; None until the directory is first scanned
+_disk = {"bytes": None}
+_disk_lock = threading.Lock()
+
+
+def layout_options(graph):
+    """
+    Picks the Graphviz engine and spline mode for a graph's size.
+
+    Orthogonal routing with clusters is the expensive part of a layout, so
+    large graphs use straight lines and huge ones the multiscale sfdp engine.
+    """
+    if graph.num_nodes > RENDER_HUGE_GRAPH_NODES:
+        return {"engine": "sfdp", "splines": "line"}
+    if graph.num_nodes > RENDER_LARGE_GRAPH_NODES:
+        return {"engine": "dot", "splines": "line"}
+    return {"engine": "dot", "splines": "ortho"}
+
+
+def graph_hash(graph, options):
+    payload = json.dumps([graph.to_json(), options], ensure_ascii=False, sort_keys=True)
+    return hash_text(payload)
+
+
+def _artifact_path(key, ext):
+    return os.path.join(RENDER_CACHE_DIR, f"{key}.{ext}")
+
+
+def _remember(key, ext, data):
+    with _memory_lock:
+        old = _memory.pop((key, ext), None)
+        if old is not None:
+            _memory_bytes["bytes"] -= len(old)
+        if len(data) > RENDER_MEMORY_MAX_BYTES:
+            return
+        while _memory and _memory_bytes["bytes"] + len(data) > RENDER_MEMORY_MAX_BYTES:
+            _memory_bytes["bytes"] -= len(_memory.pop(next(iter(_memory))))
+        _memory[(key, ext)] = data
+        _memory_bytes["bytes"] += len(data)
+
+
+def _load(key, ext):
+    with _memory_lock:
+        data = _memory.pop((key, ext), None)
+        if data is not None:
+            _memory[(key, ext)] = data  # Most recently used last
+    if data is not None:
+        return data
+    path = _artifact_path(key, ext)
+    try:
+        with open(path, "rb") as fh:
+            data = fh.read()
+        os.utime(path)  # The modification time orders eviction, so mark it as used
+    except FileNotFoundError:
+        return None
+    _remember(key, ext, data)
+    return data
+
+
+def _artifacts():
+    """(modification time, size, path) of every artifact on disk."""
+    entries = []
+    with os.scandir(RENDER_CACHE_DIR) as scan:
+        for entry in scan:
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+
+def _evict():
+    # Other processes share the directory, so rescan it before evicting
+    entries = sorted(_artifacts())
+    total = sum(size for _, size, _ in entries)
+    target = int(RENDER_CACHE_MAX_BYTES * 0.9)
+    if total > RENDER_CACHE_MAX_BYTES:
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+    with _disk_lock:
+        _disk["bytes"] = total
+
+
+def _store(key, ext, data, persist=True):
+    """Caches an artifact in memory and, if ``persist``, on disk within RENDER_CACHE_MAX_BYTES."""
+    _remember(key, ext, data)
+    if not persist:
+        return
+    os.makedirs(RENDER_CACHE_DIR, exist_ok=True)
+    path = _artifact_path(key, ext)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp_path, path)  # Atomic, so readers never see a partial file
+    with _disk_lock:
+        if _disk["bytes"] is not None:
+            _disk["bytes"] += len(data)
+        over_budget = _disk["bytes"] is None or _disk["bytes"] > RENDER_CACHE_MAX_BYTES
+    if over_budget:
+        _evict()
+
+
+def _run_layout(source, engine, fmt, timeout):
+    # subprocess.run kills the Graphviz process if it exceeds the timeout
+    completed = subprocess.run(
+        [engine, f"-T{fmt}"],
+        input=source.encode("utf-8"),
+        capture_output=True,
+        timeout=timeout,
+        check=True,
+    )
+    return completed.stdout
+
+
+def _as_graph(graph_data):
+    return graph_data if isinstance(graph_data, RoadmapGraph) else RoadmapGraph.from_dict(graph_data)
+
+
+def dot_source(graph_data, highlight=None, persist=True):
+    """
+    Returns (cache key, DOT source) for a graph, building the source at most
+    once. ``highlight`` labels are outlined (see export_to_graphviz).
+    Pass ``persist=False`` for short-lived graphs (streamed partial graphs):
+    they are cached in memory only.
+    """
+    graph = _as_graph(graph_data)
+    options = layout_options(graph)
+    if highlight:
+        options["highlight"] = sorted(highlight)
+    key = graph_hash(graph, options)
+    with tracing.span("export", nodes=graph.num_nodes) as span:
+        cached = _load(key, "dot")
+        span.set(cache_hit=cached is not None)
+        if cached is not None:
+            return key, cached.decode("utf-8")
+        source = export_to_graphviz(graph, splines=options["splines"], highlight=highlight or ()).source
+        span.set(bytes=len(source))
+    _store(key, "dot", source.encode("utf-8"), persist)
+    return key, source
+
+
+def _layout(key, source, engine, fmt, timeout, persist):
+    with tracing.span("layout", fmt=fmt, engine=engine) as span:
+        cached = _load(key, fmt)
+        span.set(cache_hit=cached is not None)
+        if cached is not None:
+            return cached
+        try:
+            data = _run_layout(source, engine, fmt, timeout)
+        except (subprocess.TimeoutExpired, subprocess.CalledProcessError, OSError) as e:
+            span.set(error=str(e) or type(e).__name__)
+            return None
+        span.set(bytes=len(data))
+    _store(key, fmt, data, persist)
+    return data
+
+
+def start_render(graph_data, fmt="svg", timeout=RENDER_TIMEOUT_SECONDS, highlight=None, persist=True):
+    """
+    Starts rendering a graph and returns a Future of render_graph's result.
+
+    A cached artifact gives an already finished Future. Otherwise the layout
+    runs on the layout pool, so the caller (e.g. the Streamlit script while
+    it streams tokens) can carry on and poll ``done()``.
+    """
+    graph = _as_graph(graph_data)
+    key, source = dot_source(graph, highlight, persist)
+    engine = layout_options(graph)["engine"]
+    if _load(key, fmt) is not None:
+        future = Future()
+        future.set_result(_layout(key, source, engine, fmt, timeout, persist))
+        return future
+    # Copy the context so the layout span lands in the caller's trace
+    return _layout_pool.submit(contextvars.copy_context().run, _layout, key, source, engine, fmt, timeout, persist)
+
+
+def render_graph(graph_data, fmt="svg", timeout=RENDER_TIMEOUT_SECONDS, highlight=None, persist=True):
+    """
+    Returns the rendered graph as bytes ("svg" or "png"), or None.
+
+    Artifacts are cached on disk by a hash of the graph and its layout
+    options, so repeat views skip both DOT generation and layout; the least
+    recently used are evicted above RENDER_CACHE_MAX_BYTES. None is returned
+    if Graphviz is not installed or fails, or if the render (including its
+    wait for a layout worker) exceeds ``timeout``; a layout still running
+    then is cached when it finishes. ``highlight`` outlines nodes by label,
+    e.g. the "nodes_added" of a refresh's delta.
+    """
+    future = start_render(graph_data, fmt, timeout, highlight, persist)
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        return None
@@ -1,32 +1,162 @@
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
+import asyncio
+import threading
+import weakref
+
+from helpers.config import OPENAI_API_KEY
+from helpers.context_builder import count_tokens
+from helpers.http_session import get_async_client
+from helpers import rate_limiter, transport, tracing
+
+# Replayed streams are yielded in chunks of about one token's worth of text
+REPLAY_STREAM_CHUNK_CHARS = 4
+
+
+class OpenAIStreamError(Exception):
+    """Raised by stream_openai when the call fails, possibly after some chunks were yielded."""
+
+_client = None
+_client_lock = threading.Lock()
+
+# AsyncOpenAI shares the loop-bound pooled httpx client, so it is per loop too.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_openai_client():
+    """
+    Returns the process-wide OpenAI client, creating it on first use.
+
+    The openai package is only imported here, so importing the app (or
+    replaying cassettes) does not pay for it. The client does not retry by
+    itself; rate-limited calls are retried by helpers.rate_limiter.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+    return _client
+
+
+def _get_async_openai():
+    from openai import AsyncOpenAI
+
+    loop = asyncio.get_running_loop()
+    http_client = get_async_client()
+    cached = _async_clients.get(loop)
+    if cached is None or cached[0] is not http_client:
+        cached = (http_client, AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client, max_retries=0))
+        _async_clients[loop] = cached
+    return cached[1]
+
+
+def _build_messages(prompt):
+    return [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _openai_request(prompt, model, max_tokens):
+    # What identifies a completion in a cassette; the API key is never part of it
+    return {"model": model, "messages": _build_messages(prompt), "temperature": 0.7, "max_tokens": max_tokens}
+
+
+def _estimated_tokens(request):
+    # OpenAI counts a request's prompt plus its max_tokens against the TPM limit
+    prompt = "".join(message["content"] for message in request["messages"])
+    return count_tokens(prompt, request["model"]) + request["max_tokens"]
+
+
+def _completion_result(response):
+    usage = response.usage.model_dump() if getattr(response, "usage", None) else None
+    return {"content": response.choices[0].message.content, "usage": usage}
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 def call_openai(prompt, model="gpt-4", max_tokens=2000):
     """
     Call OpenAI API using the new v1.0.0+ format.
-    
+
     Args:
         prompt (str): The prompt to send to the model
         model (str): The model to use (default: "gpt-4")
         max_tokens (int): The maximum number of tokens to generate (default: 2000)
-    
+
     Returns:
         str: The model's response
     """
+    request = _openai_request(prompt, model, max_tokens)
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=max_tokens
+        result = transport.call(
+            "openai", request,
+            lambda: rate_limiter.call(
+                request["model"], _estimated_tokens(request),
+                lambda: _completion_result(get_openai_client().chat.completions.create(**request)),
+            ),
         )
-        return response.choices[0].message.content
+        return result["content"]
+    except Exception as e:
+        return f"Error calling OpenAI API: {str(e)}"
+
+
+def stream_openai(prompt, model="gpt-4", max_tokens=2000):
+    """
+    Streaming variant of call_openai: yields text chunks as they arrive.
+
+    On failure OpenAIStreamError is raised, with the "Error calling OpenAI API"
+    text call_openai would have returned. Chunks yielded before it are an
+    incomplete answer and must be discarded.
+    """
+    request = _openai_request(prompt, model, max_tokens)
+    try:
+        mode = transport.get_mode()
+        if mode == "replay":
+            # Replays share cassettes with call_openai; re-chunk the recorded text
+            content = transport.call("openai", request, None)["content"] or ""
+            for start in range(0, len(content), REPLAY_STREAM_CHUNK_CHARS):
+                yield content[start:start + REPLAY_STREAM_CHUNK_CHARS]
+            return
+
+        with tracing.span("openai", mode=mode, streamed=True) as span:
+            # include_usage adds a final chunk (with no choices) carrying token counts
+            # Only opening the stream is rate limited and retried, not a failure mid-stream
+            stream = rate_limiter.call(
+                request["model"], _estimated_tokens(request),
+                lambda: get_openai_client().chat.completions.create(
+                    stream=True, stream_options={"include_usage": True}, **request
+                ),
+            )
+            chunks = []
+            usage = None
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    chunks.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage.model_dump()
+            if usage:
+                span.set(prompt_tokens=usage.get("prompt_tokens", 0), completion_tokens=usage.get("completion_tokens", 0))
+            if mode == "record":
+                transport.save_cassette("openai", request, {"content": "".join(chunks), "usage": usage})
+    except Exception as e:
+        raise OpenAIStreamError(f"Error calling OpenAI API: {str(e)}") from e
+
+
+async def acall_openai(prompt, model="gpt-4", max_tokens=2000):
+    """
+    Async variant of call_openai using AsyncOpenAI.
+
+    Returns the model's response, or an "Error calling OpenAI API" string on failure.
+    """
+    request = _openai_request(prompt, model, max_tokens)
+
+    async def create():
+        return _completion_result(await _get_async_openai().chat.completions.create(**request))
+
+    async def live_call():
+        return await rate_limiter.acall(request["model"], _estimated_tokens(request), create)
+
+    try:
+        result = await transport.acall("openai", request, live_call)
+        return result["content"]
     except Exception as e:
-        return f"Error calling OpenAI API: {str(e)}"
\ No newline at end of file
+        return f"Error calling OpenAI API: {str(e)}"
@@ -0,0 +1,292 @@
+import json
+import math
+import os
+import re
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # Optional: pip install -e .[analytics]
+    np = None
+
+from helpers.roadmap_graph import PHASE_HEADER, CONTENT, ESTIMATED_TIME, TOTAL_TIME, NO_PHASE
+
+# Item roles: a tool is the last content node before a branch's time estimate
+MODULE = 0
+TOOL = 1
+ROLE_NAMES = ("module", "tool")
+
+# Column typecodes (array and numpy agree on them): i = int32, h = int16, b = int8, f = float32
+TABLES = {
+    "roadmaps": {"family": "i", "total_months": "f", "stated_months": "f", "phases": "h"},
+    "phases": {"roadmap": "i", "number": "h", "title": "i", "months": "f"},
+    "items": {"roadmap": "i", "phase": "h", "term": "i", "role": "b"},
+}
+DICTIONARIES = ("topics", "families", "titles", "terms")
+
+# Above this many (phase, term) pairs, top_items counts with np.unique instead of bincount
+MAX_BINCOUNT_CELLS = 1 << 25
+DEFAULT_DURATION_BINS = (0, 1, 2, 3, 4, 6, 9, 12, 18, 24, 36, 60)
+
+_PHASE_LABEL = re.compile(r'^\s*Phase\s+(\d+)\s*:?\s*(.*)$', re.IGNORECASE)
+_ITEM_SEPARATOR = re.compile(r'\s*[,;]\s*')
+
+
+def _canonical(text):
+    return " ".join(text.lower().split())
+
+
+def career_family(topic):
+    """
+    Default career family of a topic: its role noun, e.g. "Senior Data
+    Engineer" -> "engineer". Pass ``family=`` to RoadmapColumns.add to group
+    differently.
+    """
+    words = _canonical(topic).split()
+    return words[-1] if words else ""
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Roadmap analytics requires numpy: pip install -e .[analytics]")
+
+
+class RoadmapColumns:
+    """
+    Columnar store of generated roadmaps for aggregate queries.
+
+    Every roadmap is flattened into three tables of parallel typed arrays
+    (see TABLES): one row per roadmap (career family, total and stated
+    months, phase count), one per phase (number, title, months) and one per
+    module or tool it lists. Strings are dictionary-encoded, so queries over
+    100k roadmaps are a few vectorized numpy passes over int and float
+    columns rather than reparsing summaries.
+
+    Phase months are the sum of the phase's parsed branch estimates. A
+    roadmap's total is its parsed "Total Estimated Time" when it has one,
+    else the sum of its phases. Months are NaN when nothing could be parsed.
+    """
+
+    def __init__(self):
+        _require_numpy()
+        self._columns = {table: {name: array(code) for name, code in columns.items()}
+                         for table, columns in TABLES.items()}
+        self.topics = []
+        self.families, self.titles, self.terms = [], [], []
+        self._codes = {"families": {}, "titles": {}, "terms": {}}
+        self._label_terms = {}
+        self._views = None
+
+    def __len__(self):
+        return len(self.topics)
+
+    def _code(self, dictionary, value):
+        codes = self._codes[dictionary]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            getattr(self, dictionary).append(value)
+        return code
+
+    def _item_terms(self, label):
+        """Term codes of the items a label lists ("Python, SQL; Git" lists three)."""
+        terms = self._label_terms.get(label)
+        if terms is None:
+            terms = self._label_terms[label] = array(
+                "i", [self._code("terms", _canonical(item)) for item in _ITEM_SEPARATOR.split(label) if item]
+            )
+        return terms
+
+    def _append(self, table, **values):
+        columns = self._columns[table]
+        for name, value in values.items():
+            columns[name].append(value)
+
+    def add(self, topic, graph, family=None):
+        """Adds one roadmap (a RoadmapGraph) and returns its row number."""
+        row = len(self.topics)
+        self.topics.append(topic)
+        labels, kinds, months, phase_of = graph.labels, graph.kinds, graph.months, graph.phase_of
+        # Tools are content nodes that lead straight to a time estimate. Equal
+        # estimate labels share one node, so estimates are counted per branch
+        # (edge into the estimate), in the phase of the node it comes from.
+        tools = set()
+        phase_estimates = {}
+        for source, target in graph.edges():
+            if kinds[target] != ESTIMATED_TIME:
+                continue
+            tools.add(source)
+            phase_id = source if kinds[source] == PHASE_HEADER else phase_of[source]
+            if phase_id != NO_PHASE and not math.isnan(months[target]):
+                phase_estimates.setdefault(phase_id, []).append(months[target])
+
+        phases = []
+        for phase_id in graph.nodes_of_kind(PHASE_HEADER):
+            match = _PHASE_LABEL.match(labels[phase_id])
+            number = int(match.group(1)) if match else len(phases) + 1
+            phases.append((number, match.group(2) if match else labels[phase_id], phase_id))
+        phases.sort()
+
+        phase_total = 0.0
+        phases_with_months = 0
+        item_phases, item_terms, item_roles = array("h"), array("i"), array("b")
+        for number, title, phase_id in phases:
+            for node in graph.phase_members[phase_id]:
+                if kinds[node] == CONTENT:
+                    terms = self._item_terms(labels[node])
+                    item_terms.extend(terms)
+                    item_phases.extend(array("h", [number]) * len(terms))
+                    item_roles.extend(array("b", [TOOL if node in tools else MODULE]) * len(terms))
+            estimates = phase_estimates.get(phase_id)
+            self._append("phases", roadmap=row, number=number, title=self._code("titles", _canonical(title)),
+                         months=sum(estimates) if estimates else math.nan)
+            if estimates:
+                phase_total += sum(estimates)
+                phases_with_months += 1
+
+        items = self._columns["items"]
+        items["roadmap"].extend(array("i", [row]) * len(item_terms))
+        items["phase"].extend(item_phases)
+        items["term"].extend(item_terms)
+        items["role"].extend(item_roles)
+
+        stated = next((months[node] for node in graph.nodes_of_kind(TOTAL_TIME) if not math.isnan(months[node])),
+                      math.nan)
+        self._append(
+            "roadmaps",
+            family=self._code("families", family if family is not None else career_family(topic)),
+            total_months=stated if not math.isnan(stated) else (phase_total if phases_with_months else math.nan),
+            stated_months=stated,
+            phases=len(phases),
+        )
+        self._views = None
+        return row
+
+    def table(self, name):
+        """A table as {column: numpy array}, converted once and reused until the next add."""
+        if self._views is None:
+            # Copies: a view would keep the array from growing on the next add
+            self._views = {
+                table: {column: np.frombuffer(values, dtype=values.typecode).copy() if len(values)
+                        else np.empty(0, dtype=values.typecode) for column, values in columns.items()}
+                for table, columns in self._columns.items()
+            }
+        return self._views[name]
+
+    # --- Queries ---
+
+    def median_total_by_family(self):
+        """{family: (median total months, roadmaps with a total)}, largest families first."""
+        roadmaps = self.table("roadmaps")
+        keys, medians, counts = _group_medians(roadmaps["family"], roadmaps["total_months"])
+        order = np.argsort(-counts, kind="stable")
+        return {self.families[keys[i]]: (float(medians[i]), int(counts[i])) for i in order}
+
+    def median_months_by_phase(self):
+        """{phase number: (median months, phases with an estimate)}."""
+        phases = self.table("phases")
+        keys, medians, counts = _group_medians(phases["number"], phases["months"])
+        return {int(key): (float(median), int(count)) for key, median, count in zip(keys, medians, counts)}
+
+    def phase_duration_histogram(self, bins=DEFAULT_DURATION_BINS, phase=None):
+        """(counts, bin edges in months) of phase durations, optionally for one phase number."""
+        phases = self.table("phases")
+        months = phases["months"]
+        mask = ~np.isnan(months)
+        if phase is not None:
+            mask &= phases["number"] == phase
+        return np.histogram(months[mask], bins=np.asarray(bins, dtype=np.float32))
+
+    def top_items(self, role=TOOL, limit=10, family=None):
+        """
+        {phase number: [(item, mentions), ...]}: the most common tools (or
+        modules) of each phase, optionally for one career family.
+        """
+        items = self.table("items")
+        mask = items["role"] == role
+        if family is not None:
+            code = self._codes["families"].get(family)
+            if code is None:
+                return {}
+            mask &= self.table("roadmaps")["family"][items["roadmap"]] == code
+        phase, term = items["phase"][mask], items["term"][mask]
+        if not len(term):
+            return {}
+
+        n_terms = len(self.terms)
+        numbers = np.unique(phase)
+        phase_index = np.searchsorted(numbers, phase)
+        keys = phase_index.astype(np.int64) * n_terms + term
+        if len(numbers) * n_terms <= MAX_BINCOUNT_CELLS:
+            counts = np.bincount(keys, minlength=len(numbers) * n_terms).reshape(len(numbers), n_terms)
+        else:
+            unique, unique_counts = np.unique(keys, return_counts=True)
+            counts = {}
+            for key, count in zip(unique.tolist(), unique_counts.tolist()):
+                counts.setdefault(key // n_terms, []).append((count, key % n_terms))
+
+        top = {}
+        for index, number in enumerate(numbers.tolist()):
+            if isinstance(counts, dict):
+                best = sorted(counts.get(index, []), reverse=True)[:limit]
+            else:
+                row = counts[index]
+                candidates = np.argpartition(-row, min(limit, n_terms) - 1)[:limit]
+                best = sorted(((int(row[t]), int(t)) for t in candidates if row[t]), reverse=True)
+            top[number] = [(self.terms[t], count) for count, t in best]
+        return top
+
+    # --- Persistence ---
+
+    def save(self, path):
+        """Writes the store to an .npz file (no pickled objects)."""
+        arrays = {f"{table}.{column}": values for table, columns in self._columns.items()
+                  for column, values in columns.items()}
+        dictionaries = {name: getattr(self, name) for name in DICTIONARIES}
+        arrays["dictionaries"] = np.frombuffer(json.dumps(dictionaries, ensure_ascii=False).encode("utf-8"),
+                                               dtype=np.uint8)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, **{name: np.asarray(values) for name, values in arrays.items()})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        columns = cls()
+        with np.load(path, allow_pickle=False) as data:
+            dictionaries = json.loads(data["dictionaries"].tobytes().decode("utf-8"))
+            for table, spec in TABLES.items():
+                for column, code in spec.items():
+                    columns._columns[table][column].frombytes(data[f"{table}.{column}"].astype(code).tobytes())
+        columns.topics = dictionaries["topics"]
+        for name in ("families", "titles", "terms"):
+            setattr(columns, name, dictionaries[name])
+            columns._codes[name] = {value: code for code, value in enumerate(dictionaries[name])}
+        return columns
+
+    @classmethod
+    def from_graph_store(cls, store, family=None):
+        """Builds the store from every roadmap in a GraphStore; ``family`` maps topics to families."""
+        columns = cls()
+        for topic in store.topics():
+            graph = store.get_graph(topic)
+            if graph is not None:
+                columns.add(topic, graph, family=family(topic) if family else None)
+        return columns
+
+
+def _group_medians(keys, values):
+    """Median of ``values`` per distinct key, ignoring NaN: (keys, medians, counts)."""
+    keep = ~np.isnan(values)
+    keys, values = keys[keep], values[keep]
+    if not len(keys):
+        return keys, values, np.empty(0, dtype=np.int64)
+    order = np.lexsort((values, keys))
+    keys, values = keys[order], values[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    counts = np.diff(np.concatenate((starts, [len(keys)])))
+    lower = starts + (counts - 1) // 2
+    upper = starts + counts // 2
+    return keys[starts], (values[lower].astype(np.float64) + values[upper]) / 2, counts
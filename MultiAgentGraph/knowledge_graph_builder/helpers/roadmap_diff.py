@@ -0,0 +1,138 @@
+import math
+import re
+
+from helpers.context_builder import PASSAGE_SEPARATOR, passage_shingles, is_near_duplicate
+from helpers.roadmap_graph import ESTIMATED_TIME, TOTAL_TIME, classify_label, parse_duration_months
+from helpers.topic_index import canonical_topic
+
+PHASE_HEADER_PATTERN = re.compile(r'^Phase \d+:')
+TOTAL_TIME_PREFIX = "total estimated time"
+# Text appended by the researcher that is not a passage (the partial research tag
+# that contexts stored by earlier versions end with)
+_RESEARCH_NOTE = re.compile(r'^\[.*\]$', re.DOTALL)
+_PARENTHESIZED = re.compile(r'\([^)]*\)')
+
+# Words too common in roadmaps to tie a passage to a phase
+GENERIC_TERMS = frozenset(canonical_topic(word) for word in (
+    "and", "or", "with", "on", "by", "at", "from", "into", "is", "are", "be", "as", "it", "its", "this", "that",
+    "you", "your", "all", "new", "use", "phase", "estimated", "time", "months", "years", "weeks", "days",
+    "introduction", "intro", "basics", "advanced", "core", "fundamentals", "courses", "skills", "tools",
+))
+# A changed passage affects a phase when the terms they share score at least
+# this much; each term scores 1 / (number of phases that mention it)
+MIN_PHASE_SCORE = 1.0
+
+
+def split_passages(context):
+    """The passages of a research context built by helpers.context_builder."""
+    return [passage.strip() for passage in context.split(PASSAGE_SEPARATOR)
+            if passage.strip() and not _RESEARCH_NOTE.match(passage.strip())]
+
+
+def diff_passages(old_context, new_context):
+    """
+    (added, removed): passages of the new context with no near-duplicate in
+    the old one, and the other way round. Reworded or reordered passages
+    are not changes.
+    """
+    old = [(passage, passage_shingles(passage)) for passage in split_passages(old_context)]
+    new = [(passage, passage_shingles(passage)) for passage in split_passages(new_context)]
+    added = [passage for passage, shingles in new
+             if not any(is_near_duplicate(shingles, other) for _, other in old)]
+    removed = [passage for passage, shingles in old
+               if not any(is_near_duplicate(shingles, other) for _, other in new)]
+    return added, removed
+
+
+def _first_part(line):
+    return line.split('>')[0].strip()
+
+
+def split_phases(summary):
+    """
+    Splits a '>' line summary into (head, phases, tail): lines before the
+    first phase, [(phase header, lines)] in order, and the Total Estimated
+    Time line(s). A phase's lines run until the next phase header.
+    """
+    head, phases, tail = [], [], []
+    for line in summary.split('\n'):
+        if not line.strip():
+            continue
+        first = _first_part(line)
+        if first.lower().startswith(TOTAL_TIME_PREFIX):
+            tail.append(line)
+        elif PHASE_HEADER_PATTERN.match(first) and (not phases or phases[-1][0] != first):
+            phases.append((first, [line]))
+        elif phases:
+            phases[-1][1].append(line)
+        else:
+            head.append(line)
+    return head, phases, tail
+
+
+def join_phases(head, phases, tail):
+    return '\n'.join(head + [line for _, lines in phases for line in lines] + tail)
+
+
+def phase_months(lines):
+    """
+    Months a phase's lines estimate: the sum of its branch estimates, as in
+    helpers.roadmap_analytics. NaN if none of them has a duration.
+    """
+    estimates = [parse_duration_months(part) for line in lines for part in line.split('>')
+                 if classify_label(part.strip()) == ESTIMATED_TIME]
+    estimates = [months for months in estimates if not math.isnan(months)]
+    return sum(estimates) if estimates else math.nan
+
+
+def retime_total(tail, change):
+    """
+    The Total Estimated Time line(s) with the stated duration moved by
+    ``change`` months, or None if no total states one in parentheses.
+    """
+    for index, line in enumerate(tail):
+        for part in line.split('>'):
+            months = parse_duration_months(part)
+            if classify_label(part.strip()) != TOTAL_TIME or math.isnan(months) or not _PARENTHESIZED.search(part):
+                continue
+            total = max(months + change, 0.0)
+            duration = f"({round(total, 1):g} month{'' if total == 1 else 's'})"
+            retimed = list(tail)
+            retimed[index] = line.replace(part, _PARENTHESIZED.sub(duration, part, count=1), 1)
+            return retimed
+    return None
+
+
+def _terms(text, topic_terms):
+    return {term for term in canonical_topic(text).split()
+            if len(term) > 2 and term not in GENERIC_TERMS and term not in topic_terms}
+
+
+def affected_phases(topic, phases, passages):
+    """
+    Maps changed passages to the phases they are about.
+
+    Returns ({phase index: [passages]}, unmatched passages). A passage goes
+    to every phase it shares enough distinctive terms with (see
+    MIN_PHASE_SCORE); terms of the topic itself and generic roadmap words
+    do not count.
+    """
+    topic_terms = set(canonical_topic(topic).split())
+    phase_terms = [_terms('\n'.join(lines), topic_terms) for _, lines in phases]
+    phases_with = {}
+    for terms in phase_terms:
+        for term in terms:
+            phases_with[term] = phases_with.get(term, 0) + 1
+
+    affected, unmatched = {}, []
+    for passage in passages:
+        terms = _terms(passage, topic_terms)
+        matched = False
+        for index, terms_of_phase in enumerate(phase_terms):
+            score = sum(1 / phases_with[term] for term in terms & terms_of_phase)
+            if score >= MIN_PHASE_SCORE:
+                affected.setdefault(index, []).append(passage)
+                matched = True
+        if not matched:
+            unmatched.append(passage)
+    return affected, unmatched
@@ -0,0 +1,258 @@
+import math
+import re
+from array import array
+
+# Node kinds, stored per node in RoadmapGraph.kinds
+PHASE_HEADER = 0
+CONTENT = 1
+ESTIMATED_TIME = 2
+TOTAL_TIME = 3
+KIND_NAMES = ("phase_header", "content", "estimated_time", "total_time")
+
+NO_PHASE = -1
+
+# Durations in estimate labels, e.g. "3 months", "2-3 years", "six weeks", "1.5 yrs"
+MONTHS_PER_UNIT = {"day": 12 / 365.25, "week": 12 / 52.1775, "month": 1.0, "year": 12.0, "yr": 12.0}
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+_AMOUNT = r"(\d+(?:\.\d+)?|" + "|".join(NUMBER_WORDS) + r")"
+DURATION_PATTERN = re.compile(
+    rf"\b{_AMOUNT}(?:\s*(?:-|–|to)\s*{_AMOUNT})?\+?\s*(day|week|month|year|yr)s?\b", re.IGNORECASE
+)
+_PARENTHESIZED = re.compile(r"\(([^)]*)\)")
+# Text between two durations that makes them the ends of one range ("6 months to 1 year")
+# or parts of one duration ("1 year 6 months", "1 year and 6 months")
+_RANGE_SEPARATOR = re.compile(r"\s*(?:-|–|to)\s*", re.IGNORECASE)
+_PART_SEPARATOR = re.compile(r"\s*(?:,|and)?\s*", re.IGNORECASE)
+
+
+def classify_label(label):
+    """Node kind for a label, using the same text heuristics as the exporter always has."""
+    lowered = label.lower()
+    if "total estimated time" in lowered:
+        return TOTAL_TIME
+    if lowered.strip().startswith("phase"):
+        return PHASE_HEADER
+    if "estimated time" in lowered:
+        return ESTIMATED_TIME
+    return CONTENT
+
+
+def _amount(text):
+    return float(NUMBER_WORDS.get(text.lower(), text))
+
+
+def parse_duration_months(label):
+    """
+    Months in an estimate label such as "Estimated Time (3 months)" or
+    "Total Estimated Time (1 year 6 months) Note: ...", or NaN if it has none
+    (e.g. "X years"). Ranges count as their midpoint, also across units
+    ("6 months to 1 year" is 9). Only the first parenthesized part is read
+    when there is one, so notes are ignored.
+    """
+    parenthesized = _PARENTHESIZED.search(label)
+    text = parenthesized.group(1) if parenthesized else label
+    durations = []  # each a list of range ends, in months
+    end = None
+    for match in DURATION_PATTERN.finditer(text):
+        low, high, unit = match.groups()
+        amount = _amount(low) if not high else (_amount(low) + _amount(high)) / 2
+        months = amount * MONTHS_PER_UNIT[unit.lower()]
+        between = text[end:match.start()] if end is not None else None
+        if between is not None and _RANGE_SEPARATOR.fullmatch(between):
+            durations[-1].append(months)
+        elif between is not None and _PART_SEPARATOR.fullmatch(between):
+            durations[-1][-1] += months
+        else:
+            durations.append([months])
+        end = match.end()
+    if not durations:
+        return math.nan
+    return sum(sum(ends) / len(ends) for ends in durations)
+
+
+class RoadmapGraph:
+    """
+    Compact roadmap graph with interned integer node IDs.
+
+    Labels are stored once and referenced by ID. Edges live in two parallel
+    int arrays; ``adjacency()`` builds a CSR view (offsets + targets) on
+    demand. Each node carries its kind and, for content nodes, the ID of
+    the phase header it was first listed under (``NO_PHASE`` if none).
+    ``phase_members`` keeps each phase's content nodes in first-seen order.
+    """
+
+    def __init__(self):
+        self.labels = []
+        self.ids = {}
+        self.kinds = array('b')
+        self.phase_of = array('i')
+        self.months = array('f')
+        self.phase_members = {}
+        self.edge_src = array('i')
+        self.edge_dst = array('i')
+        self._csr = None
+
+    @property
+    def num_nodes(self):
+        return len(self.labels)
+
+    @property
+    def num_edges(self):
+        return len(self.edge_src)
+
+    def intern(self, label):
+        """Returns the ID for a label, adding the node if it is new."""
+        node_id = self.ids.get(label)
+        if node_id is None:
+            node_id = len(self.labels)
+            self.ids[label] = node_id
+            self.labels.append(label)
+            kind = classify_label(label)
+            self.kinds.append(kind)
+            self.phase_of.append(NO_PHASE)
+            self.months.append(parse_duration_months(label) if kind in (ESTIMATED_TIME, TOTAL_TIME) else math.nan)
+            if kind == PHASE_HEADER:
+                self.phase_members[node_id] = array('i')
+        return node_id
+
+    def add_edge(self, source_id, target_id):
+        # Callers deduplicate; the graph stores edges exactly as given.
+        self.edge_src.append(source_id)
+        self.edge_dst.append(target_id)
+        self._csr = None
+
+    def assign_phase(self, node_id, phase_id):
+        """Records that a content node belongs to a phase (first assignment wins)."""
+        kind = self.kinds[node_id]
+        if kind == PHASE_HEADER or kind == TOTAL_TIME or self.phase_of[node_id] != NO_PHASE:
+            return
+        self.phase_of[node_id] = phase_id
+        self.phase_members[phase_id].append(node_id)
+
+    def edges(self):
+        return zip(self.edge_src, self.edge_dst)
+
+    def adjacency(self):
+        """CSR adjacency: successors of n are targets[offsets[n]:offsets[n + 1]]."""
+        if self._csr is None:
+            counts = array('i', bytes(4 * (self.num_nodes + 1)))
+            for source in self.edge_src:
+                counts[source + 1] += 1
+            for i in range(self.num_nodes):
+                counts[i + 1] += counts[i]
+            offsets = array('i', counts)
+            targets = array('i', bytes(4 * self.num_edges))
+            cursor = array('i', counts)
+            for source, target in zip(self.edge_src, self.edge_dst):
+                targets[cursor[source]] = target
+                cursor[source] += 1
+            self._csr = (offsets, targets)
+        return self._csr
+
+    def successors(self, node_id):
+        offsets, targets = self.adjacency()
+        return targets[offsets[node_id]:offsets[node_id + 1]]
+
+    def nodes_of_kind(self, kind):
+        return [node_id for node_id, node_kind in enumerate(self.kinds) if node_kind == kind]
+
+    def copy(self):
+        graph = RoadmapGraph()
+        graph.labels = list(self.labels)
+        graph.ids = dict(self.ids)
+        graph.kinds = array('b', self.kinds)
+        graph.phase_of = array('i', self.phase_of)
+        graph.months = array('f', self.months)
+        graph.phase_members = {phase: array('i', members) for phase, members in self.phase_members.items()}
+        graph.edge_src = array('i', self.edge_src)
+        graph.edge_dst = array('i', self.edge_dst)
+        return graph
+
+    # --- Conversion to and from the dict shape used by generate_roadmap ---
+
+    def to_dict(self):
+        labels = self.labels
+        return {
+            "nodes": list(labels),
+            "edges": [(labels[source], labels[target]) for source, target in self.edges()],
+        }
+
+    @classmethod
+    def from_dict(cls, graph_data):
+        """
+        Builds a graph from {"nodes": [...], "edges": [...], "summary": ...}.
+
+        If the dict already carries a RoadmapGraph under "graph" it is returned
+        as is. Otherwise phase membership is recovered from the summary text.
+        """
+        graph = graph_data.get("graph")
+        if isinstance(graph, cls):
+            return graph
+
+        graph = cls()
+        for label in graph_data.get("nodes", []):
+            graph.intern(label)
+        for source, target in graph_data.get("edges", []):
+            graph.add_edge(graph.intern(source), graph.intern(target))
+        graph.assign_phases_from_summary(graph_data.get("summary", ""))
+        return graph
+
+    def assign_phases_from_summary(self, summary_text):
+        """Assigns content nodes to the phase whose header most recently started a line."""
+        current_phase = None
+        for line in summary_text.split('\n'):
+            parts = [part.strip() for part in line.split('>') if part.strip()]
+            if not parts:
+                continue
+            first_id = self.ids.get(parts[0])
+            if first_id is not None and self.kinds[first_id] == PHASE_HEADER:
+                current_phase = first_id
+            if current_phase is None:
+                continue
+            for part in parts:
+                node_id = self.ids.get(part)
+                if node_id is not None:
+                    self.assign_phase(node_id, current_phase)
+
+    # --- Compact serialization (used by the stage cache) ---
+
+    def to_json(self):
+        return {
+            "labels": self.labels,
+            "phases": [[phase_id, members.tolist()] for phase_id, members in self.phase_members.items() if members],
+            "src": self.edge_src.tolist(),
+            "dst": self.edge_dst.tolist(),
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        graph = cls()
+        for label in data["labels"]:
+            graph.intern(label)
+        for phase_id, members in data["phases"]:
+            for node_id in members:
+                graph.assign_phase(node_id, phase_id)
+        graph.edge_src = array('i', data["src"])
+        graph.edge_dst = array('i', data["dst"])
+        return graph
+
+
+def graph_delta(old, new):
+    """
+    Node and edge differences between two roadmap graphs, by label:
+    {"nodes_added", "nodes_removed", "edges_added", "edges_removed"}, each
+    a list in graph order (edges as (source label, target label) pairs).
+    """
+    old_edges = {(old.labels[source], old.labels[target]) for source, target in old.edges()}
+    new_edges = [(new.labels[source], new.labels[target]) for source, target in new.edges()]
+    new_edge_set = set(new_edges)
+    return {
+        "nodes_added": [label for label in new.labels if label not in old.ids],
+        "nodes_removed": [label for label in old.labels if label not in new.ids],
+        "edges_added": [edge for edge in new_edges if edge not in old_edges],
+        "edges_removed": [(old.labels[source], old.labels[target]) for source, target in old.edges()
+                          if (old.labels[source], old.labels[target]) not in new_edge_set],
+    }
@@ -1,12 +1,46 @@
-import os
-import requests
-from dotenv import load_dotenv
-
-load_dotenv()
-SERP_API_KEY = os.getenv("SERP_API_KEY")
-
-def google_search(query):
-    url = "https://serpapi.com/search"
-    params = {"q": query, "api_key": SERP_API_KEY, "engine": "google"}
-    response = requests.get(url, params=params)
-    return response.json()
\ No newline at end of file
+from helpers.config import (
+    SERP_API_KEY,
+    SERPAPI_TIMEOUT_SECONDS,
+    SERPAPI_NUM_RESULTS,
+    SERPAPI_FIELD_SELECTION,
+    SERPAPI_MAX_BYTES,
+)
+from helpers import tracing, transport
+from helpers.json_fields import extract_fields
+
+SERPAPI_URL = "https://serpapi.com/search"
+
+# The parts of a Google result the context builder reads (plus the API's
+# error message); everything else in the payload is skipped when parsing
+SEARCH_FIELDS = {
+    "organic_results": ("title", "snippet"),
+    "answer_box": ("snippet",),
+    "knowledge_graph": ("description",),
+    "error": None,
+}
+# Asks SerpAPI to leave everything else out of the response
+JSON_RESTRICTOR = "organic_results[].{title,snippet},answer_box.{snippet},knowledge_graph.{description},error"
+
+def _search_params(query):
+    params = {"q": query, "api_key": SERP_API_KEY, "engine": "google", "num": SERPAPI_NUM_RESULTS}
+    if SERPAPI_FIELD_SELECTION:
+        params["json_restrictor"] = JSON_RESTRICTOR
+    return params
+
+def _parse_results(response):
+    with tracing.span("serpapi_parse") as span:
+        data, complete = extract_fields(response.content, SEARCH_FIELDS)
+        span.set(complete=complete)
+    return data
+
+def google_search(query, timeout=SERPAPI_TIMEOUT_SECONDS):
+    response = transport.http_get(
+        "serpapi", SERPAPI_URL, params=_search_params(query), timeout=timeout, max_bytes=SERPAPI_MAX_BYTES
+    )
+    return _parse_results(response)
+
+async def agoogle_search(query, timeout=SERPAPI_TIMEOUT_SECONDS):
+    response = await transport.ahttp_get(
+        "serpapi", SERPAPI_URL, params=_search_params(query), timeout=timeout, max_bytes=SERPAPI_MAX_BYTES
+    )
+    return _parse_results(response)
@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager, asynccontextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalesce within the process only
+    fcntl = None
+
+from helpers import tracing
+from helpers.config import (
+    SINGLEFLIGHT_ENABLED,
+    SINGLEFLIGHT_DIR,
+    SINGLEFLIGHT_WAIT_SECONDS,
+    SINGLEFLIGHT_POLL_SECONDS,
+)
+
+# key -> concurrent.futures.Future of the in-process leader. A thread-safe
+# future (not an asyncio one) because callers run on different event loops
+# and threads (each generate_roadmap call uses its own loop).
+_inflight = {}
+_inflight_lock = threading.Lock()
+# When this process last deleted stale lock files
+_sweep = {"at": 0.0}
+
+
+class SingleFlightError(Exception):
+    """Raised to followers when the leader was cancelled or never published."""
+
+
+class Flight:
+    """
+    One caller's view of a coalesced execution.
+
+    If ``done`` is set another execution already produced ``result`` and the
+    caller must not run the work. Otherwise the caller is the leader: it runs
+    the work and hands the result to everyone waiting with ``publish``.
+    """
+
+    def __init__(self, key, future=None, lock_file=None, encode=None):
+        self.key = key
+        self.done = False
+        self.result = None
+        self._future = future
+        self._lock_file = lock_file
+        self._encode = encode
+
+    def publish(self, result):
+        if self._lock_file is not None:
+            payload = self._encode(result) if self._encode else result
+            self._lock_file.seek(0)
+            self._lock_file.truncate()
+            self._lock_file.write(json.dumps({"finished_at": time.time(), "result": payload}, ensure_ascii=False))
+            self._lock_file.flush()
+        if self._future is not None and not self._future.done():
+            self._future.set_result(_copy(result))
+
+
+def _join_local(key):
+    """Returns (future, is_leader) for ``key`` within this process."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future, False
+        future = _inflight[key] = Future()
+        return future, True
+
+
+def _leave_local(key, future, error=None):
+    if not future.done():
+        if isinstance(error, Exception):
+            future.set_exception(error)
+        elif error is not None:
+            future.set_exception(SingleFlightError(f"Coalesced request was interrupted: {error!r}"))
+        else:
+            future.set_exception(SingleFlightError("Coalesced request finished without a result"))
+    with _inflight_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def _sweep_lock_files(now=None):
+    """
+    Deletes lock files (and the results they hold) not written for longer than
+    SINGLEFLIGHT_WAIT_SECONDS. No follower can still accept such a result,
+    since followers give up after that long. Files locked by a running
+    leader are kept. A process that opened a file just before it was deleted
+    runs its request uncoordinated, as if the lock had timed out.
+    """
+    now = time.time() if now is None else now
+    _sweep["at"] = now
+    try:
+        names = os.listdir(SINGLEFLIGHT_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if not name.endswith(".lock"):
+            continue
+        path = os.path.join(SINGLEFLIGHT_DIR, name)
+        try:
+            if now - os.path.getmtime(path) < SINGLEFLIGHT_WAIT_SECONDS:
+                continue
+            with open(path, "a+", encoding="utf-8") as lock_file:
+                if _try_lock(lock_file):
+                    os.remove(path)
+        except OSError:
+            continue  # Removed by another process meanwhile
+
+
+def _open_lock_file(key):
+    if fcntl is None:
+        return None
+    os.makedirs(SINGLEFLIGHT_DIR, exist_ok=True)
+    if time.time() - _sweep["at"] >= SINGLEFLIGHT_WAIT_SECONDS:
+        _sweep_lock_files()
+    name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    return open(os.path.join(SINGLEFLIGHT_DIR, f"{name}.lock"), "a+", encoding="utf-8")
+
+
+def _try_lock(lock_file):
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+def _read_result(lock_file, since, decode):
+    """The result another process published after ``since``, or None."""
+    lock_file.seek(0)
+    try:
+        payload = json.loads(lock_file.read() or "null")
+    except ValueError:
+        return None
+    if not payload or payload.get("finished_at", 0) < since:
+        return None  # Stale, or the previous holder died before publishing
+    return decode(payload["result"]) if decode else payload["result"]
+
+
+def _close_lock_file(lock_file):
+    if lock_file is not None:
+        # Closing the descriptor also releases the flock
+        lock_file.close()
+
+
+def _copy(result):
+    # Each caller gets its own top-level dict, so per-caller keys do not leak
+    return dict(result) if isinstance(result, dict) else result
+
+
+@contextmanager
+def flight(key, encode=None, decode=None, timeout=SINGLEFLIGHT_WAIT_SECONDS):
+    """
+    Coalesces concurrent executions for ``key`` within the process and, via a
+    lock file per key, across processes on this host.
+
+    Blocking variant for synchronous callers; see ``aflight``. ``encode`` and
+    ``decode`` convert a result to and from JSON for other processes.
+    """
+    if not SINGLEFLIGHT_ENABLED:
+        yield Flight(key)
+        return
+
+    future, leader = _join_local(key)
+    if not leader:
+        current = Flight(key)
+        with tracing.span("singleflight_wait", source="process"):
+            try:
+                current.result = _copy(future.result(timeout=timeout))
+            except FutureTimeoutError:
+                raise SingleFlightError(f"Timed out after {timeout}s waiting for an identical request")
+        current.done = True
+        yield current
+        return
+
+    lock_file = None
+    try:
+        lock_file = _open_lock_file(key)
+        current = Flight(key, future, lock_file, encode)
+        if lock_file is not None and not _try_lock(lock_file):
+            # Another process is running the same key: wait for it to finish
+            since = time.time()
+            deadline = time.monotonic() + timeout
+            with tracing.span("singleflight_wait", source="host") as span:
+                while not _try_lock(lock_file):
+                    if time.monotonic() > deadline:
+                        span.set(error="timed out; running uncoordinated")
+                        current._lock_file = None
+                        break
+                    time.sleep(SINGLEFLIGHT_POLL_SECONDS)
+                else:
+                    shared = _read_result(lock_file, since, decode)
+                    if shared is not None:
+                        current.done = True
+                        current.result = shared
+                        future.set_result(_copy(shared))
+        yield current
+    except BaseException as e:
+        _leave_local(key, future, e)
+        raise
+    else:
+        _leave_local(key, future)
+    finally:
+        _close_lock_file(lock_file)
+
+
+@asynccontextmanager
+async def aflight(key, encode=None, decode=None, timeout=SINGLEFLIGHT_WAIT_SECONDS):
+    """Async variant of ``flight``; waiting never blocks the event loop."""
+    if not SINGLEFLIGHT_ENABLED:
+        yield Flight(key)
+        return
+
+    future, leader = _join_local(key)
+    if not leader:
+        current = Flight(key)
+        with tracing.span("singleflight_wait", source="process"):
+            # shield: a cancelled follower must not cancel the shared future
+            try:
+                result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+            except asyncio.TimeoutError:
+                raise SingleFlightError(f"Timed out after {timeout}s waiting for an identical request")
+        current.result = _copy(result)
+        current.done = True
+        yield current
+        return
+
+    lock_file = None
+    try:
+        lock_file = _open_lock_file(key)
+        current = Flight(key, future, lock_file, encode)
+        if lock_file is not None and not _try_lock(lock_file):
+            since = time.time()
+            deadline = time.monotonic() + timeout
+            with tracing.span("singleflight_wait", source="host") as span:
+                while not _try_lock(lock_file):
+                    if time.monotonic() > deadline:
+                        span.set(error="timed out; running uncoordinated")
+                        current._lock_file = None
+                        break
+                    await asyncio.sleep(SINGLEFLIGHT_POLL_SECONDS)
+                else:
+                    shared = _read_result(lock_file, since, decode)
+                    if shared is not None:
+                        current.done = True
+                        current.result = shared
+                        future.set_result(_copy(shared))
+        yield current
+    except BaseException as e:
+        _leave_local(key, future, e)
+        raise
+    else:
+        _leave_local(key, future)
+    finally:
+        _close_lock_file(lock_file)
@@ -0,0 +1,278 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter
+
+from helpers.config import (
+    CACHE_ENABLED,
+    TOPIC_MATCH_ENABLED,
+    TOPIC_INDEX_PATH,
+    TOPIC_MATCH_THRESHOLD,
+    CACHE_TTL_SECONDS,
+)
+
+# Words that do not change which roadmap a topic asks for
+STOPWORDS = frozenset((
+    "a", "an", "the", "to", "for", "in", "of", "how", "become", "becoming",
+    "roadmap", "career", "careers", "path", "guide", "learn",
+))
+
+# Crude suffix stripping so a role and its field share a stem
+# (scientist/science, analyst/analytics, engineer/engineering, developer/development)
+SUFFIXES = ("tists", "tist", "ytics", "ysis", "ysts", "yst", "ering", "ment", "ing", "ers", "er", "ure", "ce", "s")
+MIN_STEM = 4
+
+# Words that change which roadmap a topic asks for even when the rest of the
+# topic is the same ("Software Engineering Manager" is not "Software Engineer");
+# topics only match when they name the same roles. Forms of a word share a role.
+ROLE_WORDS = {
+    "intern": ("intern", "internship"),
+    "junior": ("junior", "entry"),
+    "senior": ("senior", "sr"),
+    "lead": ("lead", "leader", "leadership"),
+    "principal": ("principal",),
+    "staff": ("staff",),
+    "manager": ("manager", "management"),
+    "head": ("head",),
+    "director": ("director",),
+    "chief": ("chief", "cto", "cdo", "vp"),
+}
+
+NGRAM = 3
+# Candidate generation stops after visiting this many postings (rarest grams first)
+POSTINGS_BUDGET = 1500
+# Candidates rescored with the exact cosine similarity
+RESCORE_CANDIDATES = 8
+
+_NON_WORD = re.compile(r"[^0-9a-z+#]+")
+
+
+def _stem(word):
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+ROLE_STEMS = {_stem(word): role for role, words in ROLE_WORDS.items() for word in words}
+
+
+def _roles(key):
+    """The roles (see ROLE_WORDS) named in a canonical topic."""
+    return frozenset(ROLE_STEMS[word] for word in key.split() if word in ROLE_STEMS)
+
+
+def canonical_topic(topic):
+    """Lowercased, stemmed topic without punctuation or generic words like "career" or "roadmap"."""
+    words = _NON_WORD.sub(" ", topic.lower()).split()
+    kept = [word for word in words if word not in STOPWORDS]
+    return " ".join(_stem(word) for word in kept or words)
+
+
+def _grams(text):
+    padded = f" {text} "
+    return Counter(padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1))
+
+
+class TopicIndex:
+    """
+    Character n-gram TF-IDF index over previously generated topics.
+
+    Topics are persisted in SQLite (so every process on the host shares
+    them) and indexed in memory: an inverted index from n-gram to topic ids.
+    A lookup scores candidates from the query's rarest n-grams first, within
+    a fixed postings budget, then rescores the best few by exact cosine
+    similarity, so its cost does not grow with the number of topics.
+    """
+
+    def __init__(self, path=TOPIC_INDEX_PATH, max_age_seconds=CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self._gram_ids = {}
+        self._postings = []       # gram id -> array of topic ids
+        self._topics = []         # topic id -> topic as first generated
+        self._doc_grams = []      # topic id -> ((gram id, tf), ...)
+        self._created_at = array("d")
+        self._by_key = {}         # canonical topic -> topic id
+        self._roles = []          # topic id -> roles named in the topic
+        self._last_rowid = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS topics (
+                key TEXT PRIMARY KEY,
+                topic TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        # Topics past the TTL can no longer match
+        conn.execute("DELETE FROM topics WHERE created_at < ?", (time.time() - max_age_seconds,))
+        conn.commit()
+        self._sync()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return len(self._topics)
+
+    def _sync(self):
+        # Picks up topics added by other processes (replaced rows get a new rowid)
+        rows = self._connection().execute(
+            "SELECT rowid, key, topic, created_at FROM topics WHERE rowid > ? ORDER BY rowid",
+            (self._last_rowid,),
+        ).fetchall()
+        if rows:
+            with self._lock:
+                for rowid, key, topic, created_at in rows:
+                    self._index(key, topic, created_at)
+                    self._last_rowid = max(self._last_rowid, rowid)
+
+    def _index(self, key, topic, created_at):
+        doc_id = self._by_key.get(key)
+        if doc_id is not None:
+            self._created_at[doc_id] = created_at
+            return
+        doc_id = len(self._topics)
+        grams = []
+        for gram, tf in _grams(key).items():
+            gram_id = self._gram_ids.get(gram)
+            if gram_id is None:
+                gram_id = self._gram_ids[gram] = len(self._postings)
+                self._postings.append(array("i"))
+            self._postings[gram_id].append(doc_id)
+            grams.append((gram_id, tf))
+        self._topics.append(topic)
+        self._roles.append(_roles(key))
+        self._doc_grams.append(tuple(grams))
+        self._created_at.append(created_at)
+        self._by_key[key] = doc_id
+
+    def add(self, topic):
+        """Records a topic whose roadmap was generated (and cached)."""
+        key = canonical_topic(topic)
+        now = time.time()
+        conn = self._connection()
+        conn.execute("INSERT OR REPLACE INTO topics (key, topic, created_at) VALUES (?, ?, ?)", (key, topic, now))
+        conn.commit()
+        self._sync()
+
+    def remove(self, topic):
+        """
+        Drops a topic whose cached roadmap is gone, so it stops matching.
+
+        Other processes keep the topic in memory until they find its cache
+        entry gone themselves.
+        """
+        key = canonical_topic(topic)
+        conn = self._connection()
+        conn.execute("DELETE FROM topics WHERE key = ?", (key,))
+        conn.commit()
+        with self._lock:
+            doc_id = self._by_key.get(key)
+            if doc_id is not None:
+                self._created_at[doc_id] = 0.0
+
+    def _idf(self, gram_id, num_docs):
+        df = len(self._postings[gram_id]) if gram_id is not None else 0
+        return math.log((num_docs + 1) / (df + 1)) + 1
+
+    def _weights(self, grams, num_docs):
+        weights = {}
+        for gram_id, tf in grams:
+            weights[gram_id] = (1 + math.log(tf)) * self._idf(gram_id, num_docs)
+        return weights
+
+    def lookup(self, topic):
+        """Returns (stored topic, cosine similarity) of the closest match, or None."""
+        self._sync()
+        key = canonical_topic(topic)
+        now = time.time()
+        with self._lock:
+            num_docs = len(self._topics)
+            doc_id = self._by_key.get(key)
+            if doc_id is not None:
+                if now - self._created_at[doc_id] <= self.max_age_seconds:
+                    return self._topics[doc_id], 1.0
+                return None
+
+            query = _grams(key)
+            query_norm = 0.0
+            known = []
+            for gram, tf in query.items():
+                gram_id = self._gram_ids.get(gram)
+                weight = (1 + math.log(tf)) * self._idf(gram_id, num_docs)
+                query_norm += weight * weight
+                if gram_id is not None:
+                    known.append((len(self._postings[gram_id]), gram_id, weight))
+            if not known:
+                return None
+            query_norm = math.sqrt(query_norm)
+
+            # Candidates share the query's rarest (highest idf) grams; counting
+            # them with Counter.update keeps the postings walk in C.
+            shared = Counter()
+            visited = 0
+            for df, gram_id, weight in sorted(known):
+                if visited + df > POSTINGS_BUDGET and shared:
+                    break
+                shared.update(self._postings[gram_id][:POSTINGS_BUDGET])
+                visited += df
+
+            query_weights = {gram_id: weight for _, gram_id, weight in known}
+            query_roles = _roles(key)
+            best = None
+            for candidate, _ in shared.most_common(RESCORE_CANDIDATES):
+                if now - self._created_at[candidate] > self.max_age_seconds:
+                    continue
+                if self._roles[candidate] != query_roles:
+                    continue
+                doc_weights = self._weights(self._doc_grams[candidate], num_docs)
+                dot = sum(weight * query_weights.get(gram_id, 0.0) for gram_id, weight in doc_weights.items())
+                doc_norm = math.sqrt(sum(weight * weight for weight in doc_weights.values()))
+                score = dot / (query_norm * doc_norm) if doc_norm else 0.0
+                if best is None or score > best[1]:
+                    best = (self._topics[candidate], score)
+            return best
+
+    def match(self, topic, threshold=TOPIC_MATCH_THRESHOLD):
+        """The closest stored topic and its score if the score reaches ``threshold``, else None."""
+        found = self.lookup(topic)
+        if found is not None and found[1] >= threshold:
+            return found
+        return None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_topic_index():
+    """
+    Returns the shared topic index, or None when fuzzy matching is disabled.
+
+    Matched topics are served from the stage cache, so matching is off
+    whenever the cache is.
+    """
+    global _index
+    if not (TOPIC_MATCH_ENABLED and CACHE_ENABLED):
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = TopicIndex(TOPIC_INDEX_PATH)
+        return _index
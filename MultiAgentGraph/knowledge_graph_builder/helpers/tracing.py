@@ -0,0 +1,332 @@
+import contextvars
+import itertools
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Span attributes that are summed when recorded more than once; exported as
+# Prometheus counters, so they must never be negative
+COUNTED_ATTRS = ("bytes", "prompt_tokens", "completion_tokens", "retries", "saved_seconds", "wasted_seconds")
+
+# Histogram bucket upper bounds, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# (trace, current span) for the running request; None outside a trace.
+# asyncio tasks inherit it; thread pools need contextvars.copy_context().run.
+_current = contextvars.ContextVar("roadmap_trace", default=None)
+
+
+class Span:
+    __slots__ = ("id", "parent", "name", "start", "duration", "attrs")
+
+    def __init__(self, span_id, parent, name, start, attrs):
+        self.id = span_id
+        self.parent = parent
+        self.name = name
+        self.start = start
+        self.duration = None
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, **amounts):
+        for key, amount in amounts.items():
+            self.attrs[key] = self.attrs.get(key, 0) + amount
+
+
+class Trace:
+    """The spans recorded while generating one roadmap."""
+
+    def __init__(self, name, **attrs):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.duration = None
+        self._t0 = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.spans = []
+
+    def _offset(self):
+        return time.perf_counter() - self._t0
+
+    def _add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def stage_durations(self):
+        """Seconds spent in each top-level span (stage), summed by name."""
+        durations = {}
+        for span in list(self.spans):
+            if span.parent is None:
+                durations[span.name] = durations.get(span.name, 0.0) + span.duration
+        return durations
+
+    def table(self):
+        """Spans in start order as rows for a timing table; nested spans are indented."""
+        spans = sorted(self.spans, key=lambda span: span.start)
+        depth = {}
+        rows = []
+        for span in spans:
+            depth[span.id] = depth.get(span.parent, -1) + 1 if span.parent else 0
+            rows.append({
+                "span": "    " * depth[span.id] + span.name,
+                "start_ms": round(span.start * 1000, 1),
+                "duration_ms": round(span.duration * 1000, 1),
+                **span.attrs,
+            })
+        return rows
+
+    def to_dict(self):
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "attrs": self.attrs,
+            "started_at": self.started_at,
+            "duration_s": self.duration,
+            "spans": [
+                {
+                    "id": span.id,
+                    "parent": span.parent,
+                    "name": span.name,
+                    "start_s": span.start,
+                    "duration_s": span.duration,
+                    "attrs": span.attrs,
+                }
+                for span in sorted(self.spans, key=lambda span: span.start)
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuilds a finished trace from to_dict(), e.g. one recorded in a job
+        service worker. Spans added afterwards start where the trace ended.
+        """
+        restored = cls(data["name"], **data["attrs"])
+        restored.id = data["trace_id"]
+        restored.started_at = data["started_at"]
+        restored.duration = data["duration_s"]
+        restored._t0 = time.perf_counter() - (restored.duration or 0.0)
+        for item in data["spans"]:
+            span = Span(item["id"], item["parent"], item["name"], item["start_s"], item["attrs"])
+            span.duration = item["duration_s"]
+            restored.spans.append(span)
+        restored._ids = itertools.count(max((span.id for span in restored.spans), default=0) + 1)
+        return restored
+
+
+class Metrics:
+    """Process-wide histograms and counters, aggregated over all spans."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._gauges = {}  # name -> (label, callback returning {label value: value})
+        self.reset()
+
+    def register_gauge(self, name, label, callback):
+        """Adds a gauge whose current values are read from ``callback`` when metrics are exported."""
+        self._gauges[name] = (label, callback)
+
+    def reset(self):
+        with self._lock:
+            self._durations = {}  # name -> [bucket counts..., +Inf count, sum]
+            self._counters = {}   # (metric, name) -> value
+
+    def observe(self, name, seconds, attrs):
+        with self._lock:
+            buckets = self._durations.get(name)
+            if buckets is None:
+                buckets = self._durations[name] = [0] * (len(DURATION_BUCKETS) + 1) + [0.0]
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    buckets[index] += 1
+            buckets[len(DURATION_BUCKETS)] += 1
+            buckets[-1] += seconds
+
+            for key in COUNTED_ATTRS:
+                if attrs.get(key):
+                    self._counters[(key, name)] = self._counters.get((key, name), 0) + attrs[key]
+            if "cache_hit" in attrs:
+                key = "cache_hits" if attrs["cache_hit"] else "cache_misses"
+                self._counters[(key, name)] = self._counters.get((key, name), 0) + 1
+            if attrs.get("error"):
+                self._counters[("errors", name)] = self._counters.get(("errors", name), 0) + 1
+
+    def to_json(self):
+        with self._lock:
+            spans = {}
+            for name, buckets in self._durations.items():
+                count = buckets[len(DURATION_BUCKETS)]
+                spans[name] = {
+                    "count": count,
+                    "sum_s": buckets[-1],
+                    "mean_s": buckets[-1] / count if count else 0.0,
+                    "buckets": {str(bound): buckets[index] for index, bound in enumerate(DURATION_BUCKETS)},
+                }
+            for (metric, name), value in self._counters.items():
+                spans.setdefault(name, {})[metric] = value
+        gauges = {name: callback() for name, (_, callback) in self._gauges.items()}
+        return {"spans": spans, "gauges": gauges}
+
+    def to_prometheus(self):
+        with self._lock:
+            lines = [
+                "# HELP roadmap_span_seconds Wall time of roadmap pipeline stages and tool calls.",
+                "# TYPE roadmap_span_seconds histogram",
+            ]
+            for name, buckets in sorted(self._durations.items()):
+                for index, bound in enumerate(DURATION_BUCKETS):
+                    lines.append(f'roadmap_span_seconds_bucket{{span="{name}",le="{bound}"}} {buckets[index]}')
+                count = buckets[len(DURATION_BUCKETS)]
+                lines.append(f'roadmap_span_seconds_bucket{{span="{name}",le="+Inf"}} {count}')
+                lines.append(f'roadmap_span_seconds_sum{{span="{name}"}} {buckets[-1]}')
+                lines.append(f'roadmap_span_seconds_count{{span="{name}"}} {count}')
+
+            for metric in COUNTED_ATTRS + ("cache_hits", "cache_misses", "errors"):
+                values = sorted((name, value) for (key, name), value in self._counters.items() if key == metric)
+                if not values:
+                    continue
+                lines.append(f"# TYPE roadmap_{metric}_total counter")
+                for name, value in values:
+                    lines.append(f'roadmap_{metric}_total{{span="{name}"}} {value}')
+        for name, (label, callback) in sorted(self._gauges.items()):
+            lines.append(f"# TYPE roadmap_{name} gauge")
+            for key, value in sorted(callback().items()):
+                lines.append(f'roadmap_{name}{{{label}="{key}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+def current_trace():
+    state = _current.get()
+    return state[0] if state else None
+
+
+def _reset(token):
+    try:
+        _current.reset(token)
+    except ValueError:
+        # A generator holding the trace was closed from another context
+        pass
+
+
+@contextmanager
+def trace(name, **attrs):
+    """Starts a new trace for one request and makes it current."""
+    new_trace = Trace(name, **attrs)
+    token = _current.set((new_trace, None))
+    try:
+        yield new_trace
+    finally:
+        new_trace.duration = new_trace._offset()
+        _reset(token)
+        METRICS.observe(name, new_trace.duration, {})
+
+
+@contextmanager
+def use(existing_trace):
+    """Makes an existing trace current again, e.g. to add rendering spans later."""
+    token = _current.set((existing_trace, None))
+    try:
+        yield existing_trace
+    finally:
+        _reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Times a block as a span of the current trace.
+
+    Outside a trace the span still feeds the aggregated metrics. An exception
+    escaping the block is recorded on the span and re-raised.
+    """
+    state = _current.get()
+    current, parent = state if state else (None, None)
+    started = time.perf_counter()
+    new_span = Span(
+        next(current._ids) if current else 0,
+        parent.id if parent else None,
+        name,
+        current._offset() if current else 0.0,
+        attrs,
+    )
+    token = _current.set((current, new_span)) if current else None
+    try:
+        yield new_span
+    except Exception as e:
+        new_span.attrs["error"] = str(e) or type(e).__name__
+        raise
+    finally:
+        new_span.duration = time.perf_counter() - started
+        if token is not None:
+            _reset(token)
+            current._add(new_span)
+        METRICS.observe(name, new_span.duration, new_span.attrs)
+
+
+def record(**attrs):
+    """Adds attributes to the current span; counted ones (bytes, tokens, retries) are summed."""
+    state = _current.get()
+    if not state or state[1] is None:
+        return
+    current_span = state[1]
+    for key, value in attrs.items():
+        if key in COUNTED_ATTRS:
+            current_span.add(**{key: value})
+        else:
+            current_span.attrs[key] = value
+
+
+def _metrics_handler():
+    # http.server is imported only when metrics are served, not at app start
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") == "/metrics":
+                body, content_type = METRICS.to_prometheus(), "text/plain; version=0.0.4"
+            elif self.path.rstrip("/") == "/metrics.json":
+                body, content_type = json.dumps(METRICS.to_json()), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    """
+    Serves /metrics (Prometheus text) and /metrics.json on a background thread.
+
+    Safe to call more than once (e.g. on every Streamlit rerun); only the
+    first call starts a server.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            from http.server import ThreadingHTTPServer
+
+            _server = ThreadingHTTPServer((host, port), _metrics_handler())
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server
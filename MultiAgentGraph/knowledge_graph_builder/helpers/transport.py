@@ -0,0 +1,283 @@
+import asyncio
+import base64
+import json
+import os
+import random
+import threading
+import time
+
+from helpers.cache import hash_text
+from helpers import config, tracing
+from helpers.http_session import get_session, get_async_client
+
+# Request fields that must never end up in a cassette or its key
+REDACTED_FIELDS = ("api_key", "key", "token")
+# Bytes read at a time from a size-capped response
+READ_CHUNK_BYTES = 16 * 1024
+
+_settings = {
+    "mode": config.TRANSPORT_MODE,
+    "cassette_dir": config.CASSETTE_DIR,
+    "latency_ms": config.REPLAY_LATENCY_MS,
+    "jitter_ms": config.REPLAY_LATENCY_JITTER_MS,
+    "error_rate": config.REPLAY_ERROR_RATE,
+    "fallback": config.REPLAY_FALLBACK,
+}
+_rng = random.Random()
+_rng_lock = threading.Lock()
+_fallback_index = {}
+
+
+class TransportError(Exception):
+    """Raised for injected replay failures and missing cassettes."""
+
+
+class TransportResponse:
+    """The parts of an HTTP response the tools use, for live and replayed calls alike."""
+
+    def __init__(self, status_code, content, headers=None, truncated=False):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        # The body was cut off at the caller's max_bytes
+        self.truncated = truncated
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def configure(**settings):
+    """
+    Overrides transport settings at runtime (e.g. from a load test).
+
+    Accepts mode, cassette_dir, latency_ms, jitter_ms, error_rate, fallback and
+    seed (seeds the latency/error random generator for reproducible runs).
+    """
+    seed = settings.pop("seed", None)
+    unknown = set(settings) - set(_settings)
+    if unknown:
+        raise ValueError(f"Unknown transport settings: {', '.join(sorted(unknown))}")
+    _settings.update(settings)
+    _fallback_index.clear()
+    if seed is not None:
+        with _rng_lock:
+            _rng.seed(seed)
+
+
+def get_mode():
+    return _settings["mode"]
+
+
+def _redact(params):
+    return {k: v for k, v in (params or {}).items() if k not in REDACTED_FIELDS}
+
+
+def _cassette_path(source, key):
+    return os.path.join(_settings["cassette_dir"], source, f"{key}.json")
+
+
+def request_key(source, request):
+    return hash_text(json.dumps([source, request], sort_keys=True, ensure_ascii=False))
+
+
+def save_cassette(source, request, response):
+    key = request_key(source, request)
+    path = _cassette_path(source, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump({"source": source, "request": request, "response": response}, fh, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _fallback_path(source, key):
+    # Deterministic choice among the recorded cassettes for this source
+    paths = _fallback_index.get(source)
+    if paths is None:
+        directory = os.path.join(_settings["cassette_dir"], source)
+        paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".json")
+        ) if os.path.isdir(directory) else []
+        _fallback_index[source] = paths
+    if not paths:
+        return None
+    return paths[int(key[:8], 16) % len(paths)]
+
+
+def load_cassette(source, request):
+    key = request_key(source, request)
+    path = _cassette_path(source, key)
+    if not os.path.exists(path):
+        path = _fallback_path(source, key) if _settings["fallback"] else None
+        if path is None:
+            raise TransportError(f"No {source} cassette recorded for this request ({key[:12]})")
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)["response"]
+
+
+def _replay_delay():
+    """Injected latency for one replayed call, or raises an injected error."""
+    with _rng_lock:
+        fail = _rng.random() < _settings["error_rate"]
+        delay = max(0.0, _rng.gauss(_settings["latency_ms"], _settings["jitter_ms"])) / 1000
+    if fail:
+        raise TransportError("Injected replay failure")
+    return delay
+
+
+def encode_response(status_code, content, headers, truncated=False):
+    """
+    A cassette response. ``truncated`` records that the live read stopped at
+    max_bytes, so its replay is marked truncated too.
+    """
+    encoded = {
+        "status_code": status_code,
+        "headers": {k.lower(): v for k, v in headers.items() if k.lower() in ("content-type", "retry-after")},
+        "body_b64": base64.b64encode(content).decode("ascii"),
+    }
+    if truncated:
+        encoded["truncated"] = True
+    return encoded
+
+
+def _decode_response(data):
+    return TransportResponse(data["status_code"], base64.b64decode(data["body_b64"]), data["headers"],
+                             data.get("truncated", False))
+
+
+def _http_request(url, params):
+    return {"url": url, "params": _redact(params)}
+
+
+def _cap(result, max_bytes):
+    """Cuts a replayed body to ``max_bytes``, as a live read would have."""
+    if max_bytes is not None and len(result.content) > max_bytes:
+        result.content = result.content[:max_bytes]
+        result.truncated = True
+    return result
+
+
+def _read_capped(response, max_bytes):
+    """Reads a streamed requests response up to ``max_bytes``; returns (content, truncated)."""
+    chunks = []
+    size = 0
+    try:
+        for chunk in response.iter_content(chunk_size=READ_CHUNK_BYTES):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > max_bytes:
+                return b"".join(chunks)[:max_bytes], True
+    finally:
+        # Closing mid-body drops the connection instead of draining the rest
+        response.close()
+    return b"".join(chunks), False
+
+
+async def _aread_capped(response, max_bytes):
+    """Async variant of _read_capped for a streamed httpx response."""
+    chunks = []
+    size = 0
+    async for chunk in response.aiter_bytes(READ_CHUNK_BYTES):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > max_bytes:
+            return b"".join(chunks)[:max_bytes], True
+    return b"".join(chunks), False
+
+
+def _finish_response(span, source, request, result):
+    if _settings["mode"] == "record":
+        save_cassette(source, request,
+                      encode_response(result.status_code, result.content, result.headers, result.truncated))
+    span.set(status=result.status_code, bytes=len(result.content))
+    if result.truncated:
+        span.set(truncated=True)
+
+
+def http_get(source, url, params=None, timeout=None, max_bytes=None):
+    """
+    GET through the configured transport; returns a TransportResponse.
+
+    With ``max_bytes`` the body is streamed and reading stops once that many
+    bytes have arrived; the response is then marked ``truncated``.
+    """
+    mode = _settings["mode"]
+    request = _http_request(url, params)
+    with tracing.span(source, mode=mode) as span:
+        if mode == "replay":
+            time.sleep(_replay_delay())
+            result = _cap(_decode_response(load_cassette(source, request)), max_bytes)
+        elif max_bytes is None:
+            response = get_session().get(url, params=params, timeout=timeout)
+            result = TransportResponse(response.status_code, response.content, dict(response.headers))
+        else:
+            response = get_session().get(url, params=params, timeout=timeout, stream=True)
+            content, truncated = _read_capped(response, max_bytes)
+            result = TransportResponse(response.status_code, content, dict(response.headers), truncated)
+        _finish_response(span, source, request, result)
+    return result
+
+
+async def ahttp_get(source, url, params=None, timeout=None, max_bytes=None):
+    """Async variant of http_get."""
+    mode = _settings["mode"]
+    request = _http_request(url, params)
+    with tracing.span(source, mode=mode) as span:
+        if mode == "replay":
+            await asyncio.sleep(_replay_delay())
+            result = _cap(_decode_response(load_cassette(source, request)), max_bytes)
+        elif max_bytes is None:
+            response = await get_async_client().get(url, params=params, timeout=timeout)
+            result = TransportResponse(response.status_code, response.content, dict(response.headers))
+        else:
+            async with get_async_client().stream("GET", url, params=params, timeout=timeout) as response:
+                content, truncated = await _aread_capped(response, max_bytes)
+            result = TransportResponse(response.status_code, content, dict(response.headers), truncated)
+        _finish_response(span, source, request, result)
+    return result
+
+
+def _record_usage(span, result):
+    # Results that carry an OpenAI-style "usage" dict report their token counts
+    usage = result.get("usage") if isinstance(result, dict) else None
+    if usage:
+        span.set(prompt_tokens=usage.get("prompt_tokens", 0), completion_tokens=usage.get("completion_tokens", 0))
+
+
+def call(source, request, live_call):
+    """
+    Runs a non-HTTP call (e.g. an OpenAI completion) through the transport.
+
+    ``live_call`` must return a JSON-serializable result; that result is what
+    gets recorded and later replayed for the same ``request``.
+    """
+    mode = _settings["mode"]
+    with tracing.span(source, mode=mode) as span:
+        if mode == "replay":
+            time.sleep(_replay_delay())
+            result = load_cassette(source, request)
+        else:
+            result = live_call()
+            if mode == "record":
+                save_cassette(source, request, result)
+        _record_usage(span, result)
+    return result
+
+
+async def acall(source, request, live_call):
+    """Async variant of call; ``live_call`` is a coroutine function."""
+    mode = _settings["mode"]
+    with tracing.span(source, mode=mode) as span:
+        if mode == "replay":
+            await asyncio.sleep(_replay_delay())
+            result = load_cassette(source, request)
+        else:
+            result = await live_call()
+            if mode == "record":
+                save_cassette(source, request, result)
+        _record_usage(span, result)
+    return result
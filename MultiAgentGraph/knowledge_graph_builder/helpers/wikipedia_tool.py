@@ -1,11 +1,30 @@
-import requests
+from helpers.config import WIKIPEDIA_TIMEOUT_SECONDS, WIKIPEDIA_MAX_BYTES
+from helpers import tracing, transport
+from helpers.json_fields import extract_fields
 
-def search_wikipedia(topic):
-    response = requests.get(
-        f"https://en.wikipedia.org/api/rest_v1/page/summary/{topic.replace(' ', '_')}"
-    )
+# Prefixes of the placeholder texts returned when there is no usable summary
+MISSING_SUMMARY_PREFIXES = ("No summary found for ", "No Wikipedia page found for ")
+# The summary endpoint has no field selection, so only "extract" is decoded
+SUMMARY_FIELDS = {"extract": None}
+
+def _summary_url(topic):
+    return f"https://en.wikipedia.org/api/rest_v1/page/summary/{topic.replace(' ', '_')}"
+
+def _extract_summary(topic, response):
     if response.status_code == 200:
-        data = response.json()
+        with tracing.span("wikipedia_parse") as span:
+            data, complete = extract_fields(response.content, SUMMARY_FIELDS)
+            span.set(complete=complete)
         return data.get("extract", f"No summary found for {topic}.")
     else:
-        return f"No Wikipedia page found for {topic}."
\ No newline at end of file
+        return f"No Wikipedia page found for {topic}."
+
+def search_wikipedia(topic, timeout=WIKIPEDIA_TIMEOUT_SECONDS):
+    response = transport.http_get("wikipedia", _summary_url(topic), timeout=timeout, max_bytes=WIKIPEDIA_MAX_BYTES)
+    return _extract_summary(topic, response)
+
+async def asearch_wikipedia(topic, timeout=WIKIPEDIA_TIMEOUT_SECONDS):
+    response = await transport.ahttp_get(
+        "wikipedia", _summary_url(topic), timeout=timeout, max_bytes=WIKIPEDIA_MAX_BYTES
+    )
+    return _extract_summary(topic, response)
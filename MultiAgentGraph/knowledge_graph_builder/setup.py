@@ -28,11 +28,13 @@ setup(
     install_requires=[
         "streamlit>=1.32.0",
         "requests>=2.31.0",
+        "httpx>=0.25.0",
         "google-search-results>=2.4.2",
         "wikipedia>=1.4.0",
         "python-dotenv>=1.0.0",
         "graphviz>=0.20.1",
-        "openai>=1.12.0",
+        "openai>=1.26.0",
+        "tiktoken>=0.6.0",
         "typing-extensions>=4.9.0",
     ],
     extras_require={
@@ -50,6 +52,12 @@ setup(
             "sphinx-rtd-theme>=2.0.0",
             "sphinx-autodoc-typehints>=2.0.0",
         ],
+        "batch": [
+            "pyarrow>=14.0.0",  # For Parquet output from workflows.batch_runner
+        ],
+        "analytics": [
+            "numpy>=1.24.0",  # For helpers.roadmap_analytics (columnar roadmap store)
+        ],
         "test": [
             "pytest>=8.0.0",
             "pytest-cov>=4.1.0",
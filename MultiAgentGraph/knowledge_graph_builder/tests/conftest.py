@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+# Point every on-disk store at a throwaway directory before helpers.config
+# is imported, and never touch the network: external calls are replayed.
+_scratch = tempfile.mkdtemp(prefix="roadmap-tests-")
+os.environ.update({
+    "ROADMAP_CACHE_PATH": os.path.join(_scratch, "roadmap_cache.sqlite"),
+    "GRAPH_STORE_PATH": os.path.join(_scratch, "graph_store.sqlite"),
+    "TOPIC_INDEX_PATH": os.path.join(_scratch, "topic_index.sqlite"),
+    "JOB_QUEUE_PATH": os.path.join(_scratch, "jobs.sqlite"),
+    "SINGLEFLIGHT_DIR": os.path.join(_scratch, "inflight"),
+    "RENDER_CACHE_DIR": os.path.join(_scratch, "renders"),
+    "CASSETTE_DIR": os.path.join(_scratch, "cassettes"),
+    "TRANSPORT_MODE": "replay",
+    "METRICS_PORT": "0",
+    "SERP_API_KEY": "test",
+    "OPENAI_API_KEY": "test",
+})
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
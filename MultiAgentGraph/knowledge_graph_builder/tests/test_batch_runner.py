@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import pytest
+
+from helpers import transport
+from workflows import batch_runner
+
+SUMMARY = (
+    "Phase 1: Basics\n"
+    "Phase 1: Basics > Python\n"
+    "Python > Estimated Time (2 months)\n"
+    "Phase 2: Practice\n"
+    "Phase 2: Practice > Projects\n"
+    "Projects > Estimated Time (3 months)\n"
+    "Total Estimated Time (5 months)\n"
+)
+
+
+@pytest.fixture
+def cassettes(tmp_path):
+    """One recorded response per source, replayed for every request."""
+    transport.configure(mode="replay", cassette_dir=str(tmp_path / "cassettes"), fallback=True, error_rate=0)
+    serpapi = {"organic_results": [{"title": "Data analyst skills", "snippet": "SQL, Python and statistics."}]}
+    transport.save_cassette("serpapi", {"recorded": "serpapi"},
+                            transport.encode_response(200, json.dumps(serpapi).encode("utf-8"), {}))
+    transport.save_cassette("wikipedia", {"recorded": "wikipedia"},
+                            transport.encode_response(200, b'{"extract": "A data analyst inspects data."}', {}))
+    transport.save_cassette("openai", {"recorded": "openai"},
+                            {"content": SUMMARY, "usage": {"prompt_tokens": 10, "completion_tokens": 20}})
+    yield tmp_path
+    transport.configure(mode="replay", fallback=False)
+
+
+def test_runs_topics_from_cassettes(cassettes, capsys):
+    topics = cassettes / "topics.txt"
+    topics.write_text("Data Analyst\n", encoding="utf-8")
+    output = cassettes / "roadmaps.jsonl"
+
+    assert batch_runner.main([str(topics), "--output", str(output), "--workers", "1"]) == 0
+
+    record = json.loads(output.read_text(encoding="utf-8"))
+    assert record["topic"] == "Data Analyst"
+    assert record["result"]["summary"] == SUMMARY
+    assert set(record["timings"]) >= set(batch_runner.STAGES)
+    assert (cassettes / "roadmaps.jsonl.checkpoint").read_text(encoding="utf-8") == "data analyst\n"
+    assert "1 finished (1 ok, 0 failed)" in capsys.readouterr().out
+
+
+def test_api_error_summary_counts_as_failed(cassettes, monkeypatch):
+    async def failing(prompt, model="gpt-4", max_tokens=2000):
+        return "Error calling OpenAI API: rate limited"
+
+    monkeypatch.setattr("agents.synthesizer.acall_openai", failing)
+    checkpoint = cassettes / "failed.checkpoint"
+    writer = batch_runner.JsonlWriter(str(cassettes / "failed.jsonl"))
+    try:
+        stats = asyncio.run(batch_runner.run_batch(["Data Engineer"], writer, str(checkpoint), workers=1))
+    finally:
+        writer.close()
+
+    assert stats["failed"] == 1 and stats["ok"] == 0
+    # Failed topics are retried by the next run
+    assert checkpoint.read_text(encoding="utf-8") == ""
+
+
+def test_checkpoints_topics_only_after_saving_them(cassettes):
+    from helpers.graph_merge import MergedGraph
+
+    merged = MergedGraph()
+    checkpoint = cassettes / "saved.checkpoint"
+    saves = []
+
+    def save():
+        # What the checkpoint holds when the merged graph is saved
+        saves.append((sorted(merged.topics), checkpoint.read_text(encoding="utf-8").split()))
+
+    writer = batch_runner.JsonlWriter(str(cassettes / "saved.jsonl"))
+    try:
+        asyncio.run(batch_runner.run_batch(["Data Analyst", "Data Engineer", "Data Scientist"], writer,
+                                           str(checkpoint), workers=1, merged=merged, save=save, save_every=2))
+    finally:
+        writer.close()
+
+    assert saves == [
+        (["Data Analyst", "Data Engineer"], []),
+        (["Data Analyst", "Data Engineer", "Data Scientist"], ["data", "analyst", "data", "engineer"]),
+    ]
+    assert checkpoint.read_text(encoding="utf-8").splitlines() == ["data analyst", "data engineer", "data scientist"]
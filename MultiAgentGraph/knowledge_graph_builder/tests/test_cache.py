@@ -0,0 +1,52 @@
+import time
+
+from helpers.cache import StageCache, normalize_topic
+
+
+def make_cache(tmp_path, **kwargs):
+    return StageCache(str(tmp_path / "cache.sqlite"), **kwargs)
+
+
+def test_normalize_topic():
+    assert normalize_topic("  Data   Scientist ") == "data scientist"
+
+
+def test_round_trip_and_counters(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.get("research", "data scientist") is None
+    cache.set("research", {"text": "snippet"}, "data scientist")
+    assert cache.get("research", "data scientist") == {"text": "snippet"}
+    # Key parts and stage both take part in the key
+    assert cache.get("synthesis", "data scientist") is None
+    assert cache.get("research", "data engineer") is None
+    assert cache.stats()["stages"]["research"] == {"hits": 1, "misses": 2}
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = make_cache(tmp_path, ttl_seconds=0)
+    cache.set("research", "snippet", "topic")
+    time.sleep(0.01)
+    assert cache.get("research", "topic") is None
+    assert cache.stats()["total_bytes"] >= 0
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=300)
+    cache.set("research", "a" * 100, "first")
+    cache.set("research", "b" * 100, "second")
+    time.sleep(0.01)
+    cache.get("research", "first")
+    cache.set("research", "c" * 100, "third")
+    assert cache.get("research", "second") is None
+    assert cache.get("research", "first") == "a" * 100
+    assert cache.get("research", "third") == "c" * 100
+    assert cache.stats()["total_bytes"] <= 300
+
+
+def test_clear_stage(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.set("research", "snippet", "topic")
+    cache.set("synthesis", "summary", "topic")
+    cache.clear("research")
+    assert cache.get("research", "topic") is None
+    assert cache.get("synthesis", "topic") == "summary"
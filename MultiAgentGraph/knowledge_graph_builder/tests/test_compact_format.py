@@ -0,0 +1,44 @@
+from agents.mapper import IncrementalMapper, build_roadmap_graph, expand_compact, validate_summary
+
+COMPACT = """P1 = Fundamentals
+A = Mathematics, Statistics, Programming Basics
+B = High School Mathematics
+P1 > A > B > ~3 months
+
+P2 = Advanced Programming
+C = Data Structures and Algorithms
+P2 > C > A > ~4 months
+Total Estimated Time (7 months)"""
+
+LINES = """Phase 1: Fundamentals
+Phase 1: Fundamentals > Mathematics, Statistics, Programming Basics > High School Mathematics > Estimated Time (3 months)
+Phase 2: Advanced Programming
+Phase 2: Advanced Programming > Data Structures and Algorithms > Mathematics, Statistics, Programming Basics > Estimated Time (4 months)
+Total Estimated Time (7 months)"""
+
+
+def test_expands_to_the_line_format():
+    assert expand_compact(COMPACT) == LINES
+    assert validate_summary(expand_compact(COMPACT)) == []
+
+
+def test_phase_headers_are_kept():
+    assert expand_compact("P3 = Phase 3: Deployment\nP3 > ~1 month") == (
+        "Phase 3: Deployment\nPhase 3: Deployment > Estimated Time (1 month)")
+
+
+def test_undeclared_ids_stay_literal():
+    assert expand_compact("P1 = Basics\nP1 > Z > Git") == "Phase 1: Basics\nPhase 1: Basics > Z > Git"
+
+
+def test_compact_and_line_formats_map_to_the_same_graph():
+    assert build_roadmap_graph(expand_compact(COMPACT)).to_dict() == build_roadmap_graph(LINES).to_dict()
+
+
+def test_streamed_compact_chunks_map_like_the_whole_text():
+    mapper = IncrementalMapper(compact=True)
+    for start in range(0, len(COMPACT), 7):
+        mapper.feed_text(COMPACT[start:start + 7])
+    mapper.flush()
+    assert mapper.summary == LINES
+    assert mapper.to_graph().to_dict() == build_roadmap_graph(LINES).to_dict()
@@ -0,0 +1,35 @@
+import math
+
+import pytest
+
+from helpers.roadmap_graph import parse_duration_months, MONTHS_PER_UNIT
+
+
+@pytest.mark.parametrize("label, months", [
+    ("Estimated Time (3 months)", 3),
+    ("Estimated Time (2-3 years)", 30),
+    ("Estimated Time (2 to 3 months)", 2.5),
+    ("Estimated Time (six weeks)", 6 * MONTHS_PER_UNIT["week"]),
+    ("Estimated Time (1.5 yrs)", 18),
+    ("Estimated Time (a year)", 12),
+    ("Estimated Time (10 days)", 10 * MONTHS_PER_UNIT["day"]),
+    ("Estimated Time (6+ months)", 6),
+    ("Total Estimated Time (1 year 6 months)", 18),
+    ("Total Estimated Time (1 year and 6 months)", 18),
+    ("Estimated Time (6 months to 1 year)", 9),
+    ("Estimated Time (6 months - 1 year)", 9),
+    ("Total Estimated Time (1 year 6 months to 2 years)", 21),
+    ("Total Estimated Time (2 years) Note: add 6 months for a master's degree", 24),
+    ("Estimated Time: 4 weeks", 4 * MONTHS_PER_UNIT["week"]),
+])
+def test_parse_duration_months(label, months):
+    assert parse_duration_months(label) == pytest.approx(months)
+
+
+@pytest.mark.parametrize("label", [
+    "Total Estimated Time (X years)",
+    "Estimated Time (varies)",
+    "Python Basics",
+])
+def test_labels_without_a_duration_are_nan(label):
+    assert math.isnan(parse_duration_months(label))
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from helpers import transport
+from workflows import langgraph_router
+
+SUMMARY = (
+    "Phase 1: Basics\n"
+    "Phase 1: Basics > Python\n"
+    "Python > Estimated Time (2 months)\n"
+    "Phase 2: Practice\n"
+    "Phase 2: Practice > Projects\n"
+    "Projects > Estimated Time (3 months)\n"
+    "Total Estimated Time (5 months)\n"
+)
+
+
+@pytest.fixture
+def cassettes(tmp_path, monkeypatch):
+    """Replayed responses, with every store off so each call runs the whole pipeline."""
+    transport.configure(mode="replay", cassette_dir=str(tmp_path / "cassettes"), fallback=True, error_rate=0)
+    serpapi = {"organic_results": [{"title": "Data analyst skills", "snippet": "SQL, Python and statistics."}]}
+    transport.save_cassette("serpapi", {"recorded": "serpapi"},
+                            transport.encode_response(200, json.dumps(serpapi).encode("utf-8"), {}))
+    transport.save_cassette("wikipedia", {"recorded": "wikipedia"},
+                            transport.encode_response(200, b'{"extract": "A data analyst inspects data."}', {}))
+    transport.save_cassette("openai", {"recorded": "openai"},
+                            {"content": SUMMARY, "usage": {"prompt_tokens": 10, "completion_tokens": 20}})
+    for name in ("get_cache", "get_graph_store", "get_topic_index"):
+        monkeypatch.setattr(langgraph_router, name, lambda: None)
+    yield tmp_path
+    transport.configure(mode="replay", fallback=False)
+
+
+def roadmap(result):
+    assert "error" not in result, result.get("error")
+    return result["nodes"], result["edges"], result["summary"]
+
+
+def test_sync_wrapper_without_a_running_loop(cassettes):
+    result = langgraph_router.generate_roadmap("Data Analyst")
+    assert roadmap(result)[2] == SUMMARY
+    assert {span.name for span in result["trace"].spans} >= {"research", "synthesis", "mapping"}
+
+
+def test_sync_wrapper_inside_a_running_loop(cassettes, monkeypatch):
+    baseline = roadmap(langgraph_router.generate_roadmap("Data Analyst"))
+    pipeline_threads = []
+    original = langgraph_router.agenerate_roadmap
+
+    async def recording(topic):
+        pipeline_threads.append(threading.get_ident())
+        return await original(topic)
+
+    monkeypatch.setattr(langgraph_router, "agenerate_roadmap", recording)
+
+    async def notebook_cell():
+        # What Streamlit or Jupyter does: the blocking call runs while a loop is running
+        return langgraph_router.generate_roadmap("Data Analyst"), threading.get_ident()
+
+    result, loop_thread = asyncio.run(notebook_cell())
+    assert roadmap(result) == baseline
+    # asyncio.run cannot nest, so the pipeline ran on its own loop in a worker thread
+    assert pipeline_threads and pipeline_threads[0] != loop_thread
+
+
+def test_awaiting_the_async_pipeline(cassettes):
+    baseline = roadmap(langgraph_router.generate_roadmap("Data Analyst"))
+
+    async def run():
+        return await langgraph_router.agenerate_roadmap("Data Analyst")
+
+    assert roadmap(asyncio.run(run())) == baseline
@@ -0,0 +1,98 @@
+from agents.mapper import build_roadmap_graph
+from helpers.graph_merge import MergedGraph, canonical_skill
+from helpers.roadmap_graph import NO_PHASE
+
+
+def roadmap(*lines):
+    return build_roadmap_graph("\n".join(lines))
+
+
+def shown(graph):
+    """{label: phase label or None} of an exported graph."""
+    return {label: graph.labels[phase] if phase != NO_PHASE else None
+            for label, phase in zip(graph.labels, graph.phase_of)}
+
+
+def test_rewordings_of_a_skill_share_a_node():
+    assert canonical_skill("Python") == canonical_skill("Python Programming") == \
+        canonical_skill("Programming Basics (Python)") == "python"
+
+    merged = MergedGraph()
+    merged.merge("a", roadmap("Phase 1: Basics", "Phase 1: Basics > Python", "Python > SQL Fundamentals"))
+    merged.merge("b", roadmap("Phase 1: Start", "Phase 1: Start > Python Programming", "Python Programming > SQL"))
+    merged.merge("c", roadmap("Phase 1: Intro", "Phase 1: Intro > Programming Basics (Python)", "Java"))
+
+    python = merged.find("Python")
+    assert merged.find("Python Programming") == merged.find("Programming Basics (Python)") == python
+    assert merged.roadmaps_of(python) == ["a", "b", "c"]
+    assert sorted(merged.aliases(python)) == ["Programming Basics (Python)", "Python", "Python Programming"]
+    assert merged.find("SQL") == merged.find("SQL Fundamentals")
+    # Unrelated labels stay apart, and phase headers merge by number
+    assert len({python, merged.find("SQL"), merged.find("Java")}) == 3
+    assert merged.find("Pandas") is None
+    assert merged.labels.count("Phase 1") == 1
+
+
+def test_merging_a_topic_again_replaces_its_roadmap():
+    merged = MergedGraph()
+    merged.merge("Data Analyst", roadmap("Phase 1: Basics", "Phase 1: Basics > Python", "Python > SQL"))
+    merged.merge("Data Engineer", roadmap("Phase 1: Basics", "Phase 1: Basics > SQL"))
+    merged.merge("data analyst", roadmap("Phase 1: Basics", "Phase 1: Basics > Excel"))
+
+    assert merged.num_roadmaps == 2
+    assert merged.node_roadmaps[merged.find("Python")] == 0
+    assert merged.node_roadmaps[merged.find("SQL")] == 1
+    assert merged.node_roadmaps[merged.find("Excel")] == 1
+    assert merged.node_roadmaps[merged.labels.index("Phase 1")] == 2
+    assert merged.roadmaps_of(merged.find("SQL")) == ["Data Engineer"]
+    assert merged.roadmaps_of(merged.find("Excel")) == ["data analyst"]
+    python_sql = merged.find("Python") << 32 | merged.find("SQL")
+    assert merged.edge_roadmaps[merged._edge_ids[python_sql]] == 0
+    assert set(merged.to_roadmap_graph().labels) == {"Phase 1", "SQL", "Excel"}
+
+
+def test_min_roadmaps_keeps_content_of_hidden_phases():
+    merged = MergedGraph()
+    merged.merge("a", roadmap("Phase 1: Basics", "Phase 1: Basics > Python", "Python > Estimated Time (2 months)",
+                              "Phase 7: Extra", "Phase 7: Extra > Kubernetes"))
+    merged.merge("b", roadmap("Phase 1: Basics", "Phase 1: Basics > SQL", "SQL > Kubernetes"))
+
+    # Phase 7 is in one roadmap only, Kubernetes in both
+    assert shown(merged.to_roadmap_graph(min_roadmaps=2)) == {"Phase 1": None, "Kubernetes": None}
+
+    merged.merge("a", roadmap("Phase 1: Basics", "Phase 1: Basics > Python", "Python > Estimated Time (2 months)"))
+    assert merged.roadmaps_of(merged.find("Kubernetes")) == ["b"]
+    # Its phase now comes from b, the only roadmap still listing it
+    assert shown(merged.to_roadmap_graph()) == {"Phase 1": None, "Python": "Phase 1", "SQL": "Phase 1",
+                                                "Kubernetes": "Phase 1"}
+
+
+def test_json_round_trip():
+    merged = MergedGraph()
+    merged.merge("a", roadmap("Phase 1: Basics", "Phase 1: Basics > Python", "Python > SQL"))
+    merged.merge("b", roadmap("Phase 1: Basics", "Phase 1: Basics > Python Programming", "Phase 2: Data",
+                              "Phase 2: Data > Pandas"))
+    merged.merge("a", roadmap("Phase 1: Basics", "Phase 1: Basics > SQL"))
+
+    loaded = MergedGraph.from_json(merged.to_json())
+
+    assert loaded.to_json() == merged.to_json()
+    assert loaded.node_roadmaps == merged.node_roadmaps and loaded.edge_roadmaps == merged.edge_roadmaps
+    assert loaded.roadmaps_of(loaded.find("Python")) == ["b"]
+    assert shown(loaded.to_roadmap_graph()) == shown(merged.to_roadmap_graph())
+    # Merging continues where the saved graph stopped
+    assert loaded.merge("c", roadmap("Phase 1: Basics", "Phase 1: Basics > Python"))["new_nodes"] == 0
+
+
+def test_level_of_detail_collapses_the_least_shared_nodes():
+    merged = MergedGraph()
+    for index in range(6):
+        lines = ["Phase 1: Basics", "Phase 1: Basics > Python", "Python > SQL", f"SQL > Library {index}"]
+        merged.merge(f"topic {index}", roadmap(*lines))
+
+    graph = merged.to_roadmap_graph(max_nodes=4)
+    labels = shown(graph)
+    assert labels == {"Phase 1": None, "Python": "Phase 1", "SQL": "Phase 1", "+6 more in Phase 1": "Phase 1"}
+    collapsed = graph.ids["+6 more in Phase 1"]
+    assert (graph.ids["SQL"], collapsed) in set(graph.edges())
+    assert len(merged.to_roadmap_graph().labels) == 9
@@ -0,0 +1,118 @@
+import sqlite3
+
+import pytest
+
+from agents.mapper import build_roadmap_graph
+from helpers import graph_store
+from helpers.graph_store import GraphStore, GraphStoreWriteError
+
+ANALYST = """Phase 1: Foundations
+Phase 1: Foundations > SQL > PostgreSQL > Estimated Time (2 months)
+Phase 2: Analysis
+Phase 2: Analysis > Python > pandas > Estimated Time (3 months)
+Total Estimated Time (5 months)"""
+
+SCIENTIST = """Phase 1: Foundations
+Phase 1: Foundations > python > NumPy > Estimated Time (2 months)
+Phase 2: Modelling
+Phase 2: Modelling > Machine Learning > scikit-learn > Estimated Time (4 months)
+Total Estimated Time (6 months)"""
+
+
+@pytest.fixture
+def store(tmp_path):
+    return GraphStore(str(tmp_path / "graphs.sqlite"), bulk_size=2)
+
+
+def _same_graph(stored, original):
+    assert stored.labels == original.labels
+    assert stored.kinds == original.kinds
+    assert list(stored.phase_of) == list(original.phase_of)
+    assert sorted(stored.edges()) == sorted(original.edges())
+
+
+def test_round_trip(store):
+    graph = build_roadmap_graph(ANALYST)
+    store.add_roadmap("Data Analyst", graph, ANALYST)
+    _same_graph(store.get_graph("data analyst"), graph)
+    assert store.get_graph("Unknown") is None
+
+
+def test_each_roadmap_keeps_its_own_labels(store):
+    store.add_roadmap("Data Analyst", build_roadmap_graph(ANALYST), ANALYST)
+    store.add_roadmap("Data Scientist", build_roadmap_graph(SCIENTIST), SCIENTIST)
+    _same_graph(store.get_graph("Data Scientist"), build_roadmap_graph(SCIENTIST))
+    # "Python" and "python" are one shared node
+    assert store.shared_nodes("Data Scientist", "Data Analyst") == ["python"]
+    assert store.shared_nodes("Data Analyst", "Data Scientist") == ["Python"]
+
+
+def test_queries(store):
+    store.add_roadmaps([
+        ("Data Analyst", build_roadmap_graph(ANALYST), ANALYST),
+        ("Data Scientist", build_roadmap_graph(SCIENTIST), SCIENTIST),
+    ])
+    assert store.topics() == ["Data Analyst", "Data Scientist"]
+    assert dict(store.neighbours("Python")) == {"pandas": 1, "NumPy": 1}
+    assert [topic for topic, _ in store.roadmaps_with("python")] == ["Data Scientist", "Data Analyst"]
+    assert store.shortest_path("SQL", "Estimated Time (2 months)") == ["SQL", "PostgreSQL", "Estimated Time (2 months)"]
+    assert store.shortest_path("scikit-learn", "SQL") is None
+
+
+def test_unchanged_summary_is_not_rewritten(store):
+    graph = build_roadmap_graph(ANALYST)
+    store.add_roadmap("Data Analyst", graph, ANALYST)
+    store.add_roadmap("Data Analyst", build_roadmap_graph(SCIENTIST), ANALYST)
+    _same_graph(store.get_graph("Data Analyst"), graph)
+    store.add_roadmap("Data Analyst", build_roadmap_graph(SCIENTIST), SCIENTIST)
+    _same_graph(store.get_graph("Data Analyst"), build_roadmap_graph(SCIENTIST))
+
+
+def test_sources_round_trip(store):
+    store.save_source("Data Analyst", ANALYST, "Some research.")
+    assert store.get_source("DATA ANALYST") == (ANALYST, "Some research.")
+
+
+def test_failed_bulk_batch_is_requeued(store, monkeypatch):
+    write = store._write_locked
+    failures = []
+
+    def flaky(pending):
+        if not failures:
+            failures.append(len(pending))
+            raise sqlite3.OperationalError("database is locked")
+        write(pending)
+
+    monkeypatch.setattr(store, "_write_locked", flaky)
+    with store.bulk():
+        store.add_roadmap("Data Analyst", build_roadmap_graph(ANALYST), ANALYST)
+        with pytest.raises(GraphStoreWriteError) as raised:
+            store.add_roadmap("Data Scientist", build_roadmap_graph(SCIENTIST), SCIENTIST)
+        assert raised.value.topics == ["Data Analyst", "Data Scientist"]
+    assert failures == [2]
+    assert store.topics() == ["Data Analyst", "Data Scientist"]
+
+
+def test_failed_final_flush_lists_the_topics(store, monkeypatch):
+    def failing(pending):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(store, "_write_locked", failing)
+    with pytest.raises(GraphStoreWriteError) as raised:
+        with store.bulk():
+            store.add_roadmap("Data Analyst", build_roadmap_graph(ANALYST), ANALYST)
+    assert raised.value.topics == ["Data Analyst"]
+
+
+def test_stores_without_roadmap_labels_are_migrated(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    conn = sqlite3.connect(path)
+    for statement in graph_store.SCHEMA:
+        conn.execute(statement.replace("        label TEXT,\n", ""))
+    conn.commit()
+    conn.close()
+
+    store = GraphStore(path)
+    graph = build_roadmap_graph(ANALYST)
+    store.add_roadmap("Data Analyst", graph, ANALYST)
+    _same_graph(store.get_graph("Data Analyst"), graph)
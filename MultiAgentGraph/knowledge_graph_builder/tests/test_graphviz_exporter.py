@@ -0,0 +1,74 @@
+import os
+from collections import Counter
+
+import pytest
+
+from agents.mapper import map_to_graph, build_roadmap_graph
+from helpers.graphviz_exporter import export_to_graphviz
+
+SNAPSHOTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+
+# The *.baseline.dot snapshots were produced by export_to_graphviz as it was
+# before RoadmapGraph (it matched labels and re-parsed the summary text)
+CASES = {
+    "distinct_estimates": """Phase 1: Fundamentals
+Phase 1: Fundamentals > Mathematics, Statistics
+Mathematics, Statistics > Linear Algebra
+Linear Algebra > Estimated Time (3 months)
+Phase 2: Programming
+Phase 2: Programming > Python
+Python > Pandas, NumPy
+Pandas, NumPy > Estimated Time (4 months)
+Phase 3: Projects
+Phase 3: Projects > Portfolio
+Portfolio > Estimated Time (2 months)
+Total Estimated Time (9 months) Note: keep going""",
+    "no_phases": """Mathematics > Linear Algebra
+Linear Algebra > Estimated Time (2 months)
+Total Estimated Time (2 months)""",
+    "shared_estimate": """Phase 1: Fundamentals
+Phase 1: Fundamentals > Mathematics
+Mathematics > Estimated Time (3 months)
+Phase 2: Programming
+Phase 2: Programming > Python
+Python > Estimated Time (3 months)
+Python > Git
+Total Estimated Time (6 months)""",
+}
+
+
+def read_snapshot(name):
+    with open(os.path.join(SNAPSHOTS, f"{name}.baseline.dot"), "r", encoding="utf-8") as fh:
+        return fh.read()
+
+
+def sources(summary):
+    """DOT source for the dict generate_roadmap returns and for its RoadmapGraph."""
+    data = map_to_graph(summary)
+    data["summary"] = summary
+    return export_to_graphviz(data).source, export_to_graphviz(build_roadmap_graph(summary)).source
+
+
+@pytest.mark.parametrize("name", ["distinct_estimates", "no_phases"])
+def test_matches_baseline_snapshot(name):
+    for source in sources(CASES[name]):
+        assert source == read_snapshot(name)
+
+
+def test_shared_estimate_is_drawn_in_its_first_phase_only():
+    # The baseline also declared a node shared by several phases in every later
+    # phase's cluster, which Graphviz ignores (a node is drawn in one cluster),
+    # and chained it into that cluster's invisible stacking edges. A node now
+    # belongs to the first phase it is listed under only.
+    baseline = Counter(line.strip() for line in read_snapshot("shared_estimate").splitlines())
+    for source in sources(CASES["shared_estimate"]):
+        actual = Counter(line.strip() for line in source.splitlines())
+        assert baseline - actual == Counter(["n2", "n4 -> n2 [minlen=1.0 style=invis]",
+                                             "n2 -> n5 [minlen=1.0 style=invis]"])
+        assert actual - baseline == Counter(["n4 -> n5 [minlen=1.0 style=invis]"])
+
+
+def test_highlight_outlines_nodes():
+    data = map_to_graph(CASES["distinct_estimates"])
+    source = export_to_graphviz(data, highlight=["Python"]).source
+    assert 'n5 [label=Python color=forestgreen penwidth=3]' in source
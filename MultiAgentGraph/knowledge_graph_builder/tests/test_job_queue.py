@@ -0,0 +1,146 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from helpers.job_queue import JobQueue, CANCELLED, DONE, FAILED, QUEUED, RUNNING, CANCELLED_ERROR
+from workflows.job_service import make_server
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite"), stale_seconds=60, max_attempts=2)
+
+
+def _make_stale(queue, job_id):
+    queue._connection().execute("UPDATE jobs SET heartbeat_at = 0 WHERE id = ?", (job_id,))
+
+
+def _types(queue, job_id):
+    return [event["type"] for _, event in queue.events(job_id)]
+
+
+def test_job_runs_to_done(queue):
+    job_id = queue.submit("Data Analyst")
+    assert queue.get(job_id)["status"] == QUEUED
+    assert queue.claim("w1") == (job_id, "Data Analyst")
+    assert queue.claim("w2") is None
+    assert queue.add_event(job_id, "w1", {"type": "token", "text": "Phase 1"})
+    assert queue.finish(job_id, "w1", {"summary": "Phase 1"}) == DONE
+
+    job = queue.get(job_id)
+    assert (job["status"], job["result"], job["attempts"]) == (DONE, {"summary": "Phase 1"}, 1)
+    assert _types(queue, job_id) == ["token", "done"]
+    assert [seq for seq, _ in queue.events(job_id, after=1)] == [2]
+
+
+def test_error_result_fails_the_job(queue):
+    job_id = queue.submit("x")
+    queue.claim("w1")
+    assert queue.finish(job_id, "w1", {"error": "Topic length must be between 3 and 100 characters"}) == FAILED
+
+
+def test_cancel_queued_job(queue):
+    job_id = queue.submit("Data Analyst")
+    assert queue.cancel(job_id) == CANCELLED
+    assert queue.claim("w1") is None
+    assert queue.cancel(job_id) == CANCELLED
+    assert queue.cancel("unknown") is None
+
+
+def test_cancel_running_job_stops_its_worker(queue):
+    job_id = queue.submit("Data Analyst")
+    queue.claim("w1")
+    assert queue.cancel(job_id) == RUNNING
+    assert not queue.add_event(job_id, "w1", {"type": "token", "text": "x"})
+    assert not queue.heartbeat(job_id, "w1")
+    assert queue.finish(job_id, "w1", {"summary": "ignored"}) == CANCELLED
+    assert queue.get(job_id)["error"] == CANCELLED_ERROR
+
+
+def test_stale_job_is_rerun_by_another_worker(queue):
+    job_id = queue.submit("Data Analyst")
+    queue.claim("w1")
+    queue.add_event(job_id, "w1", {"type": "token", "text": "partial"})
+    _make_stale(queue, job_id)
+
+    assert queue.claim("w2") == (job_id, "Data Analyst")
+    assert _types(queue, job_id) == ["token", "restart"]
+    # The first worker lost the job
+    assert not queue.add_event(job_id, "w1", {"type": "token", "text": "late"})
+    assert queue.finish(job_id, "w1", {"summary": "late"}) is None
+    assert queue.finish(job_id, "w2", {"summary": "ok"}) == DONE
+    assert queue.get(job_id)["attempts"] == 2
+
+
+def test_stale_cancelled_job_is_not_rerun(queue):
+    job_id = queue.submit("Data Analyst")
+    queue.claim("w1")
+    queue.cancel(job_id)
+    _make_stale(queue, job_id)
+
+    assert queue.claim("w2") is None
+    job = queue.get(job_id)
+    assert (job["status"], job["error"], job["attempts"]) == (CANCELLED, CANCELLED_ERROR, 1)
+    assert _types(queue, job_id) == ["done"]
+
+
+def test_attempts_are_capped(queue):
+    job_id = queue.submit("Data Analyst")
+    for worker in ("w1", "w2"):
+        assert queue.claim(worker) == (job_id, "Data Analyst")
+        _make_stale(queue, job_id)
+
+    assert queue.claim("w3") is None
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"]) == (FAILED, 2)
+    assert "2 times" in job["error"]
+
+
+def test_purge_deletes_finished_jobs(queue):
+    finished = queue.submit("Data Analyst")
+    queue.cancel(finished)
+    waiting = queue.submit("Data Scientist")
+    assert queue.purge(older_than=-1) == 1
+    assert queue.get(finished) is None and queue.events(finished) == []
+    assert queue.get(waiting)["status"] == QUEUED
+
+
+@pytest.fixture
+def service(tmp_path):
+    server = make_server(port=0, queue_path=str(tmp_path / "jobs.sqlite"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", server.queue
+    server.shutdown()
+    server.server_close()
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode("utf-8")
+
+
+@pytest.mark.parametrize("after", ["abc", "-1", "1.5"])
+def test_invalid_after_is_a_bad_request(service, after):
+    url, queue = service
+    job_id = queue.submit("Data Analyst")
+    status, body = _get(f"{url}/jobs/{job_id}/events?after={after}")
+    assert status == 400
+    assert "after" in json.loads(body)["error"]
+
+
+def test_events_resume_after_a_sequence_number(service):
+    url, queue = service
+    job_id = queue.submit("Data Analyst")
+    queue.claim("w1")
+    queue.add_event(job_id, "w1", {"type": "token", "text": "a"})
+    queue.finish(job_id, "w1", {"summary": "a"})
+    status, body = _get(f"{url}/jobs/{job_id}/events?after=1")
+    assert status == 200
+    assert [json.loads(line)["seq"] for line in body.splitlines()] == [2]
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from helpers.json_fields import extract_fields
+from helpers.serpapi_tool import SEARCH_FIELDS
+
+RESPONSE = {
+    "search_metadata": {"id": "1", "status": "Success"},
+    "answer_box": {"snippet": "Data analysts turn data into decisions.", "link": "https://example.com"},
+    "organic_results": [
+        {"position": 1, "title": "What does a data analyst do?", "snippet": "SQL, Excel and “dashboards”."},
+        {"position": 2, "title": "Data analyst roadmap", "snippet": "Statistics, then Python.", "extra": [1, 2]},
+        {"position": 3, "title": "Salaries", "snippet": "Varies by region."},
+    ],
+    "related_questions": [{"question": "Is it hard?"}],
+}
+BODY = json.dumps(RESPONSE, ensure_ascii=False).encode("utf-8")
+
+
+def test_reads_only_the_wanted_fields():
+    data, complete = extract_fields(BODY, SEARCH_FIELDS)
+
+    assert complete
+    assert data == {
+        "answer_box": {"snippet": "Data analysts turn data into decisions."},
+        "organic_results": [{"title": result["title"], "snippet": result["snippet"]}
+                            for result in RESPONSE["organic_results"]],
+    }
+
+
+def test_truncated_body_keeps_the_complete_items():
+    full, _ = extract_fields(BODY, SEARCH_FIELDS)
+    for size in range(1, len(BODY)):
+        data, complete = extract_fields(BODY[:size], SEARCH_FIELDS)
+        assert not complete, size
+        # Whatever was read is exactly what the full body has, cut at an item boundary
+        assert set(data) <= set(full)
+        if "answer_box" in data:
+            assert data["answer_box"] == full["answer_box"]
+        results = data.get("organic_results", [])
+        assert results == full["organic_results"][:len(results)]
+
+
+def test_truncated_inside_a_result():
+    cut = BODY.index(b"Data analyst roadmap")
+    data, complete = extract_fields(BODY[:cut], SEARCH_FIELDS)
+
+    assert not complete
+    assert data["organic_results"] == [{"title": "What does a data analyst do?",
+                                        "snippet": "SQL, Excel and “dashboards”."}]
+
+
+def test_truncated_inside_a_multibyte_character():
+    cut = BODY.index("”".encode("utf-8")) + 1
+    data, complete = extract_fields(BODY[:cut], SEARCH_FIELDS)
+
+    assert not complete
+    assert data == {"answer_box": {"snippet": "Data analysts turn data into decisions."}, "organic_results": []}
+
+
+@pytest.mark.parametrize("body", [b"", b"[1, 2]", b"not json"])
+def test_rejects_bodies_that_are_not_objects(body):
+    with pytest.raises(json.JSONDecodeError):
+        extract_fields(body, SEARCH_FIELDS)
+
+
+def test_unwanted_values_are_skipped_without_decoding(monkeypatch):
+    from helpers import json_fields
+
+    body = json.dumps({
+        "organic_results": [{"title": 'a "quoted" ] title', "snippet": "x{y}[z]\\"}, [1, 2.5e3, None, True]],
+        "ads": "}]",
+        "knowledge_graph": {"description": "Wanted."},
+        "pagination": {"next": 2},
+    }).encode("utf-8")
+    decoded = []
+    decoder = json_fields._decoder
+
+    class RecordingDecoder:
+        def raw_decode(self, text, index):
+            value, end = decoder.raw_decode(text, index)
+            decoded.append(value)
+            return value, end
+
+    monkeypatch.setattr(json_fields, "_decoder", RecordingDecoder())
+    data, complete = extract_fields(body, {"knowledge_graph": ("description",)})
+
+    assert complete
+    assert data == {"knowledge_graph": {"description": "Wanted."}}
+    # Only the keys and the wanted value were decoded
+    assert decoded == ["organic_results", "ads", "knowledge_graph", {"description": "Wanted."}, "pagination"]
+
+
+def test_truncated_unwanted_value_is_incomplete():
+    body = json.dumps({"knowledge_graph": {"description": "Wanted."}, "ads": [{"title": "x"}] * 5}).encode("utf-8")
+    for size in range(body.index(b'"ads"'), len(body) - 1):
+        data, complete = extract_fields(body[:size], {"knowledge_graph": ("description",)})
+        assert data == {"knowledge_graph": {"description": "Wanted."}}
+        assert not complete, size
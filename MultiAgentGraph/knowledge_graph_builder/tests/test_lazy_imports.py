@@ -0,0 +1,31 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_import_time import DEFERRED_MODULES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def loaded_modules(module):
+    """Modules in sys.modules after importing ``module`` in a fresh interpreter."""
+    code = f"import json, sys; import {module}; print(json.dumps(sorted(sys.modules)))"
+    completed = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return set(json.loads(completed.stdout.splitlines()[-1]))
+
+
+@pytest.mark.parametrize("module", [
+    pytest.param("app", marks=pytest.mark.skipif(importlib.util.find_spec("streamlit") is None,
+                                                 reason="the app needs streamlit")),
+    "workflows.langgraph_router",
+    "workflows.batch_runner",
+    "helpers.render_cache",
+])
+def test_clients_are_imported_on_first_use(module):
+    loaded = loaded_modules(module)
+    assert {"openai", "graphviz", "requests", "tiktoken"} <= set(DEFERRED_MODULES)
+    assert sorted(loaded.intersection(DEFERRED_MODULES)) == []
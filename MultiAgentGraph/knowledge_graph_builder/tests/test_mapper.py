@@ -0,0 +1,124 @@
+import re
+
+import pytest
+
+from agents.mapper import map_to_graph, build_roadmap_graph, IncrementalMapper
+
+
+def baseline_map_to_graph(summary_text):
+    """map_to_graph as it was before the incremental builder, kept as the reference."""
+    lines = [line.strip() for line in summary_text.split('\n') if line.strip()]
+    nodes = set()
+    edges = []
+    current_phase_label = None
+    last_node_in_current_phase = {}
+    phase_start_nodes = {}
+    for line in lines:
+        parts = [part.strip() for part in line.split('>') if part.strip()]
+        if not parts:
+            continue
+        for part in parts:
+            nodes.add(part)
+        phase_match = re.match(r'^(Phase \d+): (.+)', parts[0])
+        if phase_match:
+            current_phase_label = phase_match.group(1)
+            phase_start_nodes[current_phase_label] = parts[0]
+        for i in range(len(parts) - 1):
+            if (parts[i], parts[i + 1]) not in edges:
+                edges.append((parts[i], parts[i + 1]))
+        if current_phase_label and parts[-1] != current_phase_label:
+            last_node_in_current_phase[current_phase_label] = parts[-1]
+    sorted_phase_labels = sorted(last_node_in_current_phase, key=lambda x: int(re.search(r'\d+', x).group()))
+    for current_phase, next_phase in zip(sorted_phase_labels, sorted_phase_labels[1:]):
+        last_node = last_node_in_current_phase.get(current_phase)
+        next_phase_start_node = phase_start_nodes.get(next_phase)
+        if last_node and next_phase_start_node and (last_node, next_phase_start_node) not in edges:
+            edges.append((last_node, next_phase_start_node))
+    total_time_node = None
+    final_time_estimate_node = None
+    for node in nodes:
+        if "total estimated time" in node.lower():
+            total_time_node = node
+        if "estimated time" in node.lower() and "total" not in node.lower():
+            final_time_estimate_node = node
+    if total_time_node and final_time_estimate_node and (final_time_estimate_node, total_time_node) not in edges:
+        edges.append((final_time_estimate_node, total_time_node))
+    return {"nodes": list(nodes), "edges": edges}
+
+
+TYPICAL = """Phase 1: Fundamentals
+Phase 1: Fundamentals > Mathematics, Statistics
+Mathematics, Statistics > Estimated Time (3 months)
+Phase 2: Programming
+Phase 2: Programming > Python
+Python > Estimated Time (4 months)
+Total Estimated Time (7 months)"""
+
+REPEATED_ESTIMATES = """Phase 1: Fundamentals
+Phase 1: Fundamentals > Mathematics
+Mathematics > Estimated Time (3 months)
+Phase 2: Programming
+Phase 2: Programming > Python
+Python > Estimated Time (2 months)
+Phase 3: Projects
+Phase 3: Projects > Portfolio
+Portfolio > Estimated Time (3 months)
+Total Estimated Time (8 months)"""
+
+BLANK_LINES = """
+
+Phase 1: Fundamentals
+   Phase 1: Fundamentals >  Mathematics  >
+
+Mathematics > > Estimated Time (3 months)
+
+Phase 2: Programming
+Phase 2: Programming > Python
+Python > Estimated Time (4 months)
+"""
+
+NO_PHASES = """Mathematics > Linear Algebra
+Linear Algebra > Estimated Time (2 months)
+Statistics > Probability
+Probability > Estimated Time (1 month)"""
+
+ERROR_TEXT = "Error calling OpenAI API: connection reset"
+
+
+def _is_total_edge(edge):
+    return "total estimated time" in edge[1].lower()
+
+
+@pytest.mark.parametrize("summary", [TYPICAL, REPEATED_ESTIMATES, BLANK_LINES, NO_PHASES, ERROR_TEXT, ""])
+def test_matches_baseline_map_to_graph(summary):
+    expected = baseline_map_to_graph(summary)
+    actual = map_to_graph(summary)
+    assert sorted(actual["nodes"]) == sorted(expected["nodes"])
+    # The baseline picked the estimate linked to the total from an unordered set
+    assert [edge for edge in actual["edges"] if not _is_total_edge(edge)] == \
+        [edge for edge in expected["edges"] if not _is_total_edge(edge)]
+    assert len(actual["edges"]) == len(expected["edges"])
+
+
+def test_total_links_from_last_estimate_seen():
+    edges = map_to_graph(REPEATED_ESTIMATES)["edges"]
+    assert ("Estimated Time (3 months)", "Total Estimated Time (8 months)") in edges
+    assert ("Estimated Time (2 months)", "Total Estimated Time (8 months)") not in edges
+
+    edges = map_to_graph(TYPICAL)["edges"]
+    assert ("Estimated Time (4 months)", "Total Estimated Time (7 months)") in edges
+
+
+def test_phase_membership():
+    graph = build_roadmap_graph(TYPICAL)
+    phase_one = graph.ids["Phase 1: Fundamentals"]
+    assert graph.phase_of[graph.ids["Mathematics, Statistics"]] == phase_one
+    assert graph.phase_of[graph.ids["Python"]] == graph.ids["Phase 2: Programming"]
+
+
+def test_incremental_mapper_matches_whole_text():
+    mapper = IncrementalMapper()
+    for start in range(0, len(REPEATED_ESTIMATES), 7):
+        mapper.feed_text(REPEATED_ESTIMATES[start:start + 7])
+    mapper.flush()
+    assert mapper.snapshot() == map_to_graph(REPEATED_ESTIMATES)
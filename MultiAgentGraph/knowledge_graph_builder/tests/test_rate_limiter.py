@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from helpers import rate_limiter
+from helpers.rate_limiter import RateLimiter, BATCH, INTERACTIVE
+
+
+def _exhausted(rpm=1200, tpm=0):
+    limiter = RateLimiter(rpm=rpm, tpm=tpm, name="test")
+    limiter._requests = 0.0
+    return limiter
+
+
+def _grant_order(limiter, requests, monkeypatch):
+    """
+    Order in which ``requests`` ((tokens, lane), arriving in that order) are
+    let through, as their token counts.
+    """
+    order = []
+    grant = rate_limiter._Waiter.grant
+
+    def recording_grant(waiter):
+        order.append(waiter.tokens)
+        grant(waiter)
+
+    monkeypatch.setattr(rate_limiter._Waiter, "grant", recording_grant)
+
+    async def main():
+        tasks = []
+        for tokens, lane in requests:
+            tasks.append(asyncio.ensure_future(limiter.aacquire(tokens, lane)))
+            await asyncio.sleep(0)  # Enqueue in this order
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    return order
+
+
+def test_interactive_goes_ahead_of_waiting_batch_requests(monkeypatch):
+    order = _grant_order(_exhausted(), [(1, BATCH), (2, BATCH), (3, INTERACTIVE), (4, BATCH)], monkeypatch)
+    assert order == [3, 1, 2, 4]
+
+
+def test_large_request_is_not_overtaken_within_its_lane(monkeypatch):
+    limiter = RateLimiter(rpm=0, tpm=60000, name="test")
+    limiter._tokens = 0.0
+    assert _grant_order(limiter, [(100, BATCH), (1, BATCH), (2, BATCH)], monkeypatch) == [100, 1, 2]
+
+
+def test_cancelled_waiter_is_skipped():
+    limiter = _exhausted()
+
+    async def main():
+        waiting = asyncio.ensure_future(limiter.aacquire(1, BATCH))
+        await asyncio.sleep(0)
+        assert limiter.depth() == {INTERACTIVE: 0, BATCH: 1}
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert limiter.depth() == {INTERACTIVE: 0, BATCH: 0}
+        await limiter.aacquire(1, INTERACTIVE)
+
+    asyncio.run(main())
+
+
+def test_priority_sets_the_lane():
+    assert rate_limiter.current_lane() == INTERACTIVE
+    with rate_limiter.priority(BATCH):
+        assert rate_limiter.current_lane() == BATCH
+    assert rate_limiter.current_lane() == INTERACTIVE
+    with pytest.raises(ValueError):
+        with rate_limiter.priority("bulk"):
+            pass
+
+
+def test_limits_are_split_between_processes(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "OPENAI_RATE_LIMITS", '{"gpt-4": {"rpm": 500, "tpm": 30000}}')
+    assert rate_limiter._limits("gpt-4") == (500, 30000)
+    assert rate_limiter._limits("gpt-4", processes=4) == (125, 7500)
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, headers):
+        super().__init__("rate limited")
+        self.response = type("Response", (), {"headers": headers})()
+
+
+def test_retry_delay_honours_retry_after(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "OPENAI_MAX_RETRIES", 2)
+    assert 5 <= rate_limiter.retry_delay(_RateLimited({"retry-after": "5"}), 0) <= 5 * 1.25
+    assert rate_limiter.retry_delay(_RateLimited({}), 2) is None
+    assert rate_limiter.retry_delay(ValueError("bad request"), 0) is None
@@ -0,0 +1,82 @@
+import json
+import math
+
+import pytest
+
+from helpers import transport
+from helpers.context_builder import PASSAGE_SEPARATOR
+from helpers.graph_store import get_graph_store
+from helpers.roadmap_diff import phase_months, retime_total
+from workflows import langgraph_router
+
+SUMMARY = (
+    "Phase 1: Basics\n"
+    "Phase 1: Basics > Python\n"
+    "Python > Estimated Time (2 months)\n"
+    "Phase 2: Dashboards\n"
+    "Phase 2: Dashboards > Tableau\n"
+    "Tableau > Estimated Time (3 months)\n"
+    "Total Estimated Time (5 months)\n"
+)
+
+
+@pytest.fixture
+def cassettes(tmp_path):
+    transport.configure(mode="replay", cassette_dir=str(tmp_path / "cassettes"), fallback=True, error_rate=0)
+    serpapi = {"organic_results": [{"title": "Analyst skills", "snippet": "An analyst learns Python first."}]}
+    transport.save_cassette("serpapi", {"recorded": "serpapi"},
+                            transport.encode_response(200, json.dumps(serpapi).encode("utf-8"), {}))
+    transport.save_cassette("wikipedia", {"recorded": "wikipedia"},
+                            transport.encode_response(200, b'{"extract": "An analyst inspects data."}', {}))
+    transport.save_cassette("openai", {"recorded": "openai"},
+                            {"content": SUMMARY, "usage": {"prompt_tokens": 10, "completion_tokens": 20}})
+    yield tmp_path
+    transport.configure(mode="replay", fallback=False)
+
+
+def test_phase_months_sums_branch_estimates():
+    lines = ["Phase 1: Basics > Python > Estimated Time (2 months)", "SQL > Estimated Time (1 year)"]
+    assert phase_months(lines) == 14
+    assert math.isnan(phase_months(["Phase 1: Basics > Estimated Time (X months)"]))
+
+
+def test_retime_total_moves_the_stated_duration():
+    assert retime_total(["Total Estimated Time (1 year) Note: part-time"], 3) == [
+        "Total Estimated Time (15 months) Note: part-time"]
+    assert retime_total(["Total Estimated Time (X years)"], 3) is None
+    assert retime_total([], 3) is None
+
+
+def test_unchanged_refresh_has_no_delta(cassettes):
+    topic = "Marketing Analyst"
+    assert "error" not in langgraph_router.generate_roadmap(topic)
+
+    result = langgraph_router.refresh_roadmap(topic)
+
+    assert result["refresh"]["mode"] == "unchanged"
+    assert result["summary"] == SUMMARY
+    assert all(not changes for changes in result["delta"].values())
+
+
+def test_phase_refresh_updates_the_total(cassettes, monkeypatch):
+    topic = "Insurance Analyst"
+    assert "error" not in langgraph_router.generate_roadmap(topic)
+    _, context = get_graph_store().get_source(topic)
+
+    async def fresh_research(topic):
+        passage = "Insurance analyst dashboards are now built in Tableau and Power BI."
+        return context + PASSAGE_SEPARATOR + passage, {}
+
+    async def rewrite(topic, headers, header, lines, passages):
+        return [f"{header} > Power BI", "Power BI > Estimated Time (4 months)"]
+
+    monkeypatch.setattr(langgraph_router, "agather_context", fresh_research)
+    monkeypatch.setattr(langgraph_router, "aresynthesize_phase", rewrite)
+    result = langgraph_router.refresh_roadmap(topic)
+
+    report = result["refresh"]
+    assert report["mode"] == "phases"
+    assert report["phases_regenerated"] == ["Phase 2: Dashboards"]
+    assert report["total_time"] == "updated"
+    assert result["summary"].endswith("Total Estimated Time (6 months)")
+    assert result["delta"]["nodes_added"] and "Tableau" in result["delta"]["nodes_removed"]
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+
+import pytest
+
+from agents.mapper import build_roadmap_graph
+from helpers import render_cache
+
+SUMMARY = """Phase 1: Basics
+Phase 1: Basics > Python
+Python > Estimated Time (2 months)
+Total Estimated Time (2 months)"""
+
+
+@pytest.fixture
+def renders(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_cache, "RENDER_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(render_cache, "_disk", {"bytes": None})
+    monkeypatch.setattr(render_cache, "_memory", {})
+    monkeypatch.setattr(render_cache, "_memory_bytes", {"bytes": 0})
+    layouts = []
+
+    def fake_layout(source, engine, fmt, timeout):
+        layouts.append(source)
+        return b"<svg>" + source.encode("utf-8") + b"</svg>"
+
+    monkeypatch.setattr(render_cache, "_run_layout", fake_layout)
+    return tmp_path, layouts
+
+
+def test_render_is_cached(renders):
+    directory, layouts = renders
+    graph = build_roadmap_graph(SUMMARY)
+    first = render_cache.render_graph(graph)
+    assert render_cache.render_graph(graph) == first
+    assert len(layouts) == 1
+    assert sorted(name.rsplit(".", 1)[1] for name in os.listdir(directory)) == ["dot", "svg"]
+
+
+def test_unpersisted_renders_stay_off_disk(renders):
+    directory, _ = renders
+    render_cache.render_graph(build_roadmap_graph(SUMMARY), persist=False)
+    assert os.listdir(directory) == []
+
+
+def test_disk_cache_evicts_least_recently_used(renders, monkeypatch):
+    directory, _ = renders
+    monkeypatch.setattr(render_cache, "RENDER_CACHE_MAX_BYTES", 6000)
+    for index in range(20):
+        render_cache.render_graph(build_roadmap_graph(SUMMARY.replace("Python", f"Python {index}")))
+    sizes = [os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)]
+    assert 0 < sum(sizes) <= 6000
+    assert len(sizes) < 40
+
+
+def test_start_render_does_not_wait_for_layout(renders, monkeypatch):
+    release = threading.Event()
+
+    def slow_layout(source, engine, fmt, timeout):
+        release.wait(5)
+        return b"<svg/>"
+
+    monkeypatch.setattr(render_cache, "_run_layout", slow_layout)
+    future = render_cache.start_render(build_roadmap_graph(SUMMARY), persist=False)
+    assert not future.done()
+    release.set()
+    assert future.result(5) == b"<svg/>"
+
+
+def test_hung_layout_times_out(renders, monkeypatch):
+    release = threading.Event()
+
+    def hung_layout(source, engine, fmt, timeout):
+        release.wait(5)
+        return b"<svg/>"
+
+    monkeypatch.setattr(render_cache, "_run_layout", hung_layout)
+    started = time.perf_counter()
+    try:
+        assert render_cache.render_graph(build_roadmap_graph(SUMMARY), persist=False, timeout=0.1) is None
+        assert time.perf_counter() - started < 2
+    finally:
+        release.set()
+
+
+def test_memory_cache_is_capped_in_bytes(renders, monkeypatch):
+    monkeypatch.setattr(render_cache, "RENDER_MEMORY_MAX_BYTES", 2500)
+    for index in range(10):
+        render_cache.render_graph(build_roadmap_graph(SUMMARY.replace("Python", f"Python {index}")), persist=False)
+    sizes = [len(data) for data in render_cache._memory.values()]
+    assert sizes and sum(sizes) == render_cache._memory_bytes["bytes"] <= 2500
+    # The latest render is the one kept
+    latest = build_roadmap_graph(SUMMARY.replace("Python", "Python 9"))
+    key, _ = render_cache.dot_source(latest, persist=False)
+    assert (key, "svg") in render_cache._memory
@@ -0,0 +1,57 @@
+import asyncio
+
+from agents import researcher
+from helpers import tracing
+from helpers.context_builder import build_context
+
+GOOGLE = {"organic_results": [
+    {"title": "Data Scientist roadmap", "snippet": "A data scientist learns Python, SQL and statistics."},
+    {"title": "Cheap flights", "snippet": "Book cheap flights to Paris today."},
+]}
+WIKIPEDIA = ("A data scientist is a professional who creates programming code. "
+             "They combine it with statistical knowledge. "
+             "Most hold a degree in mathematics or computing. "
+             "Typical employers include banks and retailers.")
+
+
+def test_wikipedia_passages_are_kept_without_the_topic_words():
+    context, stats = build_context("Data Scientist", GOOGLE, WIKIPEDIA, budget=1000)
+    assert "Most hold a degree in mathematics" in context
+    assert "Cheap flights" not in context
+    assert stats["off_topic"] == 1
+
+
+def test_missing_sources_stay_out_of_the_context(monkeypatch):
+    async def failing_wikipedia(topic):
+        raise TimeoutError("read timed out")
+
+    async def google(topic):
+        return GOOGLE
+
+    monkeypatch.setattr(researcher, "agoogle_search", google)
+    monkeypatch.setattr(researcher, "asearch_wikipedia", failing_wikipedia)
+
+    async def run():
+        with tracing.span("research") as span:
+            return await researcher.agather_context("Data Scientist"), span
+
+    with tracing.trace("test"):
+        (context, missing), span = asyncio.run(run())
+    assert missing == {"wikipedia": "read timed out"}
+    assert "read timed out" not in context and "[" not in context
+    assert "learns Python, SQL and statistics" in context
+    assert span.attrs["missing"] == "wikipedia: read timed out"
+
+
+def test_all_sources_missing_is_an_error(monkeypatch):
+    def failing(topic):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(researcher, "google_search", failing)
+    monkeypatch.setattr(researcher, "search_wikipedia", failing)
+    context, missing = researcher.gather_context("Data Scientist")
+    assert context.startswith("An error occurred during research")
+    assert set(missing) == {"google", "wikipedia"}
+    # research_topic keeps returning the context text alone
+    context = researcher.research_topic("Data Scientist")
+    assert isinstance(context, str) and context.startswith("An error occurred during research")
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from helpers import singleflight
+
+
+@pytest.fixture
+def lock_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(singleflight, "SINGLEFLIGHT_DIR", str(tmp_path))
+    monkeypatch.setattr(singleflight, "SINGLEFLIGHT_POLL_SECONDS", 0.01)
+    return tmp_path
+
+
+def test_concurrent_callers_share_one_execution(lock_dir):
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def run():
+        with singleflight.flight("topic") as current:
+            if not current.done:
+                calls.append(1)
+                started.set()
+                release.wait(5)
+                current.publish({"summary": "shared"})
+                current.result = {"summary": "shared"}
+            results.append(current.result)
+
+    leader = threading.Thread(target=run)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=run) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == [{"summary": "shared"}] * 4
+    # Each caller gets its own dict
+    assert len({id(result) for result in results}) == 4
+
+
+def test_leader_error_reaches_followers(lock_dir):
+    async def leader(started):
+        async with singleflight.aflight("topic"):
+            started.set()
+            await asyncio.sleep(0.05)
+            raise RuntimeError("boom")
+
+    async def follower():
+        async with singleflight.aflight("topic") as current:
+            return current.result
+
+    async def main():
+        started = asyncio.Event()
+        leading = asyncio.ensure_future(leader(started))
+        await started.wait()
+        return await asyncio.gather(leading, follower(), return_exceptions=True)
+
+    outcomes = asyncio.run(main())
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+
+
+@pytest.mark.skipif(singleflight.fcntl is None, reason="needs fcntl")
+def test_waits_for_result_of_another_process(lock_dir):
+    # A second open file description stands in for the other process
+    other = singleflight._open_lock_file("topic")
+    assert singleflight._try_lock(other)
+    results = []
+
+    def run():
+        with singleflight.flight("topic") as current:
+            results.append((current.done, current.result))
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    time.sleep(0.05)
+    other.write(json.dumps({"finished_at": time.time(), "result": {"summary": "other"}}))
+    other.flush()
+    other.close()
+    thread.join(5)
+    assert results == [(True, {"summary": "other"})]
+
+
+@pytest.mark.skipif(singleflight.fcntl is None, reason="needs fcntl")
+def test_stale_lock_files_are_swept(lock_dir, monkeypatch):
+    with singleflight.flight("old") as current:
+        current.publish({"summary": "old"})
+    held = singleflight._open_lock_file("running")
+    assert singleflight._try_lock(held)
+    assert len(os.listdir(lock_dir)) == 2
+
+    singleflight._sweep_lock_files(now=time.time() + singleflight.SINGLEFLIGHT_WAIT_SECONDS + 1)
+    held.close()
+    assert len(os.listdir(lock_dir)) == 1
+
+
+@pytest.mark.skipif(singleflight.fcntl is None, reason="needs fcntl")
+def test_recent_lock_files_are_kept(lock_dir):
+    with singleflight.flight("recent") as current:
+        current.publish({"summary": "recent"})
+    singleflight._sweep_lock_files()
+    assert len(os.listdir(lock_dir)) == 1
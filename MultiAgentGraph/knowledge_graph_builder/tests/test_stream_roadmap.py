@@ -0,0 +1,60 @@
+import pytest
+
+from agents import synthesizer
+from helpers.cache import get_cache, normalize_topic, hash_text
+from helpers.research_api_tool import OpenAIStreamError
+from workflows import langgraph_router
+
+SUMMARY = (
+    "Phase 1: Basics\n"
+    "Phase 1: Basics > Python\n"
+    "Python > Estimated Time (2 months)\n"
+    "Phase 2: Practice\n"
+    "Phase 2: Practice > Projects\n"
+    "Projects > Estimated Time (3 months)\n"
+    "Total Estimated Time (5 months)\n"
+)
+
+
+def fake_stream(failing_models, content=SUMMARY):
+    def stream_openai(prompt, model="gpt-4", max_tokens=2000):
+        yield content[:40]
+        if model in failing_models:
+            raise OpenAIStreamError("Error calling OpenAI API: connection reset")
+        yield content[40:]
+    return stream_openai
+
+
+@pytest.fixture
+def research(monkeypatch):
+    monkeypatch.setattr(langgraph_router, "gather_context", lambda topic: (f"Research about {topic}.", {}))
+
+
+def run(topic):
+    events = list(langgraph_router.stream_roadmap(topic))
+    return events, events[-1]["result"]
+
+
+def cached_summary(topic):
+    snippet = f"Research about {topic}."
+    prompt_key = hash_text(synthesizer.build_synthesis_prompt(topic, snippet))
+    return get_cache().get("synthesis", normalize_topic(topic), prompt_key)
+
+
+def test_failed_stream_is_an_error_and_not_cached(monkeypatch, research):
+    models = {synthesizer.SYNTHESIS_FAST_MODEL, synthesizer.SYNTHESIS_LARGE_MODEL}
+    monkeypatch.setattr(synthesizer, "stream_openai", fake_stream(models))
+    events, result = run("Stream Failure Topic")
+    assert result["error"].startswith("Synthesis failed - Error calling OpenAI API")
+    assert "nodes" not in result
+    assert cached_summary("Stream Failure Topic") is None
+    assert not any(event["type"] == "token" and "Error calling" in event["text"] for event in events)
+
+
+def test_failed_fast_stream_restarts_with_large_model(monkeypatch, research):
+    monkeypatch.setattr(synthesizer, "stream_openai", fake_stream({synthesizer.SYNTHESIS_FAST_MODEL}))
+    events, result = run("Stream Escalation Topic")
+    assert "error" not in result
+    assert {"type": "restart"} in events
+    assert result["summary"] == SUMMARY
+    assert cached_summary("Stream Escalation Topic") == result["summary"]
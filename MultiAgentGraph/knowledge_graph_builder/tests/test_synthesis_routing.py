@@ -0,0 +1,57 @@
+import pytest
+
+from agents import synthesizer
+from agents.mapper import validate_summary
+from helpers import tracing
+
+VALID = (
+    "Phase 1: Basics\n"
+    "Phase 1: Basics > Python > Estimated Time (2 months)\n"
+    "Phase 2: Practice\n"
+    "Phase 2: Practice > Projects > Estimated Time (3 months)\n"
+    "Total Estimated Time (5 months)\n"
+)
+
+
+def test_valid_summary_has_no_problems():
+    assert validate_summary(VALID) == []
+
+
+@pytest.mark.parametrize("summary, problem", [
+    ("Error calling OpenAI API: timeout", "model call failed"),
+    ("Phase 1: Basics > Python > Estimated Time (2 months)\nTotal Estimated Time (2 months)",
+     "expected at least 2 'Phase N: Title' lines, found 1"),
+    (VALID.replace("Phase 2", "Phase 3"), "phases must be numbered 1 to 2, found [1, 3]"),
+    (VALID.replace(" > Estimated Time (3 months)", ""), "phases without an 'Estimated Time (X months)' leaf: 2"),
+    (VALID.replace("Total Estimated Time (5 months)\n", ""), "expected exactly one 'Total Estimated Time' node, found 0"),
+    (VALID + "Total Estimated Time (6 months)\n", "expected exactly one 'Total Estimated Time' node, found 2"),
+    ("Phase 1: Basics\nPhase 2: Practice\nTotal Estimated Time (5 months)",
+     "expected at least one 'A > B' line per phase, found 0"),
+])
+def test_invalid_summaries_are_reported(summary, problem):
+    assert problem in validate_summary(summary)
+
+
+def _route_metrics(monkeypatch, route, fast_seconds, expected_large):
+    monkeypatch.setitem(synthesizer._large_latency, "seconds", expected_large)
+    metrics = tracing.Metrics()
+    monkeypatch.setattr(tracing, "METRICS", metrics)
+    with tracing.trace("test"):
+        with tracing.span("synthesis") as span:
+            synthesizer._record_route(route, fast_seconds, [] if route == "fast" else ["model call failed"])
+    return span.attrs, metrics
+
+
+@pytest.mark.parametrize("route, fast_seconds, expected_large, saved, wasted", [
+    ("fast", 2.0, 30.0, 28.0, 0.0),
+    ("fast", 40.0, 30.0, 0.0, 10.0),
+    ("escalated", 2.0, 30.0, 0.0, 2.0),
+])
+def test_routing_savings_are_non_negative_counters(monkeypatch, route, fast_seconds, expected_large, saved, wasted):
+    attrs, metrics = _route_metrics(monkeypatch, route, fast_seconds, expected_large)
+    assert attrs["saved_seconds"] == saved
+    assert attrs["wasted_seconds"] == wasted
+    exported = metrics.to_prometheus()
+    assert ('roadmap_saved_seconds_total{span="synthesis"}' in exported) == (saved > 0)
+    assert ('roadmap_wasted_seconds_total{span="synthesis"}' in exported) == (wasted > 0)
+    assert "-" not in "".join(line.rsplit(" ", 1)[1] for line in exported.splitlines() if "_total{" in line)
@@ -0,0 +1,72 @@
+import pytest
+
+from helpers.cache import get_cache, normalize_topic
+from helpers.topic_index import TopicIndex, canonical_topic
+from workflows import langgraph_router
+
+STORED = ["Software Engineer", "Data Scientist", "Data Engineer", "Product Manager", "Web Developer"]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = TopicIndex(str(tmp_path / "topics.sqlite"))
+    for topic in STORED:
+        index.add(topic)
+    return index
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Data Scientist Roadmap", "Data Scientist"),
+    ("How to become a data scientist", "Data Scientist"),
+    ("Data Science", "Data Scientist"),
+    ("Software Engineering", "Software Engineer"),
+    ("Web Development", "Web Developer"),
+    ("Product Management", "Product Manager"),
+])
+def test_rephrased_topics_match(index, query, expected):
+    assert index.match(query)[0] == expected
+
+
+@pytest.mark.parametrize("query", [
+    "Software Engineering Manager",
+    "Lead Software Engineer",
+    "Senior Software Engineer",
+    "Software Engineer Intern",
+    "Senior Data Scientist",
+    "Data Science Intern",
+    "Data Engineering Manager",
+    "Senior Product Manager",
+])
+def test_role_words_prevent_a_match(index, query):
+    assert index.match(query) is None
+
+
+def test_unrelated_topics_do_not_match(index):
+    assert index.match("JavaScript Developer") is None
+    assert index.match("Marine Biologist") is None
+
+
+def test_canonical_topic_drops_generic_words():
+    assert canonical_topic("Data Scientist career roadmap") == canonical_topic("data science")
+
+
+def test_removed_topics_stop_matching(index, tmp_path):
+    index.remove("Data Scientist")
+    assert index.match("Data Science") is None
+    # Other processes opening the index no longer load it
+    assert TopicIndex(str(tmp_path / "topics.sqlite")).match("Data Science") is None
+    index.add("Data Scientist")
+    assert index.match("Data Science")[0] == "Data Scientist"
+
+
+def test_match_without_cached_research_is_dropped(index, monkeypatch):
+    monkeypatch.setattr(langgraph_router, "get_topic_index", lambda: index)
+    cache = get_cache()
+    cache.set("research", "Research about data.", normalize_topic("Data Scientist"))
+
+    assert langgraph_router._match_topic("Data Science") == (
+        "Data Scientist", {"topic": "Data Scientist", "score": 1.0})
+
+    cache.clear("research")
+    assert langgraph_router._match_topic("Data Science") == ("Data Science", None)
+    assert index.match("Data Science") is None
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from helpers import tracing, transport
+
+
+@pytest.fixture
+def cassettes(tmp_path):
+    transport.configure(mode="replay", cassette_dir=str(tmp_path), latency_ms=0, jitter_ms=0,
+                        error_rate=0, fallback=False, seed=0)
+    yield tmp_path
+    transport.configure(mode="replay", error_rate=0, fallback=False)
+
+
+def _record(url, params, body, status=200):
+    request = transport._http_request(url, params)
+    transport.save_cassette("wikipedia", request, transport.encode_response(
+        status, body, {"Content-Type": "application/json", "X-Request-Id": "1"}))
+
+
+def test_replays_recorded_response(cassettes):
+    _record("https://example.org/page", {"q": "python"}, b'{"extract": "A language."}')
+    response = transport.http_get("wikipedia", "https://example.org/page", params={"q": "python"})
+    assert response.status_code == 200
+    assert response.json() == {"extract": "A language."}
+    assert response.headers == {"content-type": "application/json"}
+
+
+def test_api_keys_are_not_recorded_or_part_of_the_key(cassettes):
+    _record("https://example.org/search", {"q": "python", "api_key": "secret"}, b"{}")
+    response = transport.http_get("wikipedia", "https://example.org/search", params={"q": "python", "api_key": "other"})
+    assert response.status_code == 200
+    for root, _, names in os.walk(cassettes):
+        for name in names:
+            with open(os.path.join(root, name), encoding="utf-8") as fh:
+                assert "secret" not in fh.read()
+
+
+def test_missing_cassette_raises(cassettes):
+    with pytest.raises(transport.TransportError):
+        transport.http_get("wikipedia", "https://example.org/unknown")
+
+
+def test_fallback_picks_a_recorded_cassette(cassettes):
+    _record("https://example.org/page", None, b'{"extract": "recorded"}')
+    transport.configure(fallback=True)
+    response = transport.http_get("wikipedia", "https://example.org/other")
+    assert response.json() == {"extract": "recorded"}
+
+
+def test_replayed_body_is_capped(cassettes):
+    _record("https://example.org/page", None, b"x" * 100)
+    response = asyncio.run(transport.ahttp_get("wikipedia", "https://example.org/page", max_bytes=10))
+    assert response.content == b"x" * 10
+    assert response.truncated
+
+
+def test_injected_errors(cassettes):
+    _record("https://example.org/page", None, b"{}")
+    transport.configure(error_rate=1.0)
+    with pytest.raises(transport.TransportError, match="Injected"):
+        transport.http_get("wikipedia", "https://example.org/page")
+
+
+def test_call_replays_result_and_records_usage(cassettes):
+    request = {"model": "gpt-4", "messages": [{"role": "user", "content": "hi"}]}
+    result = {"content": "hello", "usage": {"prompt_tokens": 3, "completion_tokens": 1}}
+    transport.save_cassette("openai", request, result)
+
+    def live_call():
+        raise AssertionError("replay must not call the API")
+
+    with tracing.trace("test") as trace:
+        assert transport.call("openai", request, live_call) == result
+    span = trace.to_dict()["spans"][0]
+    assert span["name"] == "openai"
+    assert span["attrs"]["prompt_tokens"] == 3
+
+
+def test_record_mode_saves_the_live_result(cassettes):
+    transport.configure(mode="record")
+    request = {"prompt": "x"}
+    assert transport.call("openai", request, lambda: {"content": "live"}) == {"content": "live"}
+    transport.configure(mode="replay")
+    assert transport.call("openai", request, lambda: {"content": "changed"}) == {"content": "live"}
+    with open(transport._cassette_path("openai", transport.request_key("openai", request)), encoding="utf-8") as fh:
+        assert json.load(fh)["request"] == request
+
+
+def test_recorded_capped_body_replays_as_truncated(cassettes, monkeypatch):
+    class LiveResponse:
+        status_code = 200
+        headers = {"Content-Type": "application/json"}
+
+        def iter_content(self, chunk_size):
+            yield b'{"extract": "' + b"x" * 100 + b'"}'
+
+        def close(self):
+            pass
+
+    class Session:
+        def get(self, url, params=None, timeout=None, stream=False):
+            return LiveResponse()
+
+    monkeypatch.setattr(transport, "get_session", lambda: Session())
+    transport.configure(mode="record")
+    live = transport.http_get("wikipedia", "https://example.org/page", max_bytes=50)
+    assert live.truncated and len(live.content) == 50
+
+    transport.configure(mode="replay")
+    replayed = transport.http_get("wikipedia", "https://example.org/page", max_bytes=1000)
+    assert replayed.content == live.content
+    assert replayed.truncated
@@ -0,0 +1,339 @@
+"""
+Bulk roadmap generation.
+
+Reads topics (one per line) from a file or stdin, runs them through
+agenerate_roadmap with a bounded number of concurrent workers and streams
+each result to JSONL or Parquet as soon as it finishes.
+
+JSONL records also carry the per-topic trace (a span per stage and tool
+call). Finished topics are appended to a checkpoint file, so re-running the same
+command after a crash skips them. Output is written before the checkpoint,
+which means a crash between the two can repeat (never lose) a topic.
+
+Generated graphs are also added to the graph store (helpers.graph_store)
+in transactions of GRAPH_STORE_BULK_SIZE roadmaps; a crash can leave up to
+that many checkpointed topics out of the store (but not out of the output).
+A failed transaction is retried with the next one; topics still not stored
+at the end are listed in the report.
+
+With --analytics or --merged, those files are saved every --save-every
+topics and finished topics are only checkpointed once they are saved, so
+a crash repeats (never loses) their roadmaps there as well.
+
+Usage (from the knowledge_graph_builder directory):
+    python -m workflows.batch_runner topics.txt --workers 16 --output roadmaps.jsonl
+    cat topics.txt | python -m workflows.batch_runner - --format parquet --output roadmaps.parquet
+    python -m workflows.batch_runner topics.txt --analytics roadmaps.npz   # also build the analytics store
+    python -m workflows.batch_runner topics.txt --merged skills.json      # also merge into one skills graph
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from helpers.cache import normalize_topic
+from helpers.config import METRICS_PORT
+from helpers.graph_store import get_graph_store, GraphStoreWriteError
+from helpers import rate_limiter
+from helpers.tracing import serve_metrics
+from helpers.http_session import aclose_async_client
+from workflows.langgraph_router import agenerate_roadmap
+
+STAGES = ("research", "synthesis", "mapping")
+
+
+def read_topics(source):
+    """Reads unique, non-empty topics from a path or '-' for stdin, keeping order."""
+    stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        topics, seen = [], set()
+        for line in stream:
+            topic = line.strip()
+            if not topic or topic.startswith("#"):
+                continue
+            key = normalize_topic(topic)
+            if key not in seen:
+                seen.add(key)
+                topics.append(topic)
+        return topics
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as fh:
+        return {line.rstrip("\n") for line in fh if line.strip()}
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def write(self, record):
+        self._fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+
+class ParquetWriter:
+    """
+    Buffers records into row groups of ``row_group_size`` rows.
+
+    Parquet files cannot be appended to, so a resumed run writes a new
+    numbered part next to the requested path instead of overwriting it.
+    """
+
+    def __init__(self, path, row_group_size=500):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output requires pyarrow: pip install pyarrow")
+
+        self._pa, self._pq = pa, pq
+        stem, ext = os.path.splitext(path)
+        part = 1
+        while os.path.exists(path):
+            path = f"{stem}.part{part}{ext or '.parquet'}"
+            part += 1
+        self.path = path
+        self.row_group_size = row_group_size
+        self._rows = []
+        self._writer = None
+        self._schema = pa.schema([
+            ("topic", pa.string()),
+            ("ok", pa.bool_()),
+            ("error", pa.string()),
+            ("nodes", pa.string()),
+            ("edges", pa.string()),
+            ("summary", pa.string()),
+            ("elapsed_s", pa.float64()),
+        ] + [(f"{stage}_s", pa.float64()) for stage in STAGES])
+
+    def write(self, record):
+        result = record["result"]
+        row = {
+            "topic": record["topic"],
+            "ok": "error" not in result,
+            "error": result.get("error"),
+            "nodes": json.dumps(result.get("nodes"), ensure_ascii=False) if "nodes" in result else None,
+            "edges": json.dumps(result.get("edges"), ensure_ascii=False) if "edges" in result else None,
+            "summary": result.get("summary"),
+            "elapsed_s": record["elapsed_s"],
+        }
+        for stage in STAGES:
+            row[f"{stage}_s"] = record["timings"].get(stage)
+        self._rows.append(row)
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        table = self._pa.Table.from_pylist(self._rows, schema=self._schema)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.path, self._schema)
+        self._writer.write_table(table)
+        self._rows = []
+
+    def close(self):
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def format_report(stats, wall_time):
+    """Throughput and per-stage latency (mean/p50/p95/max, in seconds)."""
+    finished = stats["ok"] + stats["failed"]
+    lines = [
+        f"Topics: {finished} finished ({stats['ok']} ok, {stats['failed']} failed), "
+        f"{stats['skipped']} skipped from checkpoint",
+        f"Wall time: {wall_time:.1f}s, throughput: {finished / wall_time if wall_time else 0:.2f} topics/s",
+        f"{'stage':<10} {'count':>6} {'mean':>8} {'p50':>8} {'p95':>8} {'max':>8}",
+    ]
+    for stage in STAGES + ("total",):
+        values = sorted(stats["latencies"][stage])
+        if not values:
+            continue
+        lines.append(
+            f"{stage:<10} {len(values):>6} {sum(values) / len(values):>8.3f} "
+            f"{_percentile(values, 0.5):>8.3f} {_percentile(values, 0.95):>8.3f} {values[-1]:>8.3f}"
+        )
+    unstored = stats.get("unstored")
+    if unstored:
+        lines.append(f"Not in the graph store: {len(unstored)} roadmaps ({', '.join(unstored[:10])}"
+                     f"{', ...' if len(unstored) > 10 else ''})")
+    return "\n".join(lines)
+
+
+async def run_batch(topics, writer, checkpoint_path, workers=8, retry_errors=True, columns=None, merged=None,
+                    save=None, save_every=100):
+    """
+    Generates roadmaps for ``topics`` with at most ``workers`` in flight.
+
+    Successful topics are always checkpointed; failed ones only when
+    ``retry_errors`` is False, so by default a resumed run retries them.
+    Generated graphs are also added to ``columns`` (a RoadmapColumns) and
+    ``merged`` (a MergedGraph), if given. ``save`` writes them to disk; when
+    it is given, finished topics are held back from the checkpoint until the
+    next save, which runs every ``save_every`` topics and at the end.
+    """
+    done = load_checkpoint(checkpoint_path)
+    pending = [topic for topic in topics if normalize_topic(topic) not in done]
+    stats = {
+        "ok": 0,
+        "failed": 0,
+        "skipped": len(topics) - len(pending),
+        "latencies": {stage: [] for stage in STAGES + ("total",)},
+        "unstored": [],
+    }
+
+    queue = asyncio.Queue()
+    for topic in pending:
+        queue.put_nowait(topic)
+
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        unsaved = []
+
+        def flush_checkpoint():
+            if save is not None:
+                save()
+            checkpoint.writelines(key + "\n" for key in unsaved)
+            checkpoint.flush()
+            unsaved.clear()
+
+        async def worker():
+            while True:
+                try:
+                    topic = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                result = await agenerate_roadmap(topic)
+                elapsed = time.perf_counter() - started
+                # An API error surfaces as the summary text; it is retried like any other failure
+                if "error" not in result and result.get("summary", "").startswith("Error calling OpenAI API"):
+                    result = {"error": result["summary"], "trace": result["trace"]}
+                if columns is not None and "graph" in result:
+                    columns.add(topic, result["graph"])
+                if merged is not None and "graph" in result:
+                    merged.merge(topic, result["graph"])
+                result.pop("graph", None)  # nodes/edges already carry it in serializable form
+                trace = result.pop("trace")
+                timings = trace.stage_durations()
+
+                failed = "error" in result
+                writer.write({"topic": topic, "result": result, "timings": timings, "elapsed_s": elapsed,
+                              "trace": trace.to_dict()})
+                if not failed or not retry_errors:
+                    unsaved.append(normalize_topic(topic))
+                    if save is None or len(unsaved) >= save_every:
+                        flush_checkpoint()
+
+                stats["failed" if failed else "ok"] += 1
+                stats["latencies"]["total"].append(elapsed)
+                for stage in STAGES:
+                    stats["latencies"][stage].append(timings.get(stage, 0.0))
+
+        # Generated graphs are written to the graph store in bulk transactions, and
+        # the workers' OpenAI calls wait behind interactive ones at the rate limiter
+        store = get_graph_store()
+        try:
+            with rate_limiter.priority(rate_limiter.BATCH):
+                if store is None:
+                    await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+                else:
+                    try:
+                        with store.bulk():
+                            await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+                    except GraphStoreWriteError as e:
+                        stats["unstored"] = e.topics
+        finally:
+            if unsaved:
+                flush_checkpoint()
+            await aclose_async_client()
+
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate roadmaps for many topics.")
+    parser.add_argument("topics", help="File with one topic per line, or '-' for stdin")
+    parser.add_argument("--output", "-o", default="roadmaps.jsonl", help="Output file path")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default=None,
+                        help="Output format (default: inferred from the output extension)")
+    parser.add_argument("--workers", "-w", type=int, default=8, help="Concurrent topic generations")
+    parser.add_argument("--checkpoint", default=None,
+                        help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--no-retry-errors", action="store_true",
+                        help="Checkpoint failed topics too, so a resumed run skips them")
+    parser.add_argument("--row-group-size", type=int, default=500, help="Parquet rows per row group")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Serve /metrics and /metrics.json on this port while running (0 = off)")
+    parser.add_argument("--analytics", default=None,
+                        help="Also add the roadmaps to this columnar analytics file (.npz, needs numpy)")
+    parser.add_argument("--merged", default=None,
+                        help="Also merge the roadmaps into this cross-roadmap skills graph file (.json)")
+    parser.add_argument("--save-every", type=int, default=100,
+                        help="Save the analytics and merged files (and checkpoint) every N topics")
+    args = parser.parse_args(argv)
+
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+
+    output_format = args.format or ("parquet" if args.output.endswith(".parquet") else "jsonl")
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+    topics = read_topics(args.topics)
+
+    if output_format == "parquet":
+        writer = ParquetWriter(args.output, row_group_size=args.row_group_size)
+    else:
+        writer = JsonlWriter(args.output)
+
+    columns = None
+    if args.analytics:
+        try:
+            from helpers.roadmap_analytics import RoadmapColumns
+            columns = RoadmapColumns.load(args.analytics) if os.path.exists(args.analytics) else RoadmapColumns()
+        except ImportError as e:
+            raise SystemExit(str(e))
+
+    merged = None
+    if args.merged:
+        from helpers.graph_merge import MergedGraph
+        merged = MergedGraph.load(args.merged) if os.path.exists(args.merged) else MergedGraph()
+
+    def save():
+        if columns is not None:
+            columns.save(args.analytics)
+        if merged is not None:
+            merged.save(args.merged)
+
+    started = time.perf_counter()
+    try:
+        stats = asyncio.run(run_batch(topics, writer, checkpoint_path, workers=args.workers,
+                                      retry_errors=not args.no_retry_errors, columns=columns, merged=merged,
+                                      save=save if columns is not None or merged is not None else None,
+                                      save_every=max(1, args.save_every)))
+    finally:
+        writer.close()
+    print(format_report(stats, time.perf_counter() - started))
+    return 0 if stats["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
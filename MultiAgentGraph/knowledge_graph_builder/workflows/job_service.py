@@ -0,0 +1,301 @@
+"""
+Local roadmap generation service.
+
+A durable job queue (helpers.job_queue, one SQLite file) served over a small
+HTTP API, plus worker processes that claim jobs and run stream_roadmap. The
+Streamlit app only submits jobs and renders their progress (set
+JOB_SERVICE_URL), so a browser session never holds a thread for a whole
+generation. API servers and workers only share the queue file, so either can
+be scaled on its own: run more worker processes on the host, or more
+frontends against the same service.
+
+Endpoints:
+    POST   /jobs              {"topic": ...} -> 202 {"job_id", "status"}
+    GET    /jobs/<id>         status, error and (once finished) the result
+    GET    /jobs/<id>/events  progress events as JSON lines until "done";
+                              ?after=<seq> resumes after a dropped connection
+    DELETE /jobs/<id>         cancels the job
+    GET    /health            job counts by status
+
+Events are those of stream_roadmap ("token", "graph", "restart", "done"),
+with graphs and traces in their JSON form (see helpers.job_queue) and a
+"seq" number. A worker that dies mid-job stops reporting, and after
+JOB_STALE_SECONDS its job is rerun by another worker. Readers then get a
+"restart" event. A job is run at most JOB_MAX_ATTEMPTS times; a cancelled
+job whose worker died is finished as cancelled rather than rerun.
+
+Usage (from the knowledge_graph_builder directory):
+    python -m workflows.job_service serve --port 8765 --processes 2 --threads 4
+    python -m workflows.job_service serve --processes 0     # API only, workers run separately
+    python -m workflows.job_service worker --processes 4    # workers only
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from helpers.config import (
+    OPENAI_RATE_LIMIT_PROCESSES,
+    JOB_QUEUE_PATH,
+    JOB_SERVICE_PORT,
+    JOB_WORKER_PROCESSES,
+    JOB_WORKER_THREADS,
+    JOB_POLL_SECONDS,
+)
+from helpers.job_queue import JobQueue, encode_event, encode_result, CANCELLED_ERROR
+
+# Token chunks are batched into one event per interval instead of one row each
+TOKEN_FLUSH_SECONDS = 0.25
+# How often an idle worker deletes expired jobs
+PURGE_INTERVAL_SECONDS = 600
+
+
+def run_job(queue, worker, job_id, topic):
+    """Runs one claimed job, reporting its progress; returns the final status."""
+    # Imported here so the API server process never loads the pipeline
+    from workflows.langgraph_router import stream_roadmap
+
+    # Research emits no events for a while; keep the job from looking abandoned
+    stop_heartbeat = threading.Event()
+
+    def heartbeat():
+        while not stop_heartbeat.wait(queue.stale_seconds / 4):
+            if not queue.heartbeat(job_id, worker):
+                return
+
+    threading.Thread(target=heartbeat, name=f"heartbeat-{job_id[:8]}", daemon=True).start()
+
+    events = stream_roadmap(topic)
+    result = None
+    pending_text = []
+    last_flush = time.monotonic()
+    try:
+        for event in events:
+            if event["type"] == "done":
+                result = event["result"]
+                break
+            if event["type"] == "token":
+                pending_text.append(event["text"])
+                if time.monotonic() - last_flush < TOKEN_FLUSH_SECONDS:
+                    continue
+                event = {"type": "token", "text": "".join(pending_text)}
+            elif pending_text and not queue.add_event(job_id, worker, {"type": "token", "text": "".join(pending_text)}):
+                break
+            pending_text = []
+            last_flush = time.monotonic()
+            if not queue.add_event(job_id, worker, encode_event(event)):
+                break  # Cancelled, or the job was given to another worker
+    except Exception as e:
+        result = {"error": f"Exception in job worker: {str(e)}"}
+    finally:
+        # Stops generation early if the loop was left before "done"
+        events.close()
+        stop_heartbeat.set()
+
+    if result is None:
+        result = {"error": CANCELLED_ERROR}
+    elif pending_text:
+        queue.add_event(job_id, worker, {"type": "token", "text": "".join(pending_text)})
+    return queue.finish(job_id, worker, encode_result(result))
+
+
+def _worker_loop(queue_path, worker, stop):
+    queue = JobQueue(queue_path)
+    last_purge = 0.0
+    while not stop.is_set():
+        job = queue.claim(worker)
+        if job is None:
+            if time.monotonic() - last_purge > PURGE_INTERVAL_SECONDS:
+                queue.purge()
+                last_purge = time.monotonic()
+            stop.wait(JOB_POLL_SECONDS)
+            continue
+        run_job(queue, worker, *job)
+
+
+def run_worker_process(queue_path=JOB_QUEUE_PATH, threads=JOB_WORKER_THREADS):
+    """
+    Runs ``threads`` worker threads in this process until SIGTERM or SIGINT.
+    The pipeline waits on network calls, so a process can run several jobs.
+    """
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    workers = [
+        threading.Thread(target=_worker_loop, args=(queue_path, f"{prefix}:{index}", stop), name=f"job-worker-{index}")
+        for index in range(max(1, threads))
+    ]
+    for thread in workers:
+        thread.start()
+    while any(thread.is_alive() for thread in workers):
+        for thread in workers:
+            thread.join(timeout=1)
+
+
+def start_workers(processes=JOB_WORKER_PROCESSES, threads=JOB_WORKER_THREADS, queue_path=JOB_QUEUE_PATH):
+    """Starts worker processes (spawned, so they share nothing but the queue file)."""
+    context = multiprocessing.get_context("spawn")
+    started = []
+    for _ in range(processes):
+        process = context.Process(target=run_worker_process, args=(queue_path, threads), daemon=True)
+        process.start()
+        started.append(process)
+    return started
+
+
+class JobHandler(BaseHTTPRequestHandler):
+    """HTTP API over the job queue; ``self.server.queue`` is the shared JobQueue."""
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self):
+        """(job id or None, sub-resource or None, query), or None for an unknown path."""
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        if not parts or parts[0] != "jobs" or len(parts) > 3:
+            return None
+        job_id = parts[1] if len(parts) > 1 else None
+        resource = parts[2] if len(parts) > 2 else None
+        return job_id, resource, parse_qs(url.query)
+
+    def do_POST(self):
+        route = self._route()
+        if route is None or route[0] is not None:
+            self._send_json(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "Body must be JSON"})
+            return
+        topic = payload.get("topic") if isinstance(payload, dict) else None
+        if not isinstance(topic, str):
+            self._send_json(400, {"error": "Topic must be a string"})
+            return
+        # Topic validation happens in the worker, like in generate_roadmap
+        self._send_json(202, {"job_id": self.server.queue.submit(topic), "status": "queued"})
+
+    def do_GET(self):
+        if urlparse(self.path).path.rstrip("/") == "/health":
+            self._send_json(200, {"jobs": self.server.queue.counts()})
+            return
+        route = self._route()
+        if route is None or route[0] is None or route[1] not in (None, "events"):
+            self._send_json(404, {"error": "Not found"})
+            return
+        job_id, resource, query = route
+        job = self.server.queue.get(job_id)
+        if job is None:
+            self._send_json(404, {"error": f"Unknown job {job_id}"})
+        elif resource == "events":
+            after = query.get("after", ["0"])[0]
+            if not after.isdigit():
+                self._send_json(400, {"error": "after must be a non-negative integer"})
+                return
+            self._stream_events(job_id, int(after))
+        else:
+            self._send_json(200, job)
+
+    def do_DELETE(self):
+        route = self._route()
+        if route is None or route[0] is None or route[1] is not None:
+            self._send_json(404, {"error": "Not found"})
+            return
+        status = self.server.queue.cancel(route[0])
+        if status is None:
+            self._send_json(404, {"error": f"Unknown job {route[0]}"})
+        else:
+            self._send_json(200, {"job_id": route[0], "status": status})
+
+    def _stream_events(self, job_id, after):
+        # No Content-Length: the body is JSON lines and ends when the connection closes
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        queue = self.server.queue
+        try:
+            while True:
+                events = queue.events(job_id, after)
+                for seq, event in events:
+                    self.wfile.write((json.dumps({"seq": seq, **event}, ensure_ascii=False) + "\n").encode("utf-8"))
+                    after = seq
+                    if event["type"] == "done":
+                        self.wfile.flush()
+                        return
+                self.wfile.flush()
+                if not events:
+                    if queue.get(job_id) is None:
+                        return  # Purged
+                    time.sleep(JOB_POLL_SECONDS)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client went away; the job keeps running
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(port=JOB_SERVICE_PORT, host="127.0.0.1", queue_path=JOB_QUEUE_PATH):
+    server = ThreadingHTTPServer((host, port), JobHandler)
+    server.daemon_threads = True
+    server.queue = JobQueue(queue_path)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local roadmap generation job service.")
+    parser.add_argument("command", choices=("serve", "worker"),
+                        help="serve: HTTP API (plus workers unless --processes 0); worker: workers only")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=JOB_SERVICE_PORT)
+    parser.add_argument("--queue", default=JOB_QUEUE_PATH, help="Job queue database shared by API and workers")
+    parser.add_argument("--processes", type=int, default=JOB_WORKER_PROCESSES, help="Worker processes")
+    parser.add_argument("--threads", type=int, default=JOB_WORKER_THREADS, help="Concurrent jobs per worker process")
+    args = parser.parse_args(argv)
+
+    if args.processes > OPENAI_RATE_LIMIT_PROCESSES:
+        # Each worker process rate-limits OpenAI on its own
+        print(f"Note: {args.processes} worker processes each enforce 1/{OPENAI_RATE_LIMIT_PROCESSES} of the "
+              "OpenAI limits; set OPENAI_RATE_LIMIT_PROCESSES to the number of processes sharing the key")
+
+    if args.command == "worker":
+        processes = start_workers(args.processes, args.threads, args.queue)
+        print(f"{len(processes)} worker processes x {args.threads} threads on {args.queue}")
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    server = make_server(args.port, args.host, args.queue)
+    processes = start_workers(args.processes, args.threads, args.queue)
+    print(f"Job service on http://{args.host}:{args.port} with {len(processes)} worker processes")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for process in processes:
+            process.terminate()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
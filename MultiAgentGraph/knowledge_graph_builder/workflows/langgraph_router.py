@@ -1,7 +1,260 @@
+import asyncio
+import math
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Union, List, Tuple
-from agents.researcher import research_topic
-from agents.synthesizer import synthesize_snippet
-from agents.mapper import map_to_graph
+from agents.researcher import gather_context, agather_context
+from agents.synthesizer import (
+    build_synthesis_prompt,
+    asynthesize_snippet,
+    aresynthesize_phase,
+    stream_synthesis,
+    expand_summary,
+    SYNTHESIS_RESTART,
+    COMPACT_OUTPUT,
+)
+from agents.mapper import build_roadmap_graph, IncrementalMapper
+from helpers import singleflight, tracing
+from helpers.cache import get_cache, normalize_topic, hash_text
+from helpers.config import REFRESH_MAX_PHASE_FRACTION
+from helpers.graph_store import get_graph_store
+from helpers.http_session import aclose_async_client
+from helpers.research_api_tool import OpenAIStreamError
+from helpers.roadmap_diff import (
+    split_passages,
+    diff_passages,
+    split_phases,
+    join_phases,
+    affected_phases,
+    phase_months,
+    retime_total,
+)
+from helpers.roadmap_graph import RoadmapGraph, graph_delta
+from helpers.topic_index import get_topic_index
+
+
+def _validate_topic(topic):
+    """Returns an error message for an invalid topic, or None if it is valid."""
+    if not isinstance(topic, str):
+        return "Topic must be a string"
+    if not topic.strip():
+        return "Topic cannot be empty"
+    if len(topic) < 3 or len(topic) > 100:
+        return "Topic length must be between 3 and 100 characters"
+    return None
+
+
+def _map_summary(cache, summary):
+    """Mapping stage: CPU only, so it is shared by the sync and async paths."""
+    with tracing.span("mapping") as span:
+        summary_key = hash_text(summary)
+        cached = cache.get("graph", summary_key) if cache else None
+        span.set(cache_hit=cached is not None)
+        if cached is not None:
+            return RoadmapGraph.from_json(cached)
+
+        graph = build_roadmap_graph(summary)
+        if not isinstance(graph, RoadmapGraph):
+            span.set(error="invalid graph structure")
+            return None
+        span.set(nodes=graph.num_nodes, edges=graph.num_edges)
+        if cache:
+            cache.set("graph", graph.to_json(), summary_key)
+        return graph
+
+
+def _match_topic(topic):
+    """
+    Swaps a near-duplicate topic for a previously generated one.
+
+    Returns (topic to generate, match) where match is {"topic", "score"} when
+    the topic was swapped, else None.
+    """
+    index = get_topic_index()
+    if index is None:
+        return topic, None
+    with tracing.span("topic_match") as span:
+        found = index.match(topic)
+        if found is None or normalize_topic(found[0]) == normalize_topic(topic):
+            span.set(matched=False)
+            return topic, None
+        # The matched roadmap is only worth reusing while its research is cached
+        cache = get_cache()
+        if cache is None or not cache.contains("research", normalize_topic(found[0])):
+            index.remove(found[0])
+            span.set(matched=False, evicted=found[0])
+            return topic, None
+        span.set(matched=True, score=round(found[1], 3))
+    return found[0], {"topic": found[0], "score": round(found[1], 3)}
+
+
+def _remember_topic(topic, result):
+    # Only topics whose roadmap is now in the stage cache can be reused
+    index = get_topic_index()
+    if index is None or "error" in result or result.get("summary", "").startswith("Error calling OpenAI API"):
+        return
+    index.add(topic)
+
+
+def _store_graph(topic, result, context=None):
+    """
+    Persists a generated roadmap in the graph store, with the research
+    context it came from (for refresh_roadmap); never fails the request.
+    Blocks on SQLite commits, so async callers run it in a thread.
+    """
+    store = get_graph_store()
+    if store is None or "error" in result or result.get("summary", "").startswith("Error calling OpenAI API"):
+        return
+    with tracing.span("graph_store") as span:
+        try:
+            if context is not None:
+                store.save_source(topic, result["summary"], context)
+            # In a batch this may write (and fail) other topics' roadmaps too;
+            # a failed batch stays queued for the next write
+            store.add_roadmap(topic, result["graph"], result["summary"])
+        except sqlite3.Error as e:
+            span.set(error=str(e))
+
+
+def _encode_result(result):
+    # JSON form of a result for coalesced requests in other processes
+    encoded = dict(result)
+    if "graph" in encoded:
+        encoded["graph"] = encoded["graph"].to_json()
+    return encoded
+
+
+def _decode_result(encoded):
+    result = dict(encoded)
+    if "graph" in result:
+        result["graph"] = RoadmapGraph.from_json(result["graph"])
+    return result
+
+
+def _roadmap_result(graph, summary):
+    # "nodes"/"edges" keep the original dict shape; "graph" carries the compact
+    # form (kinds, phase membership) so the exporter does not re-parse the summary.
+    result = graph.to_dict()
+    result["summary"] = summary
+    result["graph"] = graph
+    return result
+
+
+async def agenerate_roadmap(topic: str) -> Dict[str, Union[Dict[str, List], str]]:
+    """
+    Async variant of generate_roadmap; returns the same dict shape.
+
+    Research and synthesis await pooled async HTTP and AsyncOpenAI calls, so a
+    single event loop can run many topic generations concurrently. Concurrent
+    calls for the same normalized topic, in this process or another one on the
+    same host, are coalesced: one runs and the others receive its result.
+
+    A topic similar enough to one generated before (see helpers.topic_index)
+    is served as that topic, reported under "topic_match" ({"topic", "score"}).
+    """
+    with tracing.trace("generate_roadmap", topic=topic) as trace:
+        error = _validate_topic(topic)
+        if error:
+            result = {"error": error}
+        else:
+            try:
+                topic, match = _match_topic(topic)
+                # Concurrent requests for the same topic share one execution
+                async with singleflight.aflight(normalize_topic(topic), _encode_result, _decode_result) as flight:
+                    if flight.done:
+                        result = flight.result
+                    else:
+                        result = await _agenerate(topic)
+                        # The research context is stored, not returned
+                        context = result.pop("context", None)
+                        flight.publish(result)
+                        # SQLite commits would stall every other request on the event loop
+                        await asyncio.to_thread(_remember_topic, topic, result)
+                        await asyncio.to_thread(_store_graph, topic, result, context)
+                if match:
+                    result["topic_match"] = match
+            except Exception as e:
+                result = {"error": f"Exception in generate_roadmap: {str(e)}"}
+    result["trace"] = trace
+    return result
+
+
+async def _agenerate(topic):
+    try:
+        cache = get_cache()
+        topic_key = normalize_topic(topic)
+
+        # Research phase
+        with tracing.span("research") as span:
+            snippet = cache.get("research", topic_key) if cache else None
+            span.set(cache_hit=snippet is not None)
+            if snippet is None:
+                snippet, missing = await agather_context(topic)
+                if not snippet or snippet.startswith("An error occurred"):
+                    span.set(error=snippet)
+                    return {"error": f"Research failed: {snippet}"}
+                # Partial results (a source timed out or failed) are used but not cached
+                if missing:
+                    span.set(partial=True)
+                elif cache:
+                    cache.set("research", snippet, topic_key)
+
+        # Synthesis phase
+        summary = await _asynthesize(cache, topic, topic_key, snippet)
+        if not summary:
+            return {"error": "Synthesis failed - no summary generated"}
+
+        # Mapping phase
+        graph = _map_summary(cache, summary)
+        if graph is None:
+            return {"error": "Mapping failed - invalid graph structure generated"}
+
+        result = _roadmap_result(graph, summary)
+        result["context"] = snippet
+        return result
+
+    except Exception as e:
+        return {"error": f"Exception in generate_roadmap: {str(e)}"}
+
+
+async def _asynthesize(cache, topic, topic_key, snippet):
+    """Synthesis stage of the async path; returns the summary ("" if none was generated)."""
+    with tracing.span("synthesis") as span:
+        prompt_key = hash_text(build_synthesis_prompt(topic, snippet))
+        summary = cache.get("synthesis", topic_key, prompt_key) if cache else None
+        span.set(cache_hit=summary is not None)
+        if summary is None:
+            summary = await asynthesize_snippet(topic, snippet)
+            if not summary:
+                span.set(error="no summary generated")
+                return ""
+            # Never cache API errors, they would be replayed until the TTL expires
+            if summary.startswith("Error calling OpenAI API"):
+                span.set(error=summary)
+            elif cache:
+                cache.set("synthesis", summary, topic_key, prompt_key)
+    return summary
+
+
+async def _run_once(coroutine_function, topic):
+    # The sync wrappers run on a short-lived loop, so release its pooled client.
+    try:
+        return await coroutine_function(topic)
+    finally:
+        await aclose_async_client()
+
+
+def _run_blocking(coroutine_function, topic):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_run_once(coroutine_function, topic))
+
+    # Called from inside a running event loop (e.g. a notebook): asyncio.run
+    # cannot nest, so run the pipeline on its own loop in a worker thread.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, _run_once(coroutine_function, topic)).result()
+
 
 def generate_roadmap(topic: str) -> Dict[str, Union[Dict[str, List], str]]:
     """
@@ -10,43 +263,309 @@ def generate_roadmap(topic: str) -> Dict[str, Union[Dict[str, List], str]]:
     2. Synthesizing the content into a summary
     3. Mapping that summary into a graph structure
 
+    Each stage is served from the on-disk stage cache when a fresh entry
+    exists: research is keyed on the normalized topic, synthesis on the
+    normalized topic plus a hash of the full prompt, and mapping on a hash
+    of the summary text.
+
+    This is a blocking wrapper around agenerate_roadmap.
+
     Args:
         topic (str): The topic to generate a roadmap for. Must be a non-empty string
                     with length between 3 and 100 characters.
 
     Returns:
         Dict[str, Union[Dict[str, List], str]]: Either:
-            - A dictionary containing the graph structure with 'nodes' and 'edges' keys
+            - A dictionary containing the graph structure with 'nodes' and 'edges' keys,
+              the 'summary' text and the compact RoadmapGraph under 'graph'
             - A dictionary with an 'error' key containing the error message
+        Either way the request's tracing.Trace (a span per stage and tool
+        call, with timings, bytes, token usage and cache hits) is under 'trace'.
+    """
+    return _run_blocking(agenerate_roadmap, topic)
+
 
-    Raises:
-        ValueError: If the topic is invalid (empty, too short, or too long)
+async def arefresh_roadmap(topic: str) -> Dict[str, Union[Dict[str, List], str]]:
     """
-    # Input validation
-    if not isinstance(topic, str):
-        return {"error": "Topic must be a string"}
-    if not topic.strip():
-        return {"error": "Topic cannot be empty"}
-    if len(topic) < 3 or len(topic) > 100:
-        return {"error": "Topic length must be between 3 and 100 characters"}
+    Refreshes a stored roadmap from fresh research, redoing only what changed.
 
+    The new research context is compared passage by passage with the one
+    the stored roadmap was generated from. Only the phases that the added or
+    removed passages are about are re-synthesized (concurrently, each in a
+    small completion) and spliced back into the stored summary, so the cost
+    follows the size of the change. When nothing relevant changed no model
+    is called; when most phases are affected, or the topic has no stored
+    roadmap, the roadmap is generated in full instead.
+
+    Returns the generate_roadmap dict plus:
+        "delta"    graph_delta against the graph of the stored summary
+                   (labels of added and removed nodes and edges)
+        "refresh"  {"mode": "unchanged" | "phases" | "full", "reason",
+                   "passages_added", "passages_removed", "phases",
+                   "phases_regenerated", "total_time", "nodes_added",
+                   "nodes_removed", "edges_added", "edges_removed"}
+
+    In "phases" mode the Total Estimated Time line is moved by the change in
+    the rewritten phases' estimates ("total_time": "updated"); when either
+    has no duration to compare, it is left as it was and reported "stale".
+    """
+    with tracing.trace("refresh_roadmap", topic=topic) as trace:
+        error = _validate_topic(topic)
+        if error:
+            result = {"error": error}
+        else:
+            try:
+                topic, match = _match_topic(topic)
+                key = "refresh " + normalize_topic(topic)
+                async with singleflight.aflight(key, _encode_result, _decode_result) as flight:
+                    if flight.done:
+                        result = flight.result
+                    else:
+                        result = await _arefresh(topic)
+                        context = result.pop("context", None)
+                        flight.publish(result)
+                        await asyncio.to_thread(_store_graph, topic, result, context)
+                if match:
+                    result["topic_match"] = match
+            except Exception as e:
+                result = {"error": f"Exception in refresh_roadmap: {str(e)}"}
+    result["trace"] = trace
+    return result
+
+
+async def _arefresh(topic):
     try:
-        # Research phase
-        snippet = research_topic(topic)
-        if not snippet or snippet.startswith("An error occurred"):
-            return {"error": f"Research failed: {snippet}"}
+        cache = get_cache()
+        store = get_graph_store()
+        topic_key = normalize_topic(topic)
+        source = store.get_source(topic) if store else None
+        # Compared with the graph mapped from the same summary, so an unchanged refresh has no delta
+        old_graph = build_roadmap_graph(source[0]) if source is not None else None
+        if not isinstance(old_graph, RoadmapGraph):
+            old_graph = None
 
-        # Synthesis phase
-        summary = synthesize_snippet(topic, snippet)
-        if not summary:
-            return {"error": "Synthesis failed - no summary generated"}
+        # Research is always fetched again: comparing it is the point
+        with tracing.span("research", refresh=True) as span:
+            snippet, missing = await agather_context(topic)
+            if not snippet or snippet.startswith("An error occurred"):
+                span.set(error=snippet)
+                return {"error": f"Research failed: {snippet}"}
+            partial = bool(missing)
+            span.set(partial=partial)
+            if cache and not partial:
+                cache.set("research", snippet, topic_key)
 
-        # Mapping phase
-        graph = map_to_graph(summary)
-        if not graph or not isinstance(graph, dict) or 'nodes' not in graph or 'edges' not in graph:
+        report = {"mode": "full", "reason": "", "passages_added": 0, "passages_removed": 0,
+                  "phases": 0, "phases_regenerated": [], "total_time": "unchanged"}
+        if source is None or old_graph is None:
+            report["reason"] = "no stored roadmap"
+        else:
+            old_summary, old_context = source
+            with tracing.span("refresh_diff") as span:
+                added, removed = diff_passages(old_context, snippet)
+                if partial:
+                    removed = []  # Passages of a source that failed this time did not go away
+                head, phases, tail = split_phases(old_summary)
+                affected, unmatched = affected_phases(topic, phases, added + removed)
+                span.set(passages_added=len(added), passages_removed=len(removed), phases=len(phases),
+                         phases_affected=len(affected), unmatched=len(unmatched))
+            report.update(passages_added=len(added), passages_removed=len(removed), phases=len(phases))
+            if not phases:
+                report["reason"] = "stored summary has no phases"
+            elif len(affected) > REFRESH_MAX_PHASE_FRACTION * len(phases):
+                report["reason"] = f"{len(affected)} of {len(phases)} phases affected"
+            elif not affected:
+                report["mode"] = "unchanged"
+                summary = old_summary
+            else:
+                report["mode"] = "phases"
+                # Each phase is rewritten from the fresh passages about it
+                relevant, _ = affected_phases(topic, phases, split_passages(snippet))
+                headers = [header for header, _ in phases]
+                indexes = sorted(affected)
+                with tracing.span("synthesis", refresh=True, phases=len(indexes)):
+                    rewrites = await asyncio.gather(*(
+                        aresynthesize_phase(topic, headers, phases[index][0], phases[index][1],
+                                            relevant.get(index) or affected[index])
+                        for index in indexes
+                    ))
+                change = 0.0
+                for index, lines in zip(indexes, rewrites):
+                    # A phase no model rewrote validly keeps its old lines
+                    if lines is not None:
+                        change += phase_months(lines) - phase_months(phases[index][1])
+                        phases[index] = (phases[index][0], lines)
+                        report["phases_regenerated"].append(headers[index])
+                if change:
+                    retimed = None if math.isnan(change) else retime_total(tail, change)
+                    report["total_time"] = "stale" if retimed is None else "updated"
+                    tail = retimed or tail
+                summary = join_phases(head, phases, tail)
+
+        if report["mode"] == "full":
+            summary = await _asynthesize(cache, topic, topic_key, snippet)
+            if not summary:
+                return {"error": "Synthesis failed - no summary generated"}
+        elif cache and not partial:
+            # generate_roadmap for the refreshed research now returns the refreshed roadmap
+            cache.set("synthesis", summary, topic_key, hash_text(build_synthesis_prompt(topic, snippet)))
+
+        graph = _map_summary(cache, summary)
+        if graph is None:
             return {"error": "Mapping failed - invalid graph structure generated"}
 
-        return {"nodes": graph["nodes"], "edges": graph["edges"], "summary": summary}
+        with tracing.span("graph_delta") as span:
+            delta = graph_delta(old_graph if old_graph is not None else RoadmapGraph(), graph)
+            counts = {name: len(changes) for name, changes in delta.items()}
+            span.set(**counts)
+        report.update(counts)
+        result = _roadmap_result(graph, summary)
+        result["delta"] = delta
+        result["refresh"] = report
+        result["context"] = snippet
+        return result
 
     except Exception as e:
-        return {"error": f"Exception in generate_roadmap: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Exception in refresh_roadmap: {str(e)}"}
+
+
+def refresh_roadmap(topic: str) -> Dict[str, Union[Dict[str, List], str]]:
+    """Blocking wrapper around arefresh_roadmap."""
+    return _run_blocking(arefresh_roadmap, topic)
+
+
+def stream_roadmap(topic: str):
+    """
+    Streaming variant of generate_roadmap for interactive use.
+
+    Yields event dicts while the roadmap is synthesized:
+        {"type": "token", "text": ...}    each chunk of model output
+        {"type": "graph", "graph": ...}   partial graph (nodes, edges, summary),
+                                          after the first line and whenever a
+                                          new phase starts
+        {"type": "restart"}               the output so far was rejected by validation
+                                          and is being regenerated: discard it
+        {"type": "done", "result": ...}   final result, same shape as generate_roadmap
+                                          (including its trace)
+
+    Cached stages are served without streaming, so a repeated topic yields
+    "done" straight away; so does a topic that is already being generated by
+    another request, once that request finishes.
+    """
+    done = {"type": "done", "result": {"error": "Generation ended without a result"}}
+    with tracing.trace("generate_roadmap", topic=topic, streamed=True) as trace:
+        error = _validate_topic(topic)
+        if error:
+            done = {"type": "done", "result": {"error": error}}
+        else:
+            try:
+                topic, match = _match_topic(topic)
+                # A follower of an identical in-flight request gets "done" only
+                with singleflight.flight(normalize_topic(topic), _encode_result, _decode_result) as flight:
+                    if flight.done:
+                        done = {"type": "done", "result": flight.result}
+                    else:
+                        for event in _stream_events(topic):
+                            if event["type"] == "done":
+                                done = event
+                                break
+                            yield event
+                        context = done["result"].pop("context", None)
+                        flight.publish(done["result"])
+                        _remember_topic(topic, done["result"])
+                        _store_graph(topic, done["result"], context)
+                if match:
+                    done["result"]["topic_match"] = match
+            except Exception as e:
+                done = {"type": "done", "result": {"error": f"Exception in generate_roadmap: {str(e)}"}}
+    # The trace is closed before "done" so it covers exactly the generation
+    done["result"]["trace"] = trace
+    yield done
+
+
+def _stream_events(topic):
+    try:
+        cache = get_cache()
+        topic_key = normalize_topic(topic)
+
+        with tracing.span("research") as span:
+            snippet = cache.get("research", topic_key) if cache else None
+            span.set(cache_hit=snippet is not None)
+            if snippet is None:
+                snippet, missing = gather_context(topic)
+                if not snippet or snippet.startswith("An error occurred"):
+                    span.set(error=snippet)
+                    yield {"type": "done", "result": {"error": f"Research failed: {snippet}"}}
+                    return
+                if missing:
+                    span.set(partial=True)
+                elif cache:
+                    cache.set("research", snippet, topic_key)
+
+        try:
+            with tracing.span("synthesis", streamed=True) as span:
+                summary = yield from _stream_summary(cache, topic, topic_key, snippet, span)
+        except OpenAIStreamError as e:
+            # The tokens streamed so far are an incomplete answer; never map or cache them
+            yield {"type": "done", "result": {"error": f"Synthesis failed - {e}"}}
+            return
+        if not summary:
+            yield {"type": "done", "result": {"error": "Synthesis failed - no summary generated"}}
+            return
+
+        graph = _map_summary(cache, summary)
+        if graph is None:
+            yield {"type": "done", "result": {"error": "Mapping failed - invalid graph structure generated"}}
+            return
+        result = _roadmap_result(graph, summary)
+        result["context"] = snippet
+        yield {"type": "done", "result": result}
+
+    except Exception as e:
+        yield {"type": "done", "result": {"error": f"Exception in generate_roadmap: {str(e)}"}}
+
+
+def _stream_summary(cache, topic, topic_key, snippet, span):
+    """
+    Streams synthesis events (tokens, partial graphs); returns the full summary.
+    Raises OpenAIStreamError if the model stream fails.
+    """
+    prompt_key = hash_text(build_synthesis_prompt(topic, snippet))
+    summary = cache.get("synthesis", topic_key, prompt_key) if cache else None
+    span.set(cache_hit=summary is not None)
+    if summary is None:
+        mapper = IncrementalMapper(compact=COMPACT_OUTPUT)
+        seen_phases = set()
+        drawn = False
+        chunks = []
+        for chunk in stream_synthesis(topic, snippet):
+            if chunk is SYNTHESIS_RESTART:
+                # Fast model output was rejected; the large model starts over
+                mapper = IncrementalMapper(compact=COMPACT_OUTPUT)
+                seen_phases = set()
+                drawn = False
+                chunks = []
+                yield {"type": "restart"}
+                continue
+            chunks.append(chunk)
+            yield {"type": "token", "text": chunk}
+
+            new_phase = False
+            for line in mapper.feed_text(chunk):
+                phase = line.split(">")[0].strip()
+                if mapper.is_phase_header(line) and phase not in seen_phases:
+                    seen_phases.add(phase)
+                    new_phase = True
+            # Draw the first node(s) as soon as possible, then once per phase
+            if new_phase or (not drawn and mapper.summary):
+                drawn = True
+                yield {"type": "graph", "graph": _roadmap_result(mapper.to_graph(), mapper.summary)}
+
+        summary = expand_summary("".join(chunks))
+        if not summary:
+            span.set(error="no summary generated")
+        elif summary.startswith("Error calling OpenAI API"):
+            span.set(error=summary)
+        elif cache:
+            cache.set("synthesis", summary, topic_key, prompt_key)
+    return summary